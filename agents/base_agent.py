@@ -2,10 +2,14 @@
 
 import logging
 from abc import ABC, abstractmethod
+from utils.parsed_document import ParsedDocument
 
 class Agent(ABC):
     """Base abstract class for specialized agents."""
     
+    # Part of the result cache key: bump it in an agent whose changes alter its results
+    version = "1"
+    
     def __init__(self, memory_store):
         """
         Initialize the agent with a memory store.
@@ -16,15 +20,29 @@ class Agent(ABC):
         self.memory_store = memory_store
     
     @abstractmethod
-    def process(self, file_path, metadata):
+    def process(self, file_path, metadata, document=None):
         """
         Process a document file and extract relevant information.
         
         Args:
             file_path (str): Path to the file to process
             metadata (dict): Metadata about the file
+            document (ParsedDocument, optional): Already parsed file content
         
         Returns:
             dict: The results of processing
         """
-        pass
\ No newline at end of file
+        pass
+    
+    def cache_inputs(self, metadata):
+        """
+        The parts of an upload's name and content type that this agent's
+        results depend on. They are added to the result cache key, so
+        identical content uploaded under a name that changes the result is
+        not served the other upload's result. Empty if only the content matters.
+        """
+        return ""
+    
+    def _load_document(self, file_path, document=None):
+        """Return the shared parsed document, or parse the file if none was given."""
+        return document if document is not None else ParsedDocument(file_path)
\ No newline at end of file
@@ -6,19 +6,48 @@ from datetime import datetime
 import mimetypes
 import re
 from agents.base_agent import Agent
+from utils import tracing
+from utils.text_processor import KeywordMatcher, KeywordTally
 
 logger = logging.getLogger(__name__)
 
+# Intent keywords with expanded vocabulary
+INTENT_KEYWORDS = {
+    "RFQ": ["quote", "rfq", "price", "pricing", "cost", "request for quote", "quotation", "estimate", "proposal"],
+    "Complaint": ["complaint", "issue", "problem", "dissatisfied", "unhappy", "disappointed", "refund", "unacceptable"],
+    "Invoice": ["invoice", "bill", "payment", "amount due", "total due", "purchase order", "remit", "paid"],
+    "Regulation": ["compliance", "regulation", "policy", "requirement", "gdpr", "hipaa", "fda", "legal", "guideline"],
+    "Fraud Risk": ["fraud", "suspicious", "unauthorized", "alert", "warning", "security", "breach", "risk"],
+    "Order": ["order status", "shipping", "tracking", "delivery", "shipped", "order number", "expedited", "order confirmation"],
+    "Report": ["report", "analysis", "quarterly", "annual", "summary", "findings", "results", "statistics", "metrics", "forecast", "trends"],
+    "Resume": ["resume", "cv", "curriculum vitae", "experience", "education", "skills", "employment", "qualifications", "profile"]
+}
+
+INTENT_MATCHER = KeywordMatcher({
+    **INTENT_KEYWORDS,
+    "resume_markers": ["work experience", "education", "skills", "professional experience"],
+    "report_markers": ["executive summary", "key findings", "market analysis"]
+})
+
+# Scoring a PDF stops at the first page where the top intent has at least this
+# score (confidence is capped from 4 on) and leads the next one by this much
+DECISIVE_INTENT_SCORE = 4
+DECISIVE_INTENT_LEAD = 5
+
 class ClassifierAgent(Agent):
     """
     Agent responsible for classifying document format and business intent.
     Uses file extension, MIME type, and content analysis.
     """
     
+    # 2: the intent of streamed JSON files comes from a sample of the document
+    # 3: PDF intent scoring stops at the first decisive page
+    version = "3"
+    
     def __init__(self, memory_store):
         super().__init__(memory_store)
     
-    def classify(self, file_path, metadata, user_intent=None):
+    def classify(self, file_path, metadata, user_intent=None, document=None):
         """
         Classify the document format and business intent.
         
@@ -26,6 +55,7 @@ class ClassifierAgent(Agent):
             file_path (str): Path to the file to classify
             metadata (dict): Metadata about the file
             user_intent (str, optional): User-provided intent
+            document (ParsedDocument, optional): Already parsed file content
             
         Returns:
             dict: Classification results with format, intent, and confidence
@@ -33,8 +63,11 @@ class ClassifierAgent(Agent):
         logger.info(f"Classifying document: {file_path}")
         
         try:
+            document = self._load_document(file_path, document)
+            
             # Determine file format
-            format_result = self._determine_format(file_path, metadata)
+            with tracing.stage("format_sniff"):
+                format_result = self._determine_format(file_path, metadata, document)
             format_type = format_result["format"]
             
             # Determine business intent
@@ -44,7 +77,7 @@ class ClassifierAgent(Agent):
                 confidence = 1.0  # High confidence since it's user-provided
             else:
                 # Auto-detect intent based on file content
-                intent_result = self._determine_intent(file_path, format_type)
+                intent_result = self._determine_intent(document, format_type)
                 intent = intent_result["intent"]
                 confidence = intent_result["confidence"]
             
@@ -61,14 +94,19 @@ class ClassifierAgent(Agent):
             logger.error(f"Error classifying document: {e}", exc_info=True)
             raise
     
-    def process(self, file_path, metadata):
+    def cache_inputs(self, metadata):
+        """The extension and content type, which _determine_format reads."""
+        _, ext = os.path.splitext(metadata.get("filename", ""))
+        return f"{ext.lower()},{metadata.get('content_type') or ''}"
+    
+    def process(self, file_path, metadata, document=None):
         """
         Process method to conform to Agent abstract class.
         Just calls classify in this case.
         """
-        return self.classify(file_path, metadata)
+        return self.classify(file_path, metadata, document=document)
     
-    def _determine_format(self, file_path, metadata):
+    def _determine_format(self, file_path, metadata, document):
         """Determine the format of the document."""
         # Check file extension
         _, ext = os.path.splitext(file_path)
@@ -87,14 +125,13 @@ class ClassifierAgent(Agent):
         else:
             # If extension and content type don't match or are unclear,
             # perform content-based analysis
-            return self._analyze_file_content(file_path)
+            return self._analyze_file_content(document)
     
-    def _analyze_file_content(self, file_path):
+    def _analyze_file_content(self, document):
         """Analyze file content to determine format."""
         try:
             # Read a sample of the file
-            with open(file_path, 'rb') as f:
-                sample = f.read(1024)  # Read first 1KB
+            sample = document.head(1024)  # Read first 1KB
             
             # Try to decode as text
             try:
@@ -122,7 +159,7 @@ class ClassifierAgent(Agent):
             logger.error(f"Error analyzing file content: {e}", exc_info=True)
             return {"format": "unknown", "confidence": 0.1}
     
-    def _determine_intent(self, file_path, format_type):
+    def _determine_intent(self, document, format_type):
         """Determine the business intent of the document."""
         # Default intent and confidence
         intent = "Unknown"
@@ -131,11 +168,11 @@ class ClassifierAgent(Agent):
         try:
             # Process based on format
             if format_type == "pdf":
-                intent_result = self._analyze_pdf_intent(file_path)
+                intent_result = self._analyze_pdf_intent(document)
             elif format_type == "email":
-                intent_result = self._analyze_email_intent(file_path)
+                intent_result = self._analyze_email_intent(document)
             elif format_type == "json":
-                intent_result = self._analyze_json_intent(file_path)
+                intent_result = self._analyze_json_intent(document)
             else:
                 return {"intent": intent, "confidence": confidence}
             
@@ -145,121 +182,96 @@ class ClassifierAgent(Agent):
             logger.error(f"Error determining intent: {e}", exc_info=True)
             return {"intent": intent, "confidence": confidence}
     
-    def _analyze_pdf_intent(self, file_path):
+    def _analyze_pdf_intent(self, document):
         """Analyze PDF content to determine business intent."""
         try:
-            import PyPDF2
+            # Score the first few pages, extracting each only if the intent is not yet decided
+            tally = KeywordTally(INTENT_MATCHER, header_lines=10)
+            for page_text in document.iter_page_texts(max_pages=3):  # First 3 pages or less
+                tally.add((page_text + "\n").lower())
+                if self._intent_decided(tally):
+                    break
             
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Extract text from first few pages for analysis
-                text = ""
-                for i in range(min(3, len(pdf_reader.pages))):  # First 3 pages or less
-                    page = pdf_reader.pages[i]
-                    text += page.extract_text() + "\n"
-                
-                return self._classify_text_intent(text)
+            return self._select_intent(tally)
                 
         except Exception as e:
             logger.error(f"Error analyzing PDF intent: {e}", exc_info=True)
             return {"intent": "Unknown", "confidence": 0.1}
     
-    def _analyze_email_intent(self, file_path):
+    def _analyze_email_intent(self, document):
         """Analyze email content to determine business intent."""
         try:
-            import email
+            # Get subject and body for analysis
+            subject = document.message.get('Subject', '')
+            body = document.email_body
             
-            with open(file_path, 'rb') as file:
-                msg = email.message_from_binary_file(file)
-                
-                # Get subject and body for analysis
-                subject = msg.get('Subject', '')
-                
-                body = ""
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        if part.get_content_type() == "text/plain":
-                            body += part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                else:
-                    body = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-                
-                # Combine subject and body for analysis
-                text = f"{subject}\n{body}"
-                return self._classify_text_intent(text)
+            # Combine subject and body for analysis
+            text = f"{subject}\n{body}"
+            return self._classify_text_intent(text)
                 
         except Exception as e:
             logger.error(f"Error analyzing email intent: {e}", exc_info=True)
             return {"intent": "Unknown", "confidence": 0.1}
     
-    def _analyze_json_intent(self, file_path):
+    def _analyze_json_intent(self, document):
         """Analyze JSON content to determine business intent."""
         try:
             import json
             
-            with open(file_path, 'r') as file:
-                json_data = json.load(file)
-                
-                # Convert JSON data to text for keyword analysis
-                if isinstance(json_data, dict):
-                    # Check for specific fields that might indicate intent
-                    if "order" in json_data or "purchase" in json_data:
-                        return {"intent": "RFQ", "confidence": 0.7}
-                    elif "complaint" in json_data or "issue" in json_data:
-                        return {"intent": "Complaint", "confidence": 0.7}
-                    elif "invoice" in json_data or "payment" in json_data:
-                        return {"intent": "Invoice", "confidence": 0.7}
-                    elif "regulation" in json_data or "compliance" in json_data:
-                        return {"intent": "Regulation", "confidence": 0.7}
-                    elif "alert" in json_data or "fraud" in json_data:
-                        return {"intent": "Fraud Risk", "confidence": 0.7}
-                
-                # If no specific fields, convert to string and classify
-                text = json.dumps(json_data)
-                return self._classify_text_intent(text)
-                
+            # Large files are streamed: only their top-level sample is analyzed
+            json_data = document.json_sample if document.json_streaming else document.json_data
+            
+            # Convert JSON data to text for keyword analysis
+            if isinstance(json_data, dict):
+                # Check for specific fields that might indicate intent
+                if "order" in json_data or "purchase" in json_data:
+                    return {"intent": "RFQ", "confidence": 0.7}
+                elif "complaint" in json_data or "issue" in json_data:
+                    return {"intent": "Complaint", "confidence": 0.7}
+                elif "invoice" in json_data or "payment" in json_data:
+                    return {"intent": "Invoice", "confidence": 0.7}
+                elif "regulation" in json_data or "compliance" in json_data:
+                    return {"intent": "Regulation", "confidence": 0.7}
+                elif "alert" in json_data or "fraud" in json_data:
+                    return {"intent": "Fraud Risk", "confidence": 0.7}
+            
+            # If no specific fields, convert to string and classify
+            text = json.dumps(json_data)
+            return self._classify_text_intent(text)
+            
         except Exception as e:
             logger.error(f"Error analyzing JSON intent: {e}", exc_info=True)
             return {"intent": "Unknown", "confidence": 0.1}
     
     def _classify_text_intent(self, text):
         """Classify business intent based on text content."""
-        text_lower = text.lower()
-        
-        # Define intent keywords with expanded vocabulary
-        intent_keywords = {
-            "RFQ": ["quote", "rfq", "price", "pricing", "cost", "request for quote", "quotation", "estimate", "proposal"],
-            "Complaint": ["complaint", "issue", "problem", "dissatisfied", "unhappy", "disappointed", "refund", "unacceptable"],
-            "Invoice": ["invoice", "bill", "payment", "amount due", "total due", "purchase order", "remit", "paid"],
-            "Regulation": ["compliance", "regulation", "policy", "requirement", "gdpr", "hipaa", "fda", "legal", "guideline"],
-            "Fraud Risk": ["fraud", "suspicious", "unauthorized", "alert", "warning", "security", "breach", "risk"],
-            "Order": ["order status", "shipping", "tracking", "delivery", "shipped", "order number", "expedited", "order confirmation"],
-            "Report": ["report", "analysis", "quarterly", "annual", "summary", "findings", "results", "statistics", "metrics", "forecast", "trends"],
-            "Resume": ["resume", "cv", "curriculum vitae", "experience", "education", "skills", "employment", "qualifications", "profile"]
-        }
-        
-        # Count keywords for each intent with more context awareness
-        intent_scores = {intent: 0 for intent in intent_keywords}
-        
-        # First pass - exact matches
-        for intent, keywords in intent_keywords.items():
-            for keyword in keywords:
-                count = text_lower.count(keyword)
-                # Give more weight to key terms in titles/headers
-                lines = text_lower.split('\n')
-                for line in lines[:10]:  # Check first 10 lines for headers
-                    if keyword in line and len(line) < 100:  # Likely a header/title
-                        count += 1
-                intent_scores[intent] += count
+        return self._select_intent(INTENT_MATCHER.scan(text.lower(), header_lines=10))
+    
+    def _intent_scores(self, hits):
+        """Score every intent from the keyword counts of a text."""
+        # Count keywords for each intent, giving more weight to key terms in
+        # titles/headers (short lines among the first 10)
+        intent_scores = {intent: hits.total(intent, include_headers=True) for intent in INTENT_KEYWORDS}
         
         # If this is clearly a resume, boost that score
-        if any(term in text_lower for term in ["work experience", "education", "skills", "professional experience"]):
+        if hits.any("resume_markers"):
             intent_scores["Resume"] += 3
         
         # If this is clearly a report, boost that score
-        if any(term in text_lower for term in ["executive summary", "key findings", "market analysis"]):
+        if hits.any("report_markers"):
             intent_scores["Report"] += 3
         
+        return intent_scores
+    
+    def _intent_decided(self, hits):
+        """Check whether more text is unlikely to change the intent or its confidence."""
+        scores = sorted(self._intent_scores(hits).values(), reverse=True)
+        return scores[0] >= DECISIVE_INTENT_SCORE and scores[0] - scores[1] >= DECISIVE_INTENT_LEAD
+    
+    def _select_intent(self, hits):
+        """Pick the intent with the highest score, with a confidence based on score and uniqueness."""
+        intent_scores = self._intent_scores(hits)
+        
         # Find the intent with the highest score
         max_score = max(intent_scores.values())
         if max_score == 0:
@@ -6,9 +6,72 @@ import logging
 import re
 from datetime import datetime
 from agents.base_agent import Agent
+from utils.text_processor import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+# Terms behind the type, tone and urgency decisions
+EMAIL_LEXICON = {
+    # Email types, checked in this order
+    "complaint": ["complaint", "issue", "problem", "dissatisfied", "unhappy",
+                  "disappointed", "refund", "unacceptable", "terrible"],
+    "inquiry": ["inquiry", "question", "information", "details", "help"],
+    "rfq": ["quote", "quotation", "rfq", "price", "pricing", "cost"],
+    "order": ["order", "purchase", "shipping", "delivery", "tracking"],
+    # Tone
+    "angry": ["angry", "furious", "outraged", "frustrated", "upset",
+              "terrible", "horrible", "unacceptable", "disappointed",
+              "ridiculous", "worst", "awful", "never"],
+    "urgent": ["urgent", "immediately", "asap", "emergency", "critical",
+               "right now", "promptly", "quickly", "expedite", "rush"],
+    "polite": ["please", "thank", "appreciate", "grateful", "kind",
+               "regards", "sincerely", "respectfully"],
+    # Urgency (whole phrases avoid false positives)
+    "high_urgency": ["urgent", "immediately", "asap", "emergency", "critical",
+                     "right now", "right away"],
+    "medium_urgency": ["soon", "timely", "attention", "priority", "follow up",
+                       "response needed", "please respond", "update", "need by",
+                       "as soon as possible"]
+}
+
+# Terms the summary looks for in the body only
+SUMMARY_TERMS = ("order", "refund", "help", "payment", "inquiry", "question")
+
+EMAIL_MATCHER = KeywordMatcher({**EMAIL_LEXICON, "summary": SUMMARY_TERMS})
+
+class EmailFeatures:
+    """
+    Lexicon hits and emphasis counts of one email.
+    
+    The subject and body are lowercased once and all lexicon terms are
+    counted in a single pass over them; every decision of the email agent
+    reads from these features.
+    """
+    
+    def __init__(self, subject, body):
+        subject_lower = subject.lower()
+        body_lower = body.lower()
+        text = subject_lower + " " + body_lower
+        
+        self.hits = EMAIL_MATCHER.scan(text)
+        # The summary terms are single words, so an occurrence is in either
+        # the subject or the body; the short subject is scanned again to
+        # tell them apart
+        subject_hits = EMAIL_MATCHER.scan(subject_lower)
+        self.body_terms = frozenset(
+            term for term in SUMMARY_TERMS
+            if self.hits.counts[term] > subject_hits.counts[term]
+        )
+        self.urgent_subject = "urgent" in subject_lower
+        
+        # Exclamation marks and all caps words are indicators of emotions
+        self.exclamation_count = text.count("!")
+        self.caps_words = sum(1 for word in text.split() if word.isupper() and len(word) > 2)
+    
+    def matches(self, group):
+        """Count the terms of a lexicon group found in the email."""
+        return sum(1 for term in EMAIL_LEXICON[group] if term in self.hits)
+
 class EmailAgent(Agent):
     """
     Agent specialized in processing email files.
@@ -19,14 +82,14 @@ class EmailAgent(Agent):
     def __init__(self, memory_store):
         super().__init__(memory_store)
         
-    def process(self, file_path, metadata):
+    def process(self, file_path, metadata, document=None):
         """Process an email file and extract relevant information."""
         logger.info(f"Processing email file: {file_path}")
         
         try:
             # Parse the email file
-            with open(file_path, 'rb') as f:
-                msg = email.message_from_binary_file(f)
+            document = self._load_document(file_path, document)
+            msg = document.message
             
             # Extract basic email fields
             sender = msg.get('From', 'Unknown')
@@ -35,22 +98,16 @@ class EmailAgent(Agent):
             date = msg.get('Date', 'Unknown')
             
             # Get email body
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    if content_type == "text/plain":
-                        body += part.get_payload(decode=True).decode('utf-8', errors='ignore')
-            else:
-                body = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
+            body = document.email_body
             
             # Analyze the content to determine email type, tone, and urgency
-            email_type = self._determine_email_type(subject, body)
-            tone = self._analyze_tone(subject, body)
-            urgency = self._determine_urgency(subject, body)
+            features = EmailFeatures(subject, body)
+            email_type = self._determine_email_type(features)
+            tone = self._analyze_tone(features)
+            urgency = self._determine_urgency(features)
             
             # Generate a summary of the email
-            summary = self._generate_summary(subject, body)
+            summary = self._generate_summary(subject, body, features, email_type)
             
             # Determine recommended action based on tone, urgency and type
             recommended_action = self._recommend_action(tone, urgency, email_type)
@@ -78,61 +135,35 @@ class EmailAgent(Agent):
             logger.error(f"Error processing email: {e}", exc_info=True)
             raise
     
-    def _determine_email_type(self, subject, body):
+    def _determine_email_type(self, features):
         """Determine the type of email based on content analysis."""
-        subject_lower = subject.lower()
-        body_lower = body.lower()
-        
         # Check for complaint indicators
-        if any(term in subject_lower or term in body_lower for term in 
-               ["complaint", "issue", "problem", "dissatisfied", "unhappy", 
-                "disappointed", "refund", "unacceptable", "terrible"]):
+        if features.matches("complaint"):
             return "Complaint"
         
         # Check for inquiry indicators
-        elif any(term in subject_lower or term in body_lower for term in 
-                ["inquiry", "question", "information", "details", "help"]):
+        elif features.matches("inquiry"):
             return "Inquiry"
         
         # Check for RFQ indicators
-        elif any(term in subject_lower or term in body_lower for term in 
-                ["quote", "quotation", "rfq", "price", "pricing", "cost"]):
+        elif features.matches("rfq"):
             return "RFQ"
         
         # Check for order-related indicators
-        elif any(term in subject_lower or term in body_lower for term in 
-                ["order", "purchase", "shipping", "delivery", "tracking"]):
+        elif features.matches("order"):
             return "Order-related"
         
         # Default type
         return "General"
     
-    def _analyze_tone(self, subject, body):
+    def _analyze_tone(self, features):
         """Analyze the tone of the email."""
-        combined_text = (subject + " " + body).lower()
-        
-        # Check for angry/upset indicators
-        angry_terms = ["angry", "furious", "outraged", "frustrated", "upset", 
-                      "terrible", "horrible", "unacceptable", "disappointed",
-                      "ridiculous", "worst", "awful", "never"]
-        angry_count = sum(1 for term in angry_terms if term in combined_text)
-        
-        # Check for urgent indicators
-        urgent_terms = ["urgent", "immediately", "asap", "emergency", "critical",
-                       "right now", "promptly", "quickly", "expedite", "rush"]
-        urgent_count = sum(1 for term in urgent_terms if term in combined_text)
-        
-        # Check for polite indicators
-        polite_terms = ["please", "thank", "appreciate", "grateful", "kind", 
-                       "regards", "sincerely", "respectfully"]
-        polite_count = sum(1 for term in polite_terms if term in combined_text)
+        angry_count = features.matches("angry")
+        urgent_count = features.matches("urgent")
+        polite_count = features.matches("polite")
         
         # Exclamation marks and all caps words are indicators of emotions
-        exclamation_count = combined_text.count("!")
-        caps_words = sum(1 for word in combined_text.split() if word.isupper() and len(word) > 2)
-        
-        # Determine tone based on indicators
-        if angry_count > 2 or exclamation_count > 3 or caps_words > 3:
+        if angry_count > 2 or features.exclamation_count > 3 or features.caps_words > 3:
             return "Angry"
         elif urgent_count > 2:
             return "Urgent"
@@ -141,34 +172,15 @@ class EmailAgent(Agent):
         else:
             return "Neutral"
     
-    def _determine_urgency(self, subject, body):
+    def _determine_urgency(self, features):
         """Determine the urgency level of the email."""
-        combined_text = (subject + " " + body).lower()
-        
-        # High urgency indicators - use whole phrases to avoid false positives
-        high_urgency = ["urgent", "immediately", "asap", "emergency", "critical",
-                      "right now", "right away"]
-        
-        # Medium urgency indicators
-        medium_urgency = ["soon", "timely", "attention", "priority", "follow up",
-                        "response needed", "please respond", "update", "need by", 
-                        "as soon as possible"]
-        
-        # Check for urgency indicators - use more precise phrase matching
-        high_count = 0
-        for term in high_urgency:
-            if term in combined_text:
-                high_count += 1
-                
-        medium_count = 0
-        for term in medium_urgency:
-            if term in combined_text:
-                medium_count += 1
-        
-        exclamation_count = combined_text.count("!")
+        # Whole phrases avoid false positives
+        high_count = features.matches("high_urgency")
+        medium_count = features.matches("medium_urgency")
+        exclamation_count = features.exclamation_count
         
         # Determine urgency level with adjusted thresholds
-        if "urgent" in subject.lower() or exclamation_count > 3 or "emergency" in combined_text:
+        if features.urgent_subject or exclamation_count > 3 or "emergency" in features.hits:
             return "High"
         elif high_count >= 1:  # Stricter threshold for high urgency
             return "High"
@@ -177,37 +189,37 @@ class EmailAgent(Agent):
         else:
             return "Low"
     
-    def _generate_summary(self, subject, body):
+    def _generate_summary(self, subject, body, features, email_type):
         """Generate a summary of the email content."""
         # Simple summary for now - first line and subject
         first_line = body.strip().split('\n')[0].strip() if body.strip() else ""
         
         if len(first_line) > 10:  # Ensure first line is substantial
-            summary = f"This is a {self._determine_email_type(subject, body).lower()} email with subject '{subject}'. It begins with: {first_line}"
+            summary = f"This is a {email_type.lower()} email with subject '{subject}'. It begins with: {first_line}"
             
             # Add additional context based on body content
-            if "order" in body.lower():
+            if "order" in features.body_terms:
                 order_match = re.search(r'#\d+', body)
                 order_number = order_match.group(0) if order_match else "unknown order number"
                 summary += f" The email refers to order {order_number}."
                 
-            if "refund" in body.lower():
+            if "refund" in features.body_terms:
                 summary += " The sender is requesting a refund."
                 
-            if "help" in body.lower():
+            if "help" in features.body_terms:
                 summary += " The sender is asking for assistance."
         else:
             # Fallback if first line is too short
-            summary = f"This is a {self._determine_email_type(subject, body).lower()} email with subject '{subject}'. The email is regarding "
+            summary = f"This is a {email_type.lower()} email with subject '{subject}'. The email is regarding "
             
-            if "order" in body.lower():
+            if "order" in features.body_terms:
                 summary += "an order issue."
-            elif "payment" in body.lower():
+            elif "payment" in features.body_terms:
                 summary += "a payment concern."
-            elif "inquiry" in body.lower() or "question" in body.lower():
+            elif "inquiry" in features.body_terms or "question" in features.body_terms:
                 summary += "a customer inquiry."
             else:
-                summary += f"a {self._determine_email_type(subject, body).lower()} matter."
+                summary += f"a {email_type.lower()} matter."
         
         return summary
     
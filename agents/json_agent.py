@@ -6,22 +6,50 @@ import os
 import re
 from datetime import datetime
 from agents.base_agent import Agent
+from utils.json_parser import walk_json
+from utils.text_processor import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+# Terms hinting at the kind of document when the JSON cannot be parsed
+RAW_INDICATOR_MATCHER = KeywordMatcher({
+    "config": ["environment", "config", "configuration", "settings", "database", "host", "port",
+               "features", "api", "key", "development", "production", "staging"],
+    "schema": ["properties", "required", "type", "object", "definitions"],
+    "data": ["items", "data", "records", "results", "list"],
+    "error": ["error"]
+})
+
+# Words in the file name that _determine_document_intent and _infer_from_raw_content count
+FILENAME_INDICATORS = ("config", "settings", "schema", "data", "error")
+
 class JsonAgent(Agent):
     """
     Agent specialized in processing JSON files.
     """
     
-    def __init__(self, memory_store):
+    # 2: anomaly reports are capped at max_anomalies
+    # 3: files above the stream threshold are analyzed by streaming them
+    version = "3"
+    
+    def __init__(self, memory_store, max_anomalies=None):
+        """
+        Initialize the agent.
+        
+        Args:
+            memory_store: A reference to the shared memory store
+            max_anomalies (int, optional): Maximum number of anomalies reported per document
+        """
         super().__init__(memory_store)
+        self.max_anomalies = max_anomalies
     
-    def process(self, file_path, metadata):
+    def process(self, file_path, metadata, document=None):
         """Process a JSON file and extract relevant information."""
         logger.info(f"Processing JSON file: {file_path}")
         
         try:
+            document = self._load_document(file_path, document)
+            
             # Initialize result structure to match template expectations
             result = {
                 # Top level fields
@@ -40,29 +68,44 @@ class JsonAgent(Agent):
                 "anomalies": []
             }
             
-            # Read the file content
-            with open(file_path, 'r', encoding='utf-8') as file:
-                file_content = file.read()
+            # Files above the stream threshold are analyzed while parsing them
+            # incrementally, keeping only a sample of the text and top level
+            streaming = document.json_streaming
+            if streaming:
+                file_content = document.text_sample()
+                decode_error = document.json_summary.error
+            else:
+                file_content = document.text
+                decode_error = document.json_error
                 
             # Try to parse the JSON
             json_data = {}
             error_context = ""
-            try:
-                json_data = json.loads(file_content)
+            if decode_error is None:
+                json_data = document.json_sample if streaming else document.json_data
                 result["validity"]["is_valid"] = True
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON decode error: {str(e)}")
+            else:
+                logger.warning(f"JSON decode error: {str(decode_error)}")
                 
-                # Format error message
-                error_message = f"JSON syntax error: {str(e)}"
-                result["validity"]["errors"].append(error_message)
-                
-                # Get error context
-                lines = file_content.split('\n')
-                if hasattr(e, 'lineno') and e.lineno <= len(lines):
-                    error_line = lines[e.lineno - 1]
-                    error_context = f"near: {error_line.strip()}"
-                    result["validity"]["errors"].append(error_context)
+                if streaming:
+                    # The streaming parser reports the error, then the input around it
+                    message, _, near = str(decode_error).partition('\n')
+                    result["validity"]["errors"].append(f"JSON syntax error: {message}")
+                    near = near.split('\n')[0].strip()
+                    if near:
+                        error_context = f"near: {near}"
+                        result["validity"]["errors"].append(error_context)
+                else:
+                    # Format error message
+                    error_message = f"JSON syntax error: {str(decode_error)}"
+                    result["validity"]["errors"].append(error_message)
+                    
+                    # Get error context
+                    lines = file_content.split('\n')
+                    if hasattr(decode_error, 'lineno') and decode_error.lineno <= len(lines):
+                        error_line = lines[decode_error.lineno - 1]
+                        error_context = f"near: {error_line.strip()}"
+                        result["validity"]["errors"].append(error_context)
                 
                 # Generate summary for invalid JSON
                 result["summary"] = f"This is an invalid JSON document with syntax errors. Error context: {error_context}"
@@ -82,20 +125,26 @@ class JsonAgent(Agent):
                 # Determine JSON type
                 result["json_type"] = intent_info["document_type"]
                 
-                # Count fields
-                result["structure"]["fields_count"] = self._count_fields(json_data)
+                # Count fields, measure complexity and check for anomalies in one walk
+                if streaming:
+                    structure = document.json_summary
+                else:
+                    structure = walk_json(json_data, self.max_anomalies)
+                result["structure"]["fields_count"] = structure.fields_count
+                result["structure"]["complexity"] = self._determine_complexity(structure)
                 
-                # Determine complexity
-                result["structure"]["complexity"] = self._determine_complexity(json_data)
-                
-                # Check for anomalies
-                anomalies = self._detect_anomalies(json_data)
-                if anomalies:
-                    for anomaly in anomalies:
-                        result["anomalies"].append({
-                            "type": "Data Issue",
-                            "message": anomaly
-                        })
+                anomalies = structure.anomalies[:self.max_anomalies]
+                for anomaly in anomalies:
+                    result["anomalies"].append({
+                        "type": "Data Issue",
+                        "message": anomaly
+                    })
+                unreported = structure.anomaly_count - len(anomalies)
+                if unreported:
+                    result["anomalies"].append({
+                        "type": "Data Issue",
+                        "message": f"{unreported} more anomalies not listed"
+                    })
                 
                 # Generate summary
                 result["summary"] = f"This is a {result['json_type']} with {result['structure']['fields_count']} total fields."
@@ -136,6 +185,11 @@ class JsonAgent(Agent):
                 "anomalies": []
             }
     
+    def cache_inputs(self, metadata):
+        """The indicator words found in the file name."""
+        filename = metadata.get("filename", "").lower()
+        return ",".join(word for word in FILENAME_INDICATORS if word in filename)
+    
     def _determine_document_intent(self, json_data, file_path, filename, is_valid=True, raw_content=""):
         """
         Determine both the document intent and JSON type based on content and filename.
@@ -256,35 +310,37 @@ class JsonAgent(Agent):
         # Convert to lowercase for easier matching
         lower_content = content.lower()
         
+        hits = RAW_INDICATOR_MATCHER.scan(lower_content)
+        
         # Count occurrences of key indicators
         config_indicators = sum([
-            1 if "environment" in lower_content else 0,
-            1 if "config" in lower_content or "configuration" in lower_content else 0,
-            1 if "settings" in lower_content else 0,
-            1 if "database" in lower_content else 0,
-            1 if "host" in lower_content and "port" in lower_content else 0,
-            1 if "features" in lower_content else 0,
-            1 if "api" in lower_content and "key" in lower_content else 0,
-            1 if "development" in lower_content or "production" in lower_content or "staging" in lower_content else 0,
+            1 if "environment" in hits else 0,
+            1 if "config" in hits or "configuration" in hits else 0,
+            1 if "settings" in hits else 0,
+            1 if "database" in hits else 0,
+            1 if "host" in hits and "port" in hits else 0,
+            1 if "features" in hits else 0,
+            1 if "api" in hits and "key" in hits else 0,
+            1 if "development" in hits or "production" in hits or "staging" in hits else 0,
             1 if "config" in filename.lower() else 0,
             1 if "settings" in filename.lower() else 0
         ])
         
         schema_indicators = sum([
             1 if "$schema" in content else 0,
-            1 if "properties" in lower_content and "{" in content else 0,
-            1 if "required" in lower_content and "[" in content else 0,
-            1 if "type" in lower_content and "object" in lower_content else 0,
-            1 if "definitions" in lower_content else 0,
+            1 if "properties" in hits and "{" in content else 0,
+            1 if "required" in hits and "[" in content else 0,
+            1 if "type" in hits and "object" in hits else 0,
+            1 if "definitions" in hits else 0,
             1 if "schema" in filename.lower() else 0
         ])
         
         data_indicators = sum([
-            1 if "items" in lower_content and "[" in content else 0,
-            1 if "data" in lower_content else 0,
-            1 if "records" in lower_content else 0,
-            1 if "results" in lower_content else 0,
-            1 if "list" in lower_content and "[" in content else 0,
+            1 if "items" in hits and "[" in content else 0,
+            1 if "data" in hits else 0,
+            1 if "records" in hits else 0,
+            1 if "results" in hits else 0,
+            1 if "list" in hits and "[" in content else 0,
             1 if "data" in filename.lower() else 0
         ])
         
@@ -309,7 +365,7 @@ class JsonAgent(Agent):
             }
         
         # If we can't determine a more specific type, use the filename
-        if "error" in filename.lower() or "error" in lower_content:
+        if "error" in filename.lower() or "error" in hits:
             return {
                 "intent": "Error Report",
                 "confidence": 0.3,
@@ -322,85 +378,11 @@ class JsonAgent(Agent):
             "document_type": "Generic JSON"
         }
     
-    def _count_fields(self, json_data):
-        """Count the total number of fields in the JSON."""
-        count = 0
-        
-        def count_fields_recursive(obj):
-            nonlocal count
-            if isinstance(obj, dict):
-                count += len(obj)
-                for value in obj.values():
-                    if isinstance(value, (dict, list)):
-                        count_fields_recursive(value)
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        count_fields_recursive(item)
-        
-        count_fields_recursive(json_data)
-        return count
-    
-    def _determine_complexity(self, json_data):
-        """Determine the complexity of the JSON structure."""
-        # Count nesting levels and total nodes
-        max_depth = 0
-        total_nodes = 0
-        
-        def analyze_depth(obj, depth=0):
-            nonlocal max_depth, total_nodes
-            max_depth = max(depth, max_depth)
-            total_nodes += 1
-            
-            if isinstance(obj, dict):
-                for value in obj.values():
-                    if isinstance(value, (dict, list)):
-                        analyze_depth(value, depth + 1)
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        analyze_depth(item, depth + 1)
-        
-        analyze_depth(json_data)
-        
-        # Determine complexity based on depth and size
-        if max_depth <= 2 and total_nodes < 20:
+    def _determine_complexity(self, structure):
+        """Determine the complexity of the JSON structure from its depth and size."""
+        if structure.max_depth <= 2 and structure.total_nodes < 20:
             return "Simple"
-        elif max_depth <= 4 and total_nodes < 50:
+        elif structure.max_depth <= 4 and structure.total_nodes < 50:
             return "Medium"
         else:
-            return "Complex"
-    
-    def _detect_anomalies(self, json_data):
-        """Detect anomalies in the JSON data."""
-        anomalies = []
-        
-        if not isinstance(json_data, (dict, list)):
-            return anomalies
-        
-        def check_anomalies(obj, path=""):
-            if isinstance(obj, dict):
-                for key, value in obj.items():
-                    current_path = f"{path}.{key}" if path else key
-                    
-                    # Check null values
-                    if value is None:
-                        anomalies.append(f"Missing value for field '{current_path}'")
-                    
-                    # Check numeric fields with non-numeric values
-                    if key in ["price", "amount", "total", "unit_price"] and not isinstance(value, (int, float)):
-                        anomalies.append(f"Field '{current_path}' should be numeric but is {type(value).__name__}")
-                    
-                    # Recurse into nested objects
-                    if isinstance(value, (dict, list)):
-                        check_anomalies(value, current_path)
-            
-            elif isinstance(obj, list):
-                # Check array items
-                for i, item in enumerate(obj):
-                    if isinstance(item, (dict, list)):
-                        check_anomalies(item, f"{path}[{i}]")
-        
-        # Start the recursive check
-        check_anomalies(json_data)
-        return anomalies
\ No newline at end of file
+            return "Complex"
\ No newline at end of file
@@ -4,11 +4,26 @@ import logging
 import os
 from datetime import datetime
 import re
-import PyPDF2
 from agents.base_agent import Agent
+from utils.text_processor import KeywordMatcher, KeywordTally
 
 logger = logging.getLogger(__name__)
 
+# Key terms for each document type
+DOCUMENT_TYPE_MATCHER = KeywordMatcher({
+    "invoice": ["invoice", "bill", "payment", "amount due", "total due", "subtotal"],
+    "policy": ["policy", "regulation", "compliance", "guidelines", "terms and conditions",
+               "gdpr", "hipaa", "ccpa", "pci", "sox"],
+    "report": ["report", "analysis", "study", "findings", "results", "quarterly", "annual", "executive summary"],
+    "resume": ["resume", "cv", "experience", "education", "skills", "employment", "work history",
+               "qualifications", "profile", "references", "certifications"],
+    "resume_patterns": ["work experience", "professional experience", "education", "skills"],
+    "report_patterns": ["executive summary", "key findings", "market analysis"]
+})
+
+# Document type detection stops at the first page where one type leads the next by this much
+DECISIVE_TYPE_LEAD = 10
+
 class PdfAgent(Agent):
     """
     Agent specialized in processing PDF files.
@@ -16,98 +31,102 @@ class PdfAgent(Agent):
     and flags specific conditions like high-value invoices.
     """
     
+    # 2: document type detection stops at the first decisive page
+    version = "2"
+    
     def __init__(self, memory_store):
         super().__init__(memory_store)
         
-    def process(self, file_path, metadata):
+    def process(self, file_path, metadata, document=None):
         """Process a PDF file and extract relevant information."""
         logger.info(f"Processing PDF file: {file_path}")
         
         try:
-            # Open the PDF file
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Get basic PDF info
-                num_pages = len(pdf_reader.pages)
-                
-                # Extract text from all pages
-                full_text = ""
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n\n"
-                
-                # Determine document type
-                document_type = self._determine_document_type(full_text)
-                
-                # Process based on document type
-                if document_type == "Invoice":
-                    invoice_data = self._extract_invoice_data(full_text)
-                    result = {
-                        "document_type": document_type,
-                        "page_count": num_pages,
-                        "invoice_data": invoice_data,
-                        "summary": self._generate_summary(full_text, document_type, invoice_data)
-                    }
-                elif document_type == "Policy Document":
-                    policy_data = self._extract_policy_data(full_text)
-                    result = {
-                        "document_type": document_type,
-                        "page_count": num_pages,
-                        "policy_data": policy_data,
-                        "summary": self._generate_summary(full_text, document_type, policy_data)
-                    }
-                elif document_type == "Resume":
-                    resume_data = self._extract_resume_data(full_text)
-                    result = {
-                        "document_type": document_type,
-                        "page_count": num_pages,
-                        "resume_data": resume_data,
-                        "summary": self._generate_summary(full_text, document_type, resume_data)
-                    }
-                else:
-                    result = {
-                        "document_type": document_type,
-                        "page_count": num_pages,
-                        "summary": self._generate_summary(full_text, document_type)
-                    }
-                
-                # Store the results in memory
-                document_id = metadata["document_id"]
-                self.memory_store.store(document_id, "pdf_analysis", result)
-                
-                return result
-                
+            document = self._load_document(file_path, document)
+            
+            # Get basic PDF info
+            num_pages = document.page_count
+            
+            # Extract text from all pages
+            full_text = "".join(page_text + "\n\n" for page_text in document.page_texts if page_text)
+            
+            # Determine document type
+            document_type = self._determine_document_type(document.iter_page_texts())
+            
+            # Process based on document type
+            if document_type == "Invoice":
+                invoice_data = self._extract_invoice_data(full_text)
+                result = {
+                    "document_type": document_type,
+                    "page_count": num_pages,
+                    "invoice_data": invoice_data,
+                    "summary": self._generate_summary(full_text, document_type, invoice_data)
+                }
+            elif document_type == "Policy Document":
+                policy_data = self._extract_policy_data(full_text)
+                result = {
+                    "document_type": document_type,
+                    "page_count": num_pages,
+                    "policy_data": policy_data,
+                    "summary": self._generate_summary(full_text, document_type, policy_data)
+                }
+            elif document_type == "Resume":
+                resume_data = self._extract_resume_data(full_text)
+                result = {
+                    "document_type": document_type,
+                    "page_count": num_pages,
+                    "resume_data": resume_data,
+                    "summary": self._generate_summary(full_text, document_type, resume_data)
+                }
+            else:
+                result = {
+                    "document_type": document_type,
+                    "page_count": num_pages,
+                    "summary": self._generate_summary(full_text, document_type)
+                }
+            
+            # Store the results in memory
+            document_id = metadata["document_id"]
+            self.memory_store.store(document_id, "pdf_analysis", result)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Error processing PDF: {e}", exc_info=True)
             raise
     
-    def _determine_document_type(self, text):
-        """Determine the type of PDF document based on content analysis."""
-        text_lower = text.lower()
-        
-        # Count occurrences of key terms for each document type
-        invoice_terms = ["invoice", "bill", "payment", "amount due", "total due", "subtotal"]
-        policy_terms = ["policy", "regulation", "compliance", "guidelines", "terms and conditions", 
-                       "gdpr", "hipaa", "ccpa", "pci", "sox"]
-        report_terms = ["report", "analysis", "study", "findings", "results", "quarterly", "annual", "executive summary"]
-        resume_terms = ["resume", "cv", "experience", "education", "skills", "employment", "work history", 
-                       "qualifications", "profile", "references", "certifications"]
-        
-        invoice_count = sum(text_lower.count(term) for term in invoice_terms)
-        policy_count = sum(text_lower.count(term) for term in policy_terms)
-        report_count = sum(text_lower.count(term) for term in report_terms)
-        resume_count = sum(text_lower.count(term) for term in resume_terms)
+    def _document_type_counts(self, hits):
+        """Count the key terms of each document type: invoice, policy, report and resume."""
+        invoice_count = hits.total("invoice")
+        policy_count = hits.total("policy")
+        report_count = hits.total("report")
+        resume_count = hits.total("resume")
         
         # Resume-specific patterns
-        if any(pattern in text_lower for pattern in ["work experience", "professional experience", "education", "skills"]):
+        if hits.any("resume_patterns"):
             resume_count += 3
         
         # Report-specific patterns
-        if any(pattern in text_lower for pattern in ["executive summary", "key findings", "market analysis"]):
+        if hits.any("report_patterns"):
             report_count += 3
         
+        return invoice_count, policy_count, report_count, resume_count
+    
+    def _determine_document_type(self, page_texts):
+        """
+        Determine the type of PDF document based on content analysis.
+        
+        Pages are scored one at a time, stopping once one type clearly leads.
+        """
+        tally = KeywordTally(DOCUMENT_TYPE_MATCHER)
+        for page_text in page_texts:
+            tally.add(page_text.lower())
+            counts = sorted(self._document_type_counts(tally), reverse=True)
+            if counts[0] >= 2 and counts[0] - counts[1] >= DECISIVE_TYPE_LEAD:
+                break
+        
+        invoice_count, policy_count, report_count, resume_count = self._document_type_counts(tally)
+        
         # Determine document type based on highest count with minimum threshold
         max_count = max(invoice_count, policy_count, report_count, resume_count)
         
@@ -2,11 +2,16 @@
 
 import os
 import uuid
+import asyncio
+import hashlib
 import logging
-import shutil
+import mimetypes
+import time
+import zipfile
 from datetime import datetime
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, Response
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Query, Body
+from typing import List
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -22,9 +27,25 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 from agents.email_agent import EmailAgent
 from agents.pdf_agent import PdfAgent
 from agents.json_agent import JsonAgent
-from agents.classifier_agent import ClassifierAgent
-from memory.memory_store import MemoryStore  # Import from the correct module
-from router.action_router import ActionRouter
+from agents.classifier_agent import ClassifierAgent, INTENT_KEYWORDS
+from memory import get_memory_store
+from memory.memory_store import STORE_LATENCY, query_cursor
+from memory.action_outbox import ActionOutbox
+from memory.page_cache import PageTextCache
+from memory.result_cache import RecordingStore, ResultCache
+from memory.schema import ClassificationResult, DocumentMetadata
+from memory.trace_store import TraceStore
+from router.action_dispatcher import ActionDispatcher
+from router.action_router import ACTION_OUTCOMES, ActionRouter
+from router.outbox_dispatcher import OutboxDispatcher
+from router.routing_rules import RoutingRules
+from utils import config, tracing
+from utils.parsed_document import ParsedDocument
+from utils.pdf_parser import EXTRACTOR_VERSION, extract_page_range, split_pages
+from utils.job_queue import JobQueue, JobQueueFull
+from utils.metrics import LATENCY_BUCKETS, Counter, Exposition, Histogram, HistogramFamily, process_memory
+from utils.tracing import StageTracer
+from utils.worker_pool import WorkerPool
 
 # Configure logging
 logging.basicConfig(
@@ -50,6 +71,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics served by /metrics; observing one is a bucket increment, the
+# text is only built when they are scraped
+REQUEST_BUCKETS = LATENCY_BUCKETS + (30.0, 60.0)
+REQUEST_SECONDS = HistogramFamily(("method", "route"), REQUEST_BUCKETS)
+PROCESSING_SECONDS = Histogram(REQUEST_BUCKETS)
+CLASSIFICATION_SECONDS = Histogram()
+AGENT_SECONDS = HistogramFamily(("agent",))
+DOCUMENTS_PROCESSED = Counter(("format", "intent"))
+DOCUMENTS_FAILED = Counter()
+# Intents counted under their own label; other user-supplied intents count as "other"
+METRIC_INTENTS = frozenset(INTENT_KEYWORDS) | {"Unknown"}
+
+class RequestMetricsMiddleware:
+    """
+    Times each request by method and route template into REQUEST_SECONDS,
+    until its response is sent (streamed exports included). Requests that
+    match no route are not timed.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Set by the router on the shared scope once a route matched
+            route = scope.get("route")
+            if route is not None:
+                REQUEST_SECONDS.labels(scope["method"], route.path).observe(time.perf_counter() - start)
+
+app.add_middleware(RequestMetricsMiddleware)
+
 # Initialize templates
 templates = Jinja2Templates(directory="templates")
 
@@ -58,19 +117,332 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Set up temporary file directory
 TEMP_DIR = "temp_files"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Initialize shared memory store
-memory_store = MemoryStore()
+# Initialize shared memory store (the backend configured in utils/config.py)
+memory_store = get_memory_store()
+
+# Agents write through a recorder so their results can be cached per content hash
+agent_store = RecordingStore(memory_store)
 
 # Initialize agents
-classifier_agent = ClassifierAgent(memory_store)
-email_agent = EmailAgent(memory_store)
-pdf_agent = PdfAgent(memory_store)
-json_agent = JsonAgent(memory_store)
+classifier_agent = ClassifierAgent(agent_store)
+email_agent = EmailAgent(agent_store)
+pdf_agent = PdfAgent(agent_store)
+json_agent = JsonAgent(agent_store, max_anomalies=config.JSON_MAX_ANOMALIES)
+
+AGENTS = (classifier_agent, email_agent, pdf_agent, json_agent)
 
-# Initialize action router
-action_router = ActionRouter(memory_store)
+# Cached results are only reused while every agent is at the same version
+AGENT_VERSION = ",".join(f"{type(agent).__name__}={agent.version}" for agent in AGENTS)
+result_cache = ResultCache(config.RESULT_CACHE_SIZE)
+
+# Per-stage timings of the recently received documents, for diagnosing slow ones
+trace_store = TraceStore(config.TRACE_STORE_SIZE)
+
+# Text extracted from PDF pages, kept on disk across restarts and agent version changes
+page_cache = None
+if config.PAGE_CACHE_PATH:
+    page_cache = PageTextCache(config.PAGE_CACHE_PATH, EXTRACTOR_VERSION, config.PAGE_CACHE_MAX_MB * 1024 * 1024)
+
+# Initialize action router, sending its API calls over a pooled HTTP client if configured
+action_dispatcher = None
+if config.ACTION_API_BASE_URL:
+    action_dispatcher = ActionDispatcher(
+        config.ACTION_API_BASE_URL,
+        timeout=config.ACTION_API_TIMEOUT,
+        max_connections=config.ACTION_API_MAX_CONNECTIONS,
+        endpoint_concurrency=config.ACTION_API_ENDPOINT_CONCURRENCY,
+        retries=config.ACTION_API_RETRIES,
+        backoff_base=config.ACTION_API_BACKOFF
+    )
+# Actions are queued in a durable outbox and delivered in batches by a background thread
+action_outbox = ActionOutbox(config.ACTION_OUTBOX_PATH) if config.ACTION_OUTBOX_PATH else None
+routing_rules = RoutingRules(config.ROUTING_RULES_PATH)
+action_router = ActionRouter(memory_store, action_dispatcher, action_outbox, routing_rules, trace_store)
+
+outbox_dispatcher = None
+if action_outbox is not None:
+    # Claimed entries stay reserved for the longest delivery of one endpoint
+    # group (the lease is renewed between groups), plus a minute to settle it
+    outbox_lease = 60.0
+    if action_dispatcher is not None:
+        outbox_lease += action_dispatcher.max_delivery_seconds(
+            1 if config.ACTION_BULK_SUFFIX else config.ACTION_OUTBOX_BATCH_SIZE
+        )
+    outbox_dispatcher = OutboxDispatcher(
+        action_outbox,
+        action_router,
+        batch_size=config.ACTION_OUTBOX_BATCH_SIZE,
+        max_attempts=config.ACTION_OUTBOX_MAX_ATTEMPTS,
+        bulk_suffix=config.ACTION_BULK_SUFFIX,
+        lease=outbox_lease,
+        retention=config.ACTION_OUTBOX_RETENTION_HOURS * 3600 if config.ACTION_OUTBOX_RETENTION_HOURS else None
+    )
+
+# Initialize worker pool so agent work runs off the event loop
+worker_pool = WorkerPool(config.WORKER_THREADS, config.PDF_PROCESS_WORKERS)
+
+@app.on_event("shutdown")
+def shutdown_worker_pool():
+    job_queue.shutdown()
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.shutdown()
+    worker_pool.shutdown(wait=False)
+    memory_store.close()
+    if page_cache is not None:
+        page_cache.close()
+    if action_dispatcher is not None:
+        action_dispatcher.close()
+    if action_outbox is not None:
+        action_outbox.close()
+
+def receive_upload(upload, filename, content_type):
+    """
+    Save an uploaded file and register it in the memory store.
+    
+    Args:
+        upload: File object of the upload
+        filename (str): Original filename
+        content_type (str): MIME type reported by the client
+    
+    Returns:
+        tuple: (document_id, file_path, metadata)
+    """
+    # Generate a unique ID for this document
+    document_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat()
+    tracer = StageTracer(trace_store.start(DocumentMetadata(
+        document_id=document_id, filename=filename, content_type=content_type, upload_time=timestamp, size=0
+    )))
+    
+    # Save the file temporarily (prefixed so uploads with the same name don't collide),
+    # hashing the content on the way to disk
+    file_path = os.path.join(TEMP_DIR, f"{document_id}_{filename}")
+    content_hash = hashlib.sha256()
+    with tracer.stage("file_save") as stage, open(file_path, "wb") as buffer:
+        for chunk in iter(lambda: upload.read(UPLOAD_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+            buffer.write(chunk)
+            stage.bytes_read += len(chunk)
+    
+    # Create metadata
+    metadata = {
+        "document_id": document_id,
+        "filename": filename,
+        "content_type": content_type,
+        "size": os.path.getsize(file_path),
+        "upload_time": timestamp,
+        "sha256": content_hash.hexdigest(),
+        "user": "Prudhvi-Vinayak"  # In a real app, this would be from auth
+    }
+    
+    tracer.trace.metadata.size = metadata["size"]
+    tracer.trace.metadata.user = metadata["user"]
+    
+    # Store metadata in memory
+    with tracer.stage("store_write"), memory_store.batch():
+        memory_store.store(document_id, "metadata", metadata)
+        memory_store.update_status(document_id, "received")
+    
+    return document_id, file_path, metadata
+
+def extract_pdf_pages(document):
+    """
+    Extract the text of the PDF pages not read yet on the process pool.
+    
+    The classifier reads the first pages lazily; the pages after them are
+    split into one page range per worker process when there are at least
+    PDF_PARALLEL_MIN_PAGES of them, and extracted by a single worker
+    otherwise.
+    
+    Returns:
+        list: Page texts of every page in page order
+    """
+    start = document.pages_extracted
+    page_count = document.page_count
+    remaining = page_count - start
+    if remaining <= 0:
+        return document.page_texts
+    
+    if worker_pool.process_workers < 2 or remaining < config.PDF_PARALLEL_MIN_PAGES:
+        ranges = [(start, page_count)]
+    else:
+        ranges = [(start + first, start + stop) for first, stop in split_pages(remaining, worker_pool.process_workers)]
+    futures = [worker_pool.submit_process(extract_page_range, document.raw_bytes, first, stop) for first, stop in ranges]
+    
+    page_texts = [document.page_text(i) for i in range(start)]
+    for future in futures:
+        page_texts.extend(future.result())
+    return page_texts
+
+def process_document(document_id, file_path, metadata, intent=""):
+    """
+    Classify a saved upload and run the agent for its format, timing each
+    stage into the document's trace.
+    Runs on a worker thread; PDF text extraction goes to the process pool.
+    
+    Returns:
+        dict: The stored classification, including the format agent's updates
+    """
+    # Restart the trace if it was dropped while the document waited in the job queue
+    trace = trace_store.get(document_id) or trace_store.start(DocumentMetadata(**metadata))
+    tracer = StageTracer(trace)
+    
+    start = time.perf_counter()
+    try:
+        with tracing.activate(tracer):
+            classification_result = analyze_document(document_id, file_path, metadata, intent, tracer)
+    except Exception:
+        trace.status = "error"
+        DOCUMENTS_FAILED.inc()
+        raise
+    finally:
+        PROCESSING_SECONDS.observe(time.perf_counter() - start)
+    
+    trace.classification = ClassificationResult(document_id=document_id, **classification_result)
+    trace.status = "analyzed"
+    intent = classification_result.get("intent")
+    DOCUMENTS_PROCESSED.inc(classification_result.get("format"), intent if intent in METRIC_INTENTS else "other")
+    return classification_result
+
+def analyze_document(document_id, file_path, metadata, intent, tracer):
+    """
+    Run the classifier and format agents on a saved upload, or replay the
+    cached results of identical content.
+    
+    Returns:
+        dict: The stored classification, including the format agent's updates
+    """
+    # Identical content already processed by the same agent versions: replay its results
+    name_inputs = "|".join(agent.cache_inputs(metadata) for agent in AGENTS)
+    cache_key = ResultCache.make_key(metadata["sha256"], AGENT_VERSION, intent, name_inputs)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        tracer.trace.cached = True
+        with tracer.stage("store_write"), memory_store.batch():
+            for data_type, data in cached["writes"]:
+                memory_store.store(document_id, data_type, data)
+            memory_store.update_status(document_id, "analyzed")
+        return cached["classification"]
+    
+    # Parse the file once and share it between the classifier and the format agents
+    document = ParsedDocument(
+        file_path,
+        json_stream_threshold=config.JSON_STREAM_THRESHOLD,
+        json_max_anomalies=config.JSON_MAX_ANOMALIES,
+        page_cache=page_cache,
+        content_hash=metadata["sha256"]
+    )
+    tracer.bytes_source = lambda: document.bytes_read
+    
+    # Send the classification, analysis and status writes together; the
+    # writes a batch sends when it closes count as store time
+    with tracer.stage("store_write"), memory_store.batch(), agent_store.record() as writes:
+        # Classify the document
+        with tracer.stage("intent_detection"), CLASSIFICATION_SECONDS.time():
+            classification_result = classifier_agent.classify(file_path, metadata, user_intent=intent, document=document)
+        agent_store.store(document_id, "classification", classification_result)
+        
+        # Process the document based on its format
+        format_type = classification_result.get("format")
+        
+        with tracer.stage("agent_extraction") as stage, AGENT_SECONDS.labels(format_type).time():
+            if format_type == "email":
+                email_agent.process(file_path, metadata, document=document)
+            elif format_type == "pdf":
+                # The classifier read the first pages at most; PdfAgent needs all of them
+                if not document.pages_cached:
+                    page_texts = extract_pdf_pages(document)
+                    document.page_texts = page_texts
+                    if page_cache is not None:
+                        page_cache.put(metadata["sha256"], page_texts)
+                pdf_agent.process(file_path, metadata, document=document)
+                stage.page_count = document.page_count
+            elif format_type == "json":
+                json_agent.process(file_path, metadata, document=document)
+            else:
+                raise ValueError(f"Unsupported format: {format_type}")
+            stage.field_count = sum(len(data) for data_type, data in writes[1:] if isinstance(data, dict))
+        
+        # Update status to analyzed
+        memory_store.update_status(document_id, "analyzed")
+    
+    # A format agent may have stored a refined classification (JsonAgent's intent)
+    classification_result = next(data for data_type, data in reversed(writes) if data_type == "classification")
+    result_cache.put(cache_key, {"classification": classification_result, "writes": writes})
+    
+    return classification_result
+
+def receive_and_process(upload, filename, content_type, intent=""):
+    """
+    Save and process an upload, sending all of its store writes together.
+    
+    Returns:
+        str: The document ID
+    """
+    with memory_store.batch():
+        document_id, file_path, metadata = receive_upload(upload, filename, content_type)
+        process_document(document_id, file_path, metadata, intent)
+    
+    return document_id
+
+def process_job(document_id, file_path, metadata, intent=""):
+    """Process a queued upload, recording failures on the document."""
+    try:
+        process_document(document_id, file_path, metadata, intent)
+    except Exception as e:
+        memory_store.store(document_id, "error", {"message": str(e)})
+        memory_store.update_status(document_id, "error")
+        raise
+
+def receive_batch_file(upload, filename, content_type):
+    """
+    Save one file of a batch upload, expanding zip archives into their members.
+    
+    Returns:
+        list: (document_id, file_path, metadata) for every document received
+    """
+    if not (filename.lower().endswith(".zip") or content_type in ("application/zip", "application/x-zip-compressed")):
+        return [receive_upload(upload, filename, content_type)]
+    
+    received = []
+    with zipfile.ZipFile(upload) as archive, memory_store.batch():
+        for member in archive.infolist():
+            member_name = os.path.basename(member.filename)
+            # Skip directories and macOS resource forks
+            if member.is_dir() or not member_name or member.filename.startswith("__MACOSX/"):
+                continue
+            
+            member_type = mimetypes.guess_type(member_name)[0] or "application/octet-stream"
+            with archive.open(member) as member_file:
+                received.append(receive_upload(member_file, member_name, member_type))
+    
+    return received
+
+def process_batch_document(document_id, file_path, metadata, intent=""):
+    """Process one document of a batch and report its outcome and timing."""
+    start = time.perf_counter()
+    result = {"document_id": document_id, "filename": metadata["filename"]}
+    
+    try:
+        classification = process_document(document_id, file_path, metadata, intent)
+        result.update({
+            "status": "analyzed",
+            "format": classification.get("format"),
+            "intent": classification.get("intent")
+        })
+    except Exception as e:
+        logger.error(f"Error processing batch document {document_id}: {e}", exc_info=True)
+        memory_store.update_status(document_id, "error")
+        result.update({"status": "error", "error": str(e)})
+    
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+# Initialize job queue for asynchronous uploads
+job_queue = JobQueue(process_job, workers=config.JOB_WORKERS, max_size=config.JOB_QUEUE_SIZE)
 
 # Home page route
 @app.get("/", response_class=HTMLResponse)
@@ -89,47 +461,9 @@ async def home(request: Request):
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...), intent: str = Form("")):
     try:
-        # Generate a unique ID for this document
-        document_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Save the file temporarily
-        file_path = os.path.join(TEMP_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Create metadata
-        metadata = {
-            "document_id": document_id,
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "size": os.path.getsize(file_path),
-            "upload_time": timestamp,
-            "user": "Prudhvi-Vinayak"  # In a real app, this would be from auth
-        }
-        
-        # Store metadata in memory
-        memory_store.store(document_id, "metadata", metadata)
-        memory_store.update_status(document_id, "received")
-        
-        # Classify the document
-        classification_result = classifier_agent.classify(file_path, metadata, user_intent=intent)
-        memory_store.store(document_id, "classification", classification_result)
-        
-        # Process the document based on its format
-        format_type = classification_result.get("format")
-        
-        if format_type == "email":
-            email_agent.process(file_path, metadata)
-        elif format_type == "pdf":
-            pdf_agent.process(file_path, metadata)
-        elif format_type == "json":
-            json_agent.process(file_path, metadata)
-        else:
-            raise ValueError(f"Unsupported format: {format_type}")
-        
-        # Update status to analyzed
-        memory_store.update_status(document_id, "analyzed")
+        document_id = await worker_pool.run_in_thread(
+            receive_and_process, file.file, file.filename, file.content_type, intent
+        )
         
         # Redirect to results page
         return RedirectResponse(url=f"/results/{document_id}", status_code=303)
@@ -138,6 +472,122 @@ async def upload_file(file: UploadFile = File(...), intent: str = Form("")):
         logger.error(f"Error processing upload: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch upload route
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...), intent: str = Form("")):
+    start = time.perf_counter()
+    
+    # Save every file (and zip member) first
+    received = []
+    try:
+        for file in files:
+            received.extend(await worker_pool.run_in_thread(
+                receive_batch_file, file.file, file.filename, file.content_type
+            ))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+    except Exception as e:
+        logger.error(f"Error receiving batch upload: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    receive_seconds = time.perf_counter() - start
+    
+    # Fan the documents out across the worker pool
+    results = await asyncio.gather(*(
+        worker_pool.run_in_thread(process_batch_document, document_id, file_path, metadata, intent)
+        for document_id, file_path, metadata in received
+    ))
+    
+    elapsed = time.perf_counter() - start
+    per_document = [result["seconds"] for result in results]
+    
+    return {
+        "documents": results,
+        "timing": {
+            "documents": len(results),
+            "succeeded": sum(1 for result in results if result["status"] == "analyzed"),
+            "failed": sum(1 for result in results if result["status"] == "error"),
+            "receive_seconds": round(receive_seconds, 4),
+            "total_seconds": round(elapsed, 4),
+            "documents_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+            "mean_document_seconds": round(sum(per_document) / len(per_document), 4) if per_document else None,
+            "max_document_seconds": max(per_document) if per_document else None
+        }
+    }
+
+# Asynchronous upload route
+@app.post("/upload/async", status_code=202)
+async def upload_file_async(file: UploadFile = File(...), intent: str = Form("")):
+    # Reject early instead of saving files we cannot process
+    if job_queue.full():
+        raise HTTPException(status_code=503, detail="Job queue is full", headers={"Retry-After": "5"})
+    
+    try:
+        document_id, file_path, metadata = await worker_pool.run_in_thread(
+            receive_upload, file.file, file.filename, file.content_type
+        )
+    except Exception as e:
+        logger.error(f"Error receiving upload: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        job_queue.submit(document_id, document_id, file_path, metadata, intent)
+    except JobQueueFull as e:
+        memory_store.update_status(document_id, "error")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "document_id": document_id,
+            "status": "received",
+            "status_url": f"/jobs/{document_id}",
+            "results_url": f"/results/{document_id}"
+        }
+    )
+
+# Job status route
+@app.get("/jobs/{document_id}")
+async def get_job_status(document_id: str):
+    document = await worker_pool.run_in_thread(memory_store.get, document_id)
+    
+    if not document:
+        raise HTTPException(status_code=404, detail=f"Document with ID {document_id} not found")
+    
+    data = document.get("data", {})
+    return {
+        "document_id": document_id,
+        "status": document.get("status", "unknown"),
+        "job": job_queue.get(document_id),
+        "classification": data.get("classification"),
+        "error": data.get("error", {}).get("message"),
+        "results_url": f"/results/{document_id}"
+    }
+
+# Document listing route, most recently updated first, paged by cursor
+@app.get("/documents")
+async def list_documents(limit: int = Query(100, ge=1, le=1000), cursor: str = Query("")):
+    try:
+        documents, next_cursor = await worker_pool.run_in_thread(memory_store.list_documents, limit, cursor or None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    
+    return {"documents": documents, "next_cursor": next_cursor}
+
+# Processing trace routes: per-stage timings of a document, and the slowest recent documents
+@app.get("/traces")
+async def list_traces(limit: int = Query(20, ge=1, le=1000)):
+    return {"documents": trace_store.slowest(limit), **trace_store.stats()}
+
+@app.get("/traces/{document_id}")
+async def get_trace(document_id: str):
+    trace = trace_store.get(document_id)
+    
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"No processing trace for document {document_id}")
+    
+    return trace.model_dump(mode="json")
+
 # Results page route
 @app.get("/results/{document_id}", response_class=HTMLResponse)
 async def get_results(document_id: str, request: Request):
@@ -188,7 +638,7 @@ async def get_results(document_id: str, request: Request):
 async def trigger_action(document_id: str, action: str = None):
     try:
         # Route the document to the appropriate action
-        result = action_router.route_action(document_id, action)
+        result = await worker_pool.run_in_thread(action_router.route_action, document_id, action)
         
         if not result.get("success", False):
             raise HTTPException(status_code=400, detail=result.get("message", "Action failed"))
@@ -203,6 +653,16 @@ async def trigger_action(document_id: str, action: str = None):
         logger.error(f"Error triggering action: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Bulk action route, e.g. to re-route a backlog after a routing rule change
+@app.post("/trigger-actions")
+async def trigger_actions(document_ids: List[str] = Body(..., embed=True), action: str = None):
+    results = await worker_pool.run_in_thread(action_router.route_many, document_ids, action)
+    return {
+        "results": results,
+        "succeeded": sum(1 for result in results.values() if result.get("success")),
+        "failed": sum(1 for result in results.values() if not result.get("success"))
+    }
+
 # Dashboard route
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(
@@ -210,59 +670,46 @@ async def dashboard(
     page: int = Query(1, ge=1),
     format_filter: str = Query(""),
     status_filter: str = Query(""),
-    date_filter: str = Query("")
+    date_filter: str = Query(""),
+    cursor: str = Query(""),
+    before: str = Query("")
 ):
     try:
-        # Get all documents from memory
-        all_documents = memory_store.get_all()
-        
-        # Apply filters
-        filtered_docs = all_documents
-        
-        if format_filter:
-            filtered_docs = [
-                doc for doc in filtered_docs
-                if doc.get("data", {}).get("classification", {}).get("format") == format_filter
-            ]
-        
-        if status_filter:
-            filtered_docs = [doc for doc in filtered_docs if doc.get("status") == status_filter]
-        
-        if date_filter:
-            filtered_docs = [
-                doc for doc in filtered_docs
-                if doc.get("data", {}).get("metadata", {}).get("upload_time", "").startswith(date_filter)
-            ]
-        
-        # Count formats and statuses
-        format_counts = {}
-        status_counts = {}
-        
-        for doc in all_documents:
-            # Count formats
-            fmt = doc.get("data", {}).get("classification", {}).get("format")
-            if fmt:
-                format_counts[fmt] = format_counts.get(fmt, 0) + 1
-            
-            # Count statuses
-            status = doc.get("status")
-            if status:
-                status_counts[status] = status_counts.get(status, 0) + 1
+        filters = {
+            "format": format_filter or None,
+            "status": status_filter or None,
+            "date_prefix": date_filter or None
+        }
         
-        # Sort by upload time (newest first)
-        filtered_docs.sort(
-            key=lambda x: x.get("data", {}).get("metadata", {}).get("upload_time", ""),
-            reverse=True
-        )
+        # Read the maintained format and status counts
+        counts = await worker_pool.run_in_thread(memory_store.get_counts)
         
-        # Simple pagination
+        # Page numbers are for display; the store pages by cursor from the neighbouring page
         per_page = 10
-        total_pages = max(1, (len(filtered_docs) + per_page - 1) // per_page)
+        matching = await worker_pool.run_in_thread(memory_store.count, **filters)
+        total_pages = max(1, (matching + per_page - 1) // per_page)
         page = min(page, total_pages)
         
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_docs = filtered_docs[start_idx:end_idx]
+        try:
+            if before:
+                # Walk back from the first document of the next page
+                paginated_docs, older = await worker_pool.run_in_thread(
+                    memory_store.query, **filters, sort="upload_time", cursor=before, limit=per_page
+                )
+                paginated_docs.reverse()
+                has_prev = older is not None
+                has_next = True
+            else:
+                paginated_docs, newer = await worker_pool.run_in_thread(
+                    memory_store.query, **filters, cursor=cursor or None, limit=per_page
+                )
+                has_prev = bool(cursor)
+                has_next = newer is not None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        
+        if not paginated_docs:
+            has_prev = has_next = False
         
         current_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
         
@@ -272,21 +719,26 @@ async def dashboard(
             {
                 "request": request,
                 "documents": paginated_docs,
-                "total_count": len(all_documents),
-                "format_counts": format_counts,
-                "status_counts": status_counts,
+                "total_count": counts["total_count"],
+                "format_counts": counts["format_counts"],
+                "status_counts": counts["status_counts"],
                 "format_filter": format_filter,
                 "status_filter": status_filter,
                 "date_filter": date_filter,
                 "page": page,
                 "total_pages": total_pages,
-                "has_prev": page > 1,
-                "has_next": page < total_pages,
+                "has_prev": has_prev,
+                "has_next": has_next,
+                "prev_cursor": query_cursor(paginated_docs[0]) if has_prev else "",
+                "next_cursor": query_cursor(paginated_docs[-1]) if has_next else "",
                 "current_user": "Prudhvi-Vinayak",  # In a real app, this would be from auth
                 "current_time": current_time
             }
         )
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
         logger.error(f"Error displaying dashboard: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -295,33 +747,11 @@ async def dashboard(
 @app.get("/dashboard/metrics", response_class=HTMLResponse)
 async def dashboard_metrics(request: Request):
     try:
-        # Get all documents from memory
-        all_documents = memory_store.get_all()
-        
-        # Count formats and statuses
-        format_counts = {}
-        status_counts = {}
-        daily_counts = {}
-        
-        for doc in all_documents:
-            # Count formats
-            fmt = doc.get("data", {}).get("classification", {}).get("format")
-            if fmt:
-                format_counts[fmt] = format_counts.get(fmt, 0) + 1
-            
-            # Count statuses
-            status = doc.get("status")
-            if status:
-                status_counts[status] = status_counts.get(status, 0) + 1
-            
-            # Daily counts
-            upload_time = doc.get("data", {}).get("metadata", {}).get("upload_time", "")
-            if upload_time:
-                date = upload_time.split("T")[0]  # Extract date part
-                daily_counts[date] = daily_counts.get(date, 0) + 1
+        # Read the maintained format, status and daily counts
+        counts = await worker_pool.run_in_thread(memory_store.get_counts)
         
-        # Get any documents with errors for display
-        error_documents = [doc for doc in all_documents if doc.get("status") == "error"][:5]
+        # Get the most recent documents with errors for display
+        error_documents, _ = await worker_pool.run_in_thread(memory_store.query, status="error", limit=5)
         
         current_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
         
@@ -330,10 +760,10 @@ async def dashboard_metrics(request: Request):
             "dashboard_metrics.html",
             {
                 "request": request,
-                "total_count": len(all_documents),
-                "format_counts": format_counts,
-                "status_counts": status_counts,
-                "daily_counts": daily_counts,
+                "total_count": counts["total_count"],
+                "format_counts": counts["format_counts"],
+                "status_counts": counts["status_counts"],
+                "daily_counts": counts["daily_counts"],
                 "error_documents": error_documents,
                 "current_user": "Prudhvi-Vinayak",  # In a real app, this would be from auth
                 "current_time": current_time
@@ -344,83 +774,101 @@ async def dashboard_metrics(request: Request):
         logger.error(f"Error displaying metrics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Documents per store query while streaming an export
+EXPORT_BATCH_SIZE = 500
+
+def export_document(doc):
+    """Minimal document info included in the JSON and NDJSON exports."""
+    data = doc.get("data", {})
+    return {
+        "document_id": doc.get("document_id"),
+        "status": doc.get("status"),
+        "format": data.get("classification", {}).get("format"),
+        "intent": data.get("classification", {}).get("intent"),
+        "upload_time": data.get("metadata", {}).get("upload_time")
+    }
+
+def stream_json_export(counts):
+    """Yield the JSON export one page of documents at a time."""
+    header = json.dumps({
+        "total_count": counts["total_count"],
+        "format_distribution": counts["format_counts"],
+        "status_distribution": counts["status_counts"],
+        "daily_processing": counts["daily_counts"]
+    })
+    yield header[:-1] + ', "documents": ['
+    
+    separator = ""
+    for documents in memory_store.iter_document_pages(EXPORT_BATCH_SIZE):
+        yield separator + ", ".join(json.dumps(export_document(doc)) for doc in documents)
+        separator = ", "
+    
+    yield "]}"
+
+def stream_ndjson_export():
+    """Yield the NDJSON export, one document per line."""
+    for documents in memory_store.iter_document_pages(EXPORT_BATCH_SIZE):
+        yield "".join(json.dumps(export_document(doc)) + "\n" for doc in documents)
+
+def stream_csv_export():
+    """Yield the CSV export one page of documents at a time."""
+    output = StringIO()
+    writer = csv.writer(output)
+    
+    # Write header
+    writer.writerow(["Document ID", "Status", "Format", "Intent", "Upload Time", "Filename"])
+    
+    for documents in memory_store.iter_document_pages(EXPORT_BATCH_SIZE):
+        # Write data rows
+        for doc in documents:
+            writer.writerow([
+                doc.get("document_id"),
+                doc.get("status"),
+                doc.get("data", {}).get("classification", {}).get("format"),
+                doc.get("data", {}).get("classification", {}).get("intent"),
+                doc.get("data", {}).get("metadata", {}).get("upload_time"),
+                doc.get("data", {}).get("metadata", {}).get("filename")
+            ])
+        
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+    
+    # The header alone when there are no documents
+    if output.tell():
+        yield output.getvalue()
+
 # Export metrics as JSON
 @app.get("/dashboard/metrics/export/json")
 async def export_metrics_json():
     try:
-        # Get all documents from memory
-        all_documents = memory_store.get_all()
-        
-        # Prepare export data
-        export_data = {
-            "total_count": len(all_documents),
-            "format_distribution": {},
-            "status_distribution": {},
-            "daily_processing": {},
-            "documents": []
-        }
+        # Read the maintained distributions
+        counts = await worker_pool.run_in_thread(memory_store.get_counts)
         
-        # Calculate distributions
-        for doc in all_documents:
-            # Format distribution
-            fmt = doc.get("data", {}).get("classification", {}).get("format")
-            if fmt:
-                export_data["format_distribution"][fmt] = export_data["format_distribution"].get(fmt, 0) + 1
-            
-            # Status distribution
-            status = doc.get("status")
-            if status:
-                export_data["status_distribution"][status] = export_data["status_distribution"].get(status, 0) + 1
-            
-            # Daily processing
-            upload_time = doc.get("data", {}).get("metadata", {}).get("upload_time", "")
-            if upload_time:
-                date = upload_time.split("T")[0]  # Extract date part
-                export_data["daily_processing"][date] = export_data["daily_processing"].get(date, 0) + 1
-            
-            # Add minimal document info
-            export_data["documents"].append({
-                "document_id": doc.get("document_id"),
-                "status": doc.get("status"),
-                "format": doc.get("data", {}).get("classification", {}).get("format"),
-                "intent": doc.get("data", {}).get("classification", {}).get("intent"),
-                "upload_time": doc.get("data", {}).get("metadata", {}).get("upload_time")
-            })
-        
-        # Return as JSON
-        return JSONResponse(content=export_data)
+        # Stream the documents after the distributions instead of building the whole export
+        return StreamingResponse(stream_json_export(counts), media_type="application/json")
     
     except Exception as e:
         logger.error(f"Error exporting metrics as JSON: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Export documents as newline-delimited JSON
+@app.get("/dashboard/metrics/export/ndjson")
+async def export_metrics_ndjson():
+    try:
+        response = StreamingResponse(stream_ndjson_export(), media_type="application/x-ndjson")
+        response.headers["Content-Disposition"] = "attachment; filename=metrics_export.ndjson"
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error exporting metrics as NDJSON: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Export metrics as CSV
 @app.get("/dashboard/metrics/export/csv")
 async def export_metrics_csv():
     try:
-        # Get all documents from memory
-        all_documents = memory_store.get_all()
-        
-        # Create CSV in memory
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(["Document ID", "Status", "Format", "Intent", "Upload Time", "Filename"])
-        
-        # Write data rows
-        for doc in all_documents:
-            writer.writerow([
-                doc.get("document_id"),
-                doc.get("status"),
-                doc.get("data", {}).get("classification", {}).get("format"),
-                doc.get("data", {}).get("classification", {}).get("intent"),
-                doc.get("data", {}).get("metadata", {}).get("upload_time"),
-                doc.get("data", {}).get("metadata", {}).get("filename")
-            ])
-        
-        # Prepare response
-        response = Response(content=output.getvalue(), media_type="text/csv")
+        response = StreamingResponse(stream_csv_export(), media_type="text/csv")
         response.headers["Content-Disposition"] = "attachment; filename=metrics_export.csv"
         return response
     
@@ -454,6 +902,109 @@ async def list_routes():
     
     return {"routes": routes}
 
+# Debug route to recompute the dashboard aggregates from the stored documents
+@app.post("/debug/rebuild-counts")
+async def rebuild_counts():
+    await worker_pool.run_in_thread(memory_store.rebuild_counts)
+    return memory_store.get_counts()
+
+# Debug route to report result cache hits and misses
+@app.get("/debug/cache")
+async def cache_stats():
+    stats = result_cache.stats()
+    stats["page_texts"] = page_cache.stats() if page_cache is not None else None
+    return stats
+
+# Debug route to report worker pool queue depth
+@app.get("/debug/workers")
+async def worker_stats():
+    stats = worker_pool.stats()
+    stats["jobs"] = job_queue.stats()
+    return stats
+
+# Debug route to report the loaded routing rules and reloads
+@app.get("/debug/routing-rules")
+async def routing_rule_stats():
+    return routing_rules.stats()
+
+# Debug route to report action API requests and latency per endpoint, and the outbox backlog
+@app.get("/debug/actions")
+async def action_stats():
+    if action_dispatcher is None:
+        stats = {"base_url": None, "endpoints": {}}
+    else:
+        stats = action_dispatcher.stats()
+    stats["outbox"] = await worker_pool.run_in_thread(outbox_dispatcher.stats) if outbox_dispatcher else None
+    return stats
+
+def render_metrics():
+    """Collect the metrics in the Prometheus text format."""
+    exposition = Exposition()
+    
+    # Uploads and document processing
+    exposition.histogram("http_request_duration_seconds", "Request latency by route, uploads included",
+                         REQUEST_SECONDS.children())
+    exposition.histogram("document_processing_seconds", "Time to classify and analyze a document",
+                         [({}, PROCESSING_SECONDS)])
+    exposition.histogram("classification_seconds", "Time to classify a document's format and intent",
+                         [({}, CLASSIFICATION_SECONDS)])
+    exposition.histogram("agent_seconds", "Time in the format agents by agent", AGENT_SECONDS.children())
+    exposition.counter("documents_processed_total", "Documents analyzed by format and intent",
+                       DOCUMENTS_PROCESSED.samples())
+    exposition.counter("documents_failed_total", "Documents whose processing failed", DOCUMENTS_FAILED.samples())
+    
+    # Actions
+    exposition.counter("actions_total", "Routed and delivered actions by outcome", ACTION_OUTCOMES.samples())
+    if action_dispatcher is not None:
+        endpoints = sorted(action_dispatcher.endpoint_stats().items())
+        exposition.counter("action_api_requests_total", "Action API requests by endpoint",
+                           [({"endpoint": endpoint}, stats.requests) for endpoint, stats in endpoints])
+        exposition.counter("action_api_retries_total", "Action API retries by endpoint",
+                           [({"endpoint": endpoint}, stats.retries) for endpoint, stats in endpoints])
+        exposition.counter("action_api_failures_total", "Action API requests that failed or were rejected",
+                           [({"endpoint": endpoint}, stats.failures) for endpoint, stats in endpoints])
+        exposition.histogram("action_api_request_seconds", "Action API attempt latency by endpoint",
+                             [({"endpoint": endpoint}, stats.latency) for endpoint, stats in endpoints])
+    if outbox_dispatcher is not None:
+        outbox = outbox_dispatcher.stats(cached=True)
+        exposition.gauge("action_outbox_entries", "Action outbox entries by status",
+                         [({"status": status}, outbox[status]) for status in ("pending", "delivered", "failed")])
+        exposition.gauge("action_outbox_oldest_pending_seconds", "Age of the oldest pending outbox entry",
+                         outbox["oldest_pending_seconds"] or 0)
+        exposition.counter("action_outbox_deliveries_total", "Outbox deliveries settled by this process by outcome",
+                           [({"outcome": outcome}, outbox["dispatcher"][outcome])
+                            for outcome in ("delivered", "retried", "failed")])
+        exposition.counter("action_outbox_pruned_total", "Settled outbox entries deleted by this process",
+                           outbox["dispatcher"]["pruned"])
+    
+    # Memory store
+    exposition.histogram("store_operation_seconds", "Memory store call latency by backend and operation",
+                         STORE_LATENCY.children())
+    
+    # Queues
+    workers = worker_pool.stats()
+    exposition.gauge("worker_pool_running", "Tasks running on the worker pools",
+                     [({"pool": pool}, stats["running"]) for pool, stats in workers.items()])
+    exposition.gauge("worker_pool_queued", "Tasks waiting for a worker",
+                     [({"pool": pool}, stats["queued"]) for pool, stats in workers.items()])
+    jobs = job_queue.stats()
+    exposition.gauge("job_queue_running", "Asynchronous uploads being processed", jobs["running"])
+    exposition.gauge("job_queue_queued", "Asynchronous uploads waiting to be processed", jobs["queued"])
+    
+    # Process
+    memory = process_memory()
+    exposition.gauge("process_resident_memory_bytes", "Resident memory of this process", memory["resident_bytes"])
+    exposition.gauge("process_peak_resident_memory_bytes", "Peak resident memory of this process",
+                     memory["peak_resident_bytes"])
+    
+    return exposition.render()
+
+# Prometheus metrics route; rendered on the event loop from in-memory counts (the outbox
+# counts are cached by the dispatcher thread) so it still answers when the workers are busy
+@app.get("/metrics")
+async def metrics():
+    return Response(render_metrics(), media_type=Exposition.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,118 @@
+# benchmarks/bench_action_dispatch.py
+"""
+Compare a new connection per action call with the pooled ActionDispatcher.
+
+A local stub server answers every POST with a small JSON body, failing a
+share of them with 503 to exercise the retries. Each new connection first
+waits for the given handshake time, standing in for the TCP and TLS
+handshakes with a remote API (on loopback a connection costs less than
+httpx's own overhead per request). Calls are sent from several threads,
+like the worker pool does, first over one new connection each and then
+through the dispatcher.
+
+Usage:
+    python benchmarks/bench_action_dispatch.py [calls] [threads] [fail rate] [handshake ms]
+"""
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from router.action_dispatcher import ActionDispatcher
+
+ENDPOINTS = ["/crm/escalate", "/finance/review", "/archive/store"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; on a kept-alive connection
+    # Nagle's algorithm would hold the body back for the client's delayed ACK
+    disable_nagle_algorithm = True
+    fail_rate = 0.0
+    handshake_s = 0.0
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.handshake_s)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if random.random() < self.fail_rate:
+            self.send_response(503)
+            body = b""
+        else:
+            self.send_response(200)
+            body = json.dumps({"status": "success", "key": self.headers.get("Idempotency-Key")}).encode()
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def new_connection_call(port, endpoint, data):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("POST", endpoint, json.dumps(data), {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def timed(call, calls, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda i: call(ENDPOINTS[i % len(ENDPOINTS)], {"document_id": str(i)}),
+                                range(calls)))
+    return time.perf_counter() - start, results
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    fail_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    handshake_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 20.0
+
+    # The retries are counted below instead of logged
+    logging.getLogger("router.action_dispatcher").setLevel(logging.ERROR)
+    StubHandler.fail_rate = fail_rate
+    StubHandler.handshake_s = handshake_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    dispatcher = ActionDispatcher(f"http://127.0.0.1:{port}", max_connections=threads,
+                                  endpoint_concurrency=threads, retries=5, backoff_base=0.01)
+    dispatcher.dispatch("POST", "/warmup", {})
+
+    StubHandler.fail_rate = 0.0
+    per_call_s, _ = timed(lambda endpoint, data: new_connection_call(port, endpoint, data), calls, threads)
+    StubHandler.fail_rate = fail_rate
+    pooled_s, results = timed(lambda endpoint, data: dispatcher.dispatch("POST", endpoint, data), calls, threads)
+    assert all(result["status"] == "success" for result in results)
+
+    print(f"{calls} calls from {threads} threads: new connection per call {per_call_s * 1000:.0f} ms, "
+          f"pooled dispatcher {pooled_s * 1000:.0f} ms ({per_call_s / pooled_s:.1f}x, "
+          f"{handshake_ms:g} ms handshake, {fail_rate:.0%} of responses 503)")
+    for endpoint, stats in dispatcher.stats()["endpoints"].items():
+        latency = stats["latency"]
+        print(f"  {endpoint}: {stats['requests']} requests, {stats['retries']} retries, "
+              f"p50 {latency['p50'] * 1000:.1f} ms, p99 {latency['p99'] * 1000:.1f} ms")
+
+    dispatcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
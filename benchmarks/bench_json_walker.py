@@ -0,0 +1,125 @@
+# benchmarks/bench_json_walker.py
+"""
+Compare the single-pass JSON walker with the three recursive walks it replaced.
+
+A synthetic order export is generated: a list of orders, each with nested
+customer and line item objects and a few null or non-numeric prices.
+
+Usage:
+    python benchmarks/bench_json_walker.py [orders] [max_anomalies]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils.json_parser import NUMERIC_FIELDS, walk_json
+
+
+def make_export(orders):
+    rng = random.Random(42)
+    export = {"generated": "2026-01-01", "orders": []}
+    for i in range(orders):
+        items = [
+            {
+                "sku": f"SKU-{rng.randint(1, 9999)}",
+                "quantity": rng.randint(1, 5),
+                "unit_price": rng.choice([round(rng.uniform(1, 500), 2)] * 50 + ["n/a", None])
+            }
+            for _ in range(rng.randint(1, 6))
+        ]
+        export["orders"].append({
+            "order_id": i,
+            "customer": {"name": f"Customer {i}", "email": None if i % 97 == 0 else f"c{i}@example.com",
+                         "address": {"city": "Springfield", "zip": f"{i % 100000:05d}"}},
+            "items": items,
+            "tags": ["export", "2026"],
+            "total": sum(item["unit_price"] for item in items if isinstance(item["unit_price"], float))
+        })
+    return export
+
+
+def legacy_walks(json_data):
+    """The previous JsonAgent analysis: three separate recursive walks."""
+    count = 0
+
+    def count_fields_recursive(obj):
+        nonlocal count
+        if isinstance(obj, dict):
+            count += len(obj)
+            for value in obj.values():
+                if isinstance(value, (dict, list)):
+                    count_fields_recursive(value)
+        elif isinstance(obj, list):
+            for item in obj:
+                if isinstance(item, (dict, list)):
+                    count_fields_recursive(item)
+
+    max_depth = 0
+    total_nodes = 0
+
+    def analyze_depth(obj, depth=0):
+        nonlocal max_depth, total_nodes
+        max_depth = max(depth, max_depth)
+        total_nodes += 1
+        if isinstance(obj, dict):
+            for value in obj.values():
+                if isinstance(value, (dict, list)):
+                    analyze_depth(value, depth + 1)
+        elif isinstance(obj, list):
+            for item in obj:
+                if isinstance(item, (dict, list)):
+                    analyze_depth(item, depth + 1)
+
+    anomalies = []
+
+    def check_anomalies(obj, path=""):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                current_path = f"{path}.{key}" if path else key
+                if value is None:
+                    anomalies.append(f"Missing value for field '{current_path}'")
+                if key in NUMERIC_FIELDS and not isinstance(value, (int, float)):
+                    anomalies.append(f"Field '{current_path}' should be numeric but is {type(value).__name__}")
+                if isinstance(value, (dict, list)):
+                    check_anomalies(value, current_path)
+        elif isinstance(obj, list):
+            for i, item in enumerate(obj):
+                if isinstance(item, (dict, list)):
+                    check_anomalies(item, f"{path}[{i}]")
+
+    count_fields_recursive(json_data)
+    analyze_depth(json_data)
+    check_anomalies(json_data)
+    return count, max_depth, total_nodes, anomalies
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_anomalies = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    export = make_export(orders)
+    size = len(json.dumps(export))
+
+    start = time.perf_counter()
+    fields_count, max_depth, total_nodes, anomalies = legacy_walks(export)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    structure = walk_json(export, max_anomalies)
+    walker_s = time.perf_counter() - start
+
+    assert (structure.fields_count, structure.max_depth, structure.total_nodes, structure.anomaly_count) == \
+        (fields_count, max_depth, total_nodes, len(anomalies))
+    assert structure.anomalies == anomalies[:max_anomalies]
+
+    print(f"{orders} orders, {size / 1e6:.1f} MB, {structure.anomaly_count} anomalies: "
+          f"three walks {legacy_s * 1000:.0f} ms, single walk {walker_s * 1000:.0f} ms "
+          f"({legacy_s / walker_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
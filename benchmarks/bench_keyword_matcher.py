@@ -0,0 +1,74 @@
+# benchmarks/bench_keyword_matcher.py
+"""
+Compare the single-pass keyword matcher with per-keyword counting.
+
+The text of each PDF is classified by ClassifierAgent._classify_text_intent
+and by the previous implementation, which called str.count() and re-split
+the text into lines once per keyword. Both must return the same result.
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py file.pdf [file.pdf ...] [--repeat N]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from agents.classifier_agent import INTENT_KEYWORDS, ClassifierAgent
+from utils import pdf_parser
+
+
+def legacy_intent_scores(text):
+    text_lower = text.lower()
+    intent_scores = {intent: 0 for intent in INTENT_KEYWORDS}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        for keyword in keywords:
+            count = text_lower.count(keyword)
+            lines = text_lower.split('\n')
+            for line in lines[:10]:
+                if keyword in line and len(line) < 100:
+                    count += 1
+            intent_scores[intent] += count
+    if any(term in text_lower for term in ["work experience", "education", "skills", "professional experience"]):
+        intent_scores["Resume"] += 3
+    if any(term in text_lower for term in ["executive summary", "key findings", "market analysis"]):
+        intent_scores["Report"] += 3
+    return intent_scores
+
+
+def timed(function, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 5
+    if "--repeat" in args:
+        index = args.index("--repeat")
+        repeat = int(args[index + 1])
+        del args[index:index + 2]
+    if not args:
+        sys.exit(__doc__)
+
+    agent = ClassifierAgent(None)
+    for path in args:
+        with open(path, 'rb') as f:
+            text = "\n".join(pdf_parser.extract_page_texts(f.read()))
+
+        scores = legacy_intent_scores(text)
+        expected = max(scores, key=scores.get) if max(scores.values()) else "Unknown"
+        result = agent._classify_text_intent(text)
+        assert result["intent"] == expected, (result, scores)
+
+        legacy_ms = timed(legacy_intent_scores, text, repeat)
+        matcher_ms = timed(agent._classify_text_intent, text, repeat)
+        print(f"{os.path.basename(path)}: {len(text):,} chars, intent {result['intent']}: "
+              f"per-keyword {legacy_ms:.1f} ms, matcher {matcher_ms:.1f} ms ({legacy_ms / matcher_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_pdf_extraction.py
+"""
+Compare serial and page-parallel PDF text extraction by page count.
+
+Test documents are built by repeating the pages of the given PDF. Each is
+extracted by one process, then split into one page range per worker
+process like api.main.extract_pdf_pages does.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py file.pdf [workers] [page counts...]
+"""
+import io
+import os
+import sys
+import time
+
+import PyPDF2
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils.pdf_parser import extract_page_range, extract_page_texts, split_pages
+from utils.worker_pool import WorkerPool
+
+
+def build_pdf(source, page_count):
+    reader = PyPDF2.PdfReader(io.BytesIO(source))
+    writer = PyPDF2.PdfWriter()
+    for i in range(page_count):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def extract_parallel(pool, raw_bytes, page_count):
+    futures = [
+        pool.submit_process(extract_page_range, raw_bytes, start, stop)
+        for start, stop in split_pages(page_count, pool.process_workers)
+    ]
+    page_texts = []
+    for future in futures:
+        page_texts.extend(future.result())
+    return page_texts
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    with open(sys.argv[1], 'rb') as f:
+        source = f.read()
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    page_counts = [int(n) for n in sys.argv[3:]] or [4, 16, 64, 256]
+
+    pool = WorkerPool(thread_workers=1, process_workers=workers)
+    # Start the worker processes before timing
+    extract_parallel(pool, build_pdf(source, workers), workers)
+
+    print(f"{workers} worker processes, {os.cpu_count()} CPUs")
+    for page_count in page_counts:
+        raw_bytes = build_pdf(source, page_count)
+
+        start = time.perf_counter()
+        serial = pool.submit_process(extract_page_texts, raw_bytes).result()
+        serial_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel = extract_parallel(pool, raw_bytes, page_count)
+        parallel_s = time.perf_counter() - start
+
+        assert parallel == serial
+        print(f"{page_count:5d} pages: serial {serial_s:.2f}s, parallel {parallel_s:.2f}s "
+              f"({serial_s / parallel_s:.2f}x)")
+
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
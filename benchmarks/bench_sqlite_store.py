@@ -0,0 +1,55 @@
+# benchmarks/bench_sqlite_store.py
+"""
+Measure SQLiteStore write throughput.
+
+Each simulated upload performs the writes of the upload pipeline:
+metadata, status, classification, analysis and the final status update.
+
+Usage:
+    python benchmarks/bench_sqlite_store.py [uploads] [threads]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from memory.sqlite_store import SQLiteStore
+
+WRITES_PER_UPLOAD = 5
+
+
+def simulate_upload(store):
+    document_id = str(uuid.uuid4())
+    store.store(document_id, "metadata", {"document_id": document_id, "filename": "invoice.pdf", "size": 1024})
+    store.update_status(document_id, "received")
+    store.store(document_id, "classification", {"format": "pdf", "intent": "Invoice", "confidence": 0.9})
+    store.store(document_id, "pdf_analysis", {"document_type": "Invoice", "page_count": 3, "summary": "x" * 200})
+    store.update_status(document_id, "analyzed")
+
+
+def main():
+    uploads = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(os.path.join(tmp, "bench.db"))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(simulate_upload, store) for _ in range(uploads)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+        if hasattr(store, "close"):
+            store.close()
+
+    writes = uploads * WRITES_PER_UPLOAD
+    print(f"{uploads} uploads, {threads} thread(s): {writes / elapsed:,.0f} writes/s ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
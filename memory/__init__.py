@@ -1,9 +1,42 @@
 # File: memory/__init__.py
 
+import threading
+
 # Import the MemoryStore class directly
 from memory.memory_store import MemoryStore
+from utils import config
+
+_memory_store = None
+_memory_store_lock = threading.Lock()
+
+def create_memory_store() -> MemoryStore:
+    """
+    Build the store backend selected in utils/config.py.
+    
+    USE_REDIS picks Redis; otherwise a non-empty SQLITE_PATH picks SQLite;
+    otherwise documents are kept in this process's memory. Only Redis and
+    SQLite are shared between uvicorn workers.
+    """
+    if config.USE_REDIS:
+        from memory.redis_store import RedisStore
+        return RedisStore(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            max_connections=config.REDIS_MAX_CONNECTIONS
+        )
+    
+    if config.SQLITE_PATH:
+        from memory.sqlite_store import SQLiteStore
+        return SQLiteStore(config.SQLITE_PATH)
+    
+    return MemoryStore()
 
 # Define the get_memory_store function that was being imported
-def get_memory_store():
-    """Returns a new instance of MemoryStore"""
-    return MemoryStore()
\ No newline at end of file
+def get_memory_store() -> MemoryStore:
+    """Returns the process-wide memory store, creating it on first use"""
+    global _memory_store
+    with _memory_store_lock:
+        if _memory_store is None:
+            _memory_store = create_memory_store()
+        return _memory_store
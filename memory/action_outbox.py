@@ -0,0 +1,250 @@
+# File: memory/action_outbox.py
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS action_outbox (
+        idempotency_key TEXT PRIMARY KEY,
+        document_id TEXT NOT NULL,
+        action TEXT NOT NULL,
+        method TEXT NOT NULL,
+        endpoint TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        last_error TEXT
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_action_outbox_due ON action_outbox (status, next_attempt);
+    CREATE INDEX IF NOT EXISTS idx_action_outbox_settled ON action_outbox (status, updated);
+"""
+
+INSERT_ENTRY_SQL = (
+    "INSERT OR IGNORE INTO action_outbox "
+    "(idempotency_key, document_id, action, method, endpoint, payload, status, next_attempt, created, updated) "
+    "VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?)"
+)
+SELECT_STATUS_SQL = "SELECT status FROM action_outbox WHERE idempotency_key = ?"
+SELECT_DUE_SQL = (
+    "SELECT idempotency_key, document_id, action, method, endpoint, payload, attempts FROM action_outbox "
+    "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?"
+)
+CLAIM_SQL = "UPDATE action_outbox SET attempts = attempts + 1, next_attempt = ?, updated = ? WHERE idempotency_key = ?"
+RENEW_SQL = (
+    "UPDATE action_outbox SET next_attempt = ?, updated = ? "
+    "WHERE idempotency_key = ? AND status = 'pending'"
+)
+DELIVERED_SQL = (
+    "UPDATE action_outbox SET status = 'delivered', last_error = NULL, updated = ? "
+    "WHERE idempotency_key = ? AND status = 'pending'"
+)
+RETRY_SQL = (
+    "UPDATE action_outbox SET status = ?, next_attempt = ?, last_error = ?, updated = ? "
+    "WHERE idempotency_key = ? AND status = 'pending'"
+)
+PRUNE_SQL = (
+    "DELETE FROM action_outbox WHERE idempotency_key IN ("
+    "SELECT idempotency_key FROM action_outbox WHERE status IN ('delivered', 'failed') AND updated < ? LIMIT ?)"
+)
+SELECT_STATUS_COUNTS_SQL = "SELECT status, COUNT(*), MIN(created) FROM action_outbox GROUP BY status"
+
+
+def action_key(document_id: str, action: str) -> str:
+    """Idempotency key of an action on a document: triggering it again is a no-op."""
+    return f"{document_id}:{action}"
+
+
+class OutboxEntry:
+    """One action request claimed from the outbox for delivery."""
+
+    def __init__(self, key: str, document_id: str, action: str, method: str, endpoint: str,
+                 payload: Dict, attempts: int):
+        self.key = key
+        self.document_id = document_id
+        self.action = action
+        self.method = method
+        self.endpoint = endpoint
+        self.payload = payload
+        self.attempts = attempts
+
+
+class ActionOutbox:
+    """
+    Durable queue of the action requests waiting for delivery.
+
+    Actions are written here instead of being sent while the client waits,
+    keyed by document and action so triggering an action twice queues it
+    once. Delivery claims due entries by pushing their next attempt past a
+    lease, so an entry whose deliverer dies is claimed again once the lease
+    expires, and several processes can share one outbox file. Entries end
+    as delivered, or as failed after the maximum number of attempts, and
+    are pruned once they have been settled for long enough; triggering
+    the action after that queues it again.
+
+    Each thread keeps one open connection in WAL mode; batch() groups the
+    thread's enqueues into one transaction.
+    """
+
+    def __init__(self, db_path: str = "action_outbox.db"):
+        """
+        Initialize the outbox.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Set on every enqueue so the dispatcher in this process wakes up
+        self.enqueued = threading.Event()
+        self._get_connection().executescript(SCHEMA_SQL)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close the connections of all threads."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def enqueue(self, document_id: str, action: str, method: str, endpoint: str, payload: Dict) -> Tuple[str, str]:
+        """
+        Queue an action request unless the same action was already queued for the document.
+
+        Returns:
+            The idempotency key, and "queued" or the existing entry's status
+            ("pending", "delivered" or "failed")
+        """
+        key = action_key(document_id, action)
+        now = time.time()
+        conn = self._get_connection()
+        in_batch = getattr(self._local, "batch", False)
+        with nullcontext() if in_batch else conn:
+            cursor = conn.execute(INSERT_ENTRY_SQL, (key, document_id, action, method, endpoint,
+                                                     json.dumps(payload), now, now, now))
+            if cursor.rowcount:
+                status = "queued"
+            else:
+                status = conn.execute(SELECT_STATUS_SQL, (key,)).fetchone()[0]
+        if status == "queued" and not in_batch:
+            self.enqueued.set()
+        return key, status
+
+    @contextmanager
+    def batch(self):
+        """Commit the actions this thread enqueues inside the block in one transaction."""
+        if getattr(self._local, "batch", False):
+            # Nested batch: the outermost one commits
+            yield
+            return
+
+        self._local.batch = True
+        try:
+            with self._get_connection():
+                yield
+        finally:
+            self._local.batch = False
+        self.enqueued.set()
+
+    def claim(self, limit: int, lease: float) -> List[OutboxEntry]:
+        """
+        Claim the entries due for delivery, oldest first.
+
+        Args:
+            limit: Maximum number of entries
+            lease: Seconds before a claimed entry that was neither delivered
+                nor retried becomes due again
+
+        Returns:
+            The claimed entries, their attempts including this one
+        """
+        now = time.time()
+        conn = self._get_connection()
+        with conn:
+            # Take the write lock first so two processes never claim the same rows
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(SELECT_DUE_SQL, (now, limit)).fetchall()
+            conn.executemany(CLAIM_SQL, [(now + lease, now, row[0]) for row in rows])
+        return [
+            OutboxEntry(key, document_id, action, method, endpoint, json.loads(payload), attempts + 1)
+            for key, document_id, action, method, endpoint, payload, attempts in rows
+        ]
+
+    def renew(self, keys: List[str], lease: float) -> None:
+        """Extend the lease of claimed entries still being delivered to lease seconds from now."""
+        now = time.time()
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(RENEW_SQL, [(now + lease, now, key) for key in keys])
+
+    def mark_delivered(self, keys: List[str]) -> None:
+        """Record that entries were delivered."""
+        now = time.time()
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(DELIVERED_SQL, [(now, key) for key in keys])
+
+    def mark_failed(self, entry: OutboxEntry, error: str, retry_delay: Optional[float]) -> None:
+        """
+        Record a failed delivery attempt.
+
+        Args:
+            entry: The claimed entry
+            error: Why the attempt failed
+            retry_delay: Seconds until the next attempt (None gives up on the entry)
+        """
+        now = time.time()
+        status = "failed" if retry_delay is None else "pending"
+        conn = self._get_connection()
+        with conn:
+            conn.execute(RETRY_SQL, (status, now + (retry_delay or 0), error, now, entry.key))
+
+    def prune(self, older_than: float, chunk_size: int = 1000) -> int:
+        """
+        Delete the delivered and failed entries settled more than older_than seconds ago.
+
+        Rows are deleted chunk_size at a time, each chunk in its own
+        transaction, so enqueues and claims are not held up for long.
+
+        Returns:
+            Number of entries deleted
+        """
+        cutoff = time.time() - older_than
+        conn = self._get_connection()
+        deleted = 0
+        while True:
+            with conn:
+                count = conn.execute(PRUNE_SQL, (cutoff, chunk_size)).rowcount
+            deleted += count
+            if count < chunk_size:
+                return deleted
+
+    def stats(self) -> Dict:
+        """Report the number of entries by status and the age of the oldest pending one."""
+        rows = self._get_connection().execute(SELECT_STATUS_COUNTS_SQL).fetchall()
+        stats = {"pending": 0, "delivered": 0, "failed": 0, "oldest_pending_seconds": None}
+        for status, count, oldest in rows:
+            stats[status] = count
+            if status == "pending":
+                stats["oldest_pending_seconds"] = round(time.time() - oldest, 3)
+        return stats
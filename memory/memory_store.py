@@ -1,11 +1,88 @@
 # File: memory/memory_store.py
 
+import base64
+import bisect
+import functools
+import json
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.metrics import HistogramFamily
 
 logger = logging.getLogger(__name__)
 
+# Store calls take microseconds in memory and milliseconds on disk or over the network
+STORE_LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0)
+
+# Seconds per store call, by store class and operation
+STORE_LATENCY = HistogramFamily(("backend", "operation"), STORE_LATENCY_BUCKETS)
+
+def timed(operation: str):
+    """Decorate a store method so each call's latency is observed in STORE_LATENCY."""
+    def decorate(method):
+        # Histogram per store class, looked up without building label tuples
+        histograms = {}
+        
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            histogram = histograms.get(type(self))
+            if histogram is None:
+                histogram = histograms.setdefault(type(self), STORE_LATENCY.labels(type(self).__name__, operation))
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def encode_cursor(*key) -> str:
+    """Encode a keyset pagination position as an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii"))))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def document_count_keys(document: Dict) -> Dict[str, Optional[str]]:
+    """
+    Get the keys a document is counted under in the dashboard aggregates.
+    
+    Returns:
+        Dictionary with the document's format, status and upload day
+        (None where unknown)
+    """
+    data = document.get("data", {})
+    upload_time = (data.get("metadata") or {}).get("upload_time") or ""
+    return {
+        "format": (data.get("classification") or {}).get("format") or None,
+        "status": document.get("status") or None,
+        "day": upload_time.split("T")[0] or None
+    }
+
+def query_cursor(document: Dict) -> str:
+    """
+    Get the cursor positioned at a document returned by a store's query().
+    
+    Passing it back to query() continues after the document in the same sort order.
+    """
+    upload_time = document.get("data", {}).get("metadata", {}).get("upload_time", "")
+    return encode_cursor(upload_time, document["document_id"])
+
+QUERY_SORTS = ("-upload_time", "upload_time")
+
 class MemoryStore:
     """
     Simple in-memory storage for document processing results.
@@ -14,7 +91,22 @@ class MemoryStore:
     
     def __init__(self):
         self.documents = {}
+        # Agents write from worker threads
+        self._lock = threading.RLock()
+        # Secondary indexes maintained on every write: document ids by format, status
+        # and upload day, plus the keys each document is indexed under
+        self._index = {"format": {}, "status": {}, "day": {}}
+        self._index_keys = {}
+        # Document counts per (format, status, day) combination, for counting filtered views
+        self._combination_counts = {}
+        # (upload_time, document_id) for every document with an upload time, kept sorted
+        self._by_upload_time = []
+        self._upload_times = {}
+        # (updated_at, document_id) for every document, kept sorted for the listing
+        self._by_updated_at = []
+        self._updated_ats = {}
     
+    @timed("store")
     def store(self, document_id: str, data_type: str, data: Dict) -> None:
         """
         Store data for a document.
@@ -24,19 +116,35 @@ class MemoryStore:
             data_type: Type of data being stored (e.g., "metadata", "classification")
             data: The data to store
         """
-        if document_id not in self.documents:
-            self.documents[document_id] = {
-                "document_id": document_id,
-                "status": "received",
-                "data": {},
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat()
-            }
+        with self._lock:
+            if document_id not in self.documents:
+                self.documents[document_id] = {
+                    "document_id": document_id,
+                    "status": "received",
+                    "data": {},
+                    "created_at": datetime.utcnow().isoformat(),
+                    "updated_at": datetime.utcnow().isoformat()
+                }
+            
+            # Update document data
+            self.documents[document_id]["data"][data_type] = data
+            self.documents[document_id]["updated_at"] = datetime.utcnow().isoformat()
+            self._update_indexes(document_id)
+    
+    def close(self) -> None:
+        """Release the store's resources (nothing to release in memory)."""
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group the writes made by this thread inside the block.
         
-        # Update document data
-        self.documents[document_id]["data"][data_type] = data
-        self.documents[document_id]["updated_at"] = datetime.utcnow().isoformat()
+        Writes apply immediately here; stores with a network round trip per
+        write send the group together.
+        """
+        yield
     
+    @timed("update_status")
     def update_status(self, document_id: str, status: str) -> None:
         """
         Update the status of a document.
@@ -45,10 +153,201 @@ class MemoryStore:
             document_id: Unique identifier for the document
             status: New status value
         """
-        if document_id in self.documents:
-            self.documents[document_id]["status"] = status
-            self.documents[document_id]["updated_at"] = datetime.utcnow().isoformat()
+        with self._lock:
+            if document_id in self.documents:
+                self.documents[document_id]["status"] = status
+                self.documents[document_id]["updated_at"] = datetime.utcnow().isoformat()
+                self._update_indexes(document_id)
+    
+    def _update_indexes(self, document_id: str) -> None:
+        """Move a document between index buckets after a write (caller holds the lock)."""
+        document = self.documents[document_id]
+        old_keys = self._index_keys.get(document_id, {})
+        new_keys = document_count_keys(document)
+        
+        for dimension, new_key in new_keys.items():
+            old_key = old_keys.get(dimension)
+            if old_key == new_key:
+                continue
+            
+            index = self._index[dimension]
+            if old_key is not None:
+                index[old_key].discard(document_id)
+                if not index[old_key]:
+                    del index[old_key]
+            if new_key is not None:
+                index.setdefault(new_key, set()).add(document_id)
+        
+        self._index_keys[document_id] = new_keys
+        
+        old_combination = tuple(old_keys.get(dimension) for dimension in new_keys) if old_keys else None
+        new_combination = tuple(new_keys.values())
+        if old_combination != new_combination:
+            if old_combination is not None:
+                self._combination_counts[old_combination] -= 1
+                if not self._combination_counts[old_combination]:
+                    del self._combination_counts[old_combination]
+            self._combination_counts[new_combination] = self._combination_counts.get(new_combination, 0) + 1
+        
+        upload_time = document["data"].get("metadata", {}).get("upload_time") or None
+        old_time = self._upload_times.get(document_id)
+        if upload_time != old_time:
+            if old_time is not None:
+                del self._by_upload_time[bisect.bisect_left(self._by_upload_time, (old_time, document_id))]
+            if upload_time is not None:
+                bisect.insort(self._by_upload_time, (upload_time, document_id))
+                self._upload_times[document_id] = upload_time
+            else:
+                del self._upload_times[document_id]
+        
+        updated_at = document.get("updated_at", "")
+        old_updated_at = self._updated_ats.get(document_id)
+        if updated_at != old_updated_at:
+            if old_updated_at is not None:
+                del self._by_updated_at[bisect.bisect_left(self._by_updated_at, (old_updated_at, document_id))]
+            bisect.insort(self._by_updated_at, (updated_at, document_id))
+            self._updated_ats[document_id] = updated_at
+    
+    @timed("get_counts")
+    def get_counts(self) -> Dict:
+        """
+        Get the dashboard aggregates without scanning the documents.
+        
+        Returns:
+            Dictionary with total_count and format_counts, status_counts
+            and daily_counts keyed by format, status and upload day
+        """
+        with self._lock:
+            return {
+                "total_count": len(self.documents),
+                "format_counts": {key: len(ids) for key, ids in self._index["format"].items()},
+                "status_counts": {key: len(ids) for key, ids in self._index["status"].items()},
+                "daily_counts": {key: len(ids) for key, ids in sorted(self._index["day"].items())}
+            }
+    
+    def rebuild_counts(self) -> None:
+        """Recompute the aggregates and indexes from scratch, e.g. after loading documents directly."""
+        with self._lock:
+            self._index = {"format": {}, "status": {}, "day": {}}
+            self._index_keys = {}
+            self._combination_counts = {}
+            self._by_upload_time = []
+            self._upload_times = {}
+            self._by_updated_at = []
+            self._updated_ats = {}
+            for document_id in self.documents:
+                self._update_indexes(document_id)
+    
+    def _filter_buckets(self, format: Optional[str], status: Optional[str]) -> List[Set[str]]:
+        """Get the index buckets for the format and status filters, smallest first (caller holds the lock)."""
+        buckets = []
+        if format:
+            buckets.append(self._index["format"].get(format, set()))
+        if status:
+            buckets.append(self._index["status"].get(status, set()))
+        return sorted(buckets, key=len)
+    
+    @staticmethod
+    def _key_range(keys: List[Tuple], date_prefix: Optional[str]) -> Tuple[int, int]:
+        """Get the slice of sorted (upload_time, document_id) keys whose upload time starts with date_prefix."""
+        if not date_prefix:
+            return 0, len(keys)
+        return (bisect.bisect_left(keys, (date_prefix,)),
+                bisect.bisect_left(keys, (date_prefix + "\U0010ffff",)))
+    
+    @timed("query")
+    def query(self, format: Optional[str] = None, status: Optional[str] = None,
+              date_prefix: Optional[str] = None, sort: str = "-upload_time",
+              cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Filter and order documents through the secondary indexes, with keyset pagination.
+        
+        Only documents with metadata (and so an upload time) are returned.
+        
+        Args:
+            format: Only documents classified as this format
+            status: Only documents with this status
+            date_prefix: Only documents whose upload_time starts with this (e.g. "2025-06-01")
+            sort: "-upload_time" for newest first or "upload_time" for oldest first
+            cursor: Cursor returned by the previous page (or query_cursor), or None to start
+            limit: Maximum number of documents to return
+            
+        Returns:
+            Tuple of (documents, next_cursor). next_cursor is None on the last page.
+        """
+        if sort not in QUERY_SORTS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        descending = sort.startswith("-")
+        after = decode_cursor(cursor) if cursor else None
+        
+        with self._lock:
+            buckets = self._filter_buckets(format, status)
+            keys = self._by_upload_time
+            lo, hi = self._key_range(keys, date_prefix)
+            
+            if buckets and len(buckets[0]) ** 2 < limit * (hi - lo):
+                # Selective filter: ordering its few documents beats walking the range
+                keys = sorted(
+                    (self._upload_times[doc_id], doc_id) for doc_id in buckets[0]
+                    if doc_id in self._upload_times and all(doc_id in bucket for bucket in buckets[1:])
+                )
+                buckets = []
+                lo, hi = self._key_range(keys, date_prefix)
+            
+            # Walk the keys from the cursor, skipping documents outside the buckets
+            if descending:
+                if after:
+                    hi = min(hi, bisect.bisect_left(keys, after))
+                positions = range(hi - 1, lo - 1, -1)
+            else:
+                if after:
+                    lo = max(lo, bisect.bisect_right(keys, after))
+                positions = range(lo, hi)
+            
+            page = []
+            for position in positions:
+                key = keys[position]
+                if all(key[1] in bucket for bucket in buckets):
+                    page.append(key)
+                    if len(page) > limit:
+                        break
+            
+            has_more = len(page) > limit
+            page = page[:limit]
+            documents = [self.documents[doc_id] for _, doc_id in page]
+        
+        next_cursor = encode_cursor(*page[-1]) if has_more and page else None
+        return documents, next_cursor
     
+    @timed("count")
+    def count(self, format: Optional[str] = None, status: Optional[str] = None,
+              date_prefix: Optional[str] = None) -> int:
+        """
+        Count the documents query() would return for the given filters.
+        
+        Returns:
+            Number of matching documents
+        """
+        with self._lock:
+            if not date_prefix or len(date_prefix) <= 10:
+                # Day granularity: add up the matching combinations
+                return sum(
+                    count for (doc_format, doc_status, day), count in self._combination_counts.items()
+                    if day is not None
+                    and (not format or doc_format == format)
+                    and (not status or doc_status == status)
+                    and (not date_prefix or day.startswith(date_prefix))
+                )
+            
+            # Finer than a day: check the documents in the date range
+            buckets = self._filter_buckets(format, status)
+            lo, hi = self._key_range(self._by_upload_time, date_prefix)
+            return sum(
+                1 for _, doc_id in self._by_upload_time[lo:hi]
+                if all(doc_id in bucket for bucket in buckets)
+            )
+    
+    @timed("get")
     def get(self, document_id: str) -> Dict:
         """
         Get all data for a document.
@@ -61,6 +360,23 @@ class MemoryStore:
         """
         return self.documents.get(document_id)
     
+    @timed("get_many")
+    def get_many(self, document_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Get all data for several documents.
+        
+        Args:
+            document_ids: Unique identifiers of the documents
+            
+        Returns:
+            Dictionary of the documents found, by document ID
+        """
+        with self._lock:
+            return {
+                document_id: self.documents[document_id]
+                for document_id in document_ids if document_id in self.documents
+            }
+    
     def get_all_documents(self, limit: int = 10, offset: int = 0) -> List[Dict]:
         """
         Get a list of all documents.
@@ -72,17 +388,77 @@ class MemoryStore:
         Returns:
             List of document dictionaries
         """
-        # Sort by updated_at in descending order
-        sorted_ids = sorted(
-            self.documents.keys(), 
-            key=lambda id: self.documents[id].get("updated_at", ""), 
-            reverse=True
-        )
+        with self._lock:
+            # Sort by updated_at in descending order
+            sorted_ids = sorted(
+                self.documents.keys(), 
+                key=lambda id: self.documents[id].get("updated_at", ""), 
+                reverse=True
+            )
+            
+            # Apply pagination
+            paginated_ids = sorted_ids[offset:offset+limit]
+            
+            return [self.documents[id] for id in paginated_ids]
+    
+    def list_documents(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        List documents, most recently updated first, with keyset pagination.
+        
+        Args:
+            limit: Maximum number of documents to return
+            cursor: Cursor returned by the previous page, or None for the first page
+            
+        Returns:
+            Tuple of (documents, next_cursor). Each document carries its status,
+            updated_at and the latest metadata and classification under "data".
+            next_cursor is None on the last page.
+        """
+        with self._lock:
+            # The page is the slice just below the cursor, read newest first
+            keys = self._by_updated_at
+            hi = bisect.bisect_left(keys, decode_cursor(cursor)) if cursor else len(keys)
+            lo = max(0, hi - limit)
+            page = keys[lo:hi][::-1]
+            documents = []
+            for updated_at, doc_id in page:
+                doc = self.documents[doc_id]
+                data = doc["data"]
+                documents.append({
+                    "document_id": doc_id,
+                    "status": doc.get("status"),
+                    "created_at": doc.get("created_at"),
+                    "updated_at": updated_at,
+                    "data": {
+                        data_type: data[data_type]
+                        for data_type in ("metadata", "classification") if data_type in data
+                    }
+                })
         
-        # Apply pagination
-        paginated_ids = sorted_ids[offset:offset+limit]
+        next_cursor = encode_cursor(*page[-1]) if page and lo > 0 else None
+        return documents, next_cursor
+    
+    def iter_document_pages(self, batch_size: int = 500, **filters) -> Iterator[List[Dict]]:
+        """
+        Page through every document matching the query() filters, oldest upload first.
+        
+        Each page is a separate query(), so the store is never held or copied as a whole
+        and documents uploaded while iterating are picked up at the end.
         
-        return [self.documents[id] for id in paginated_ids]
+        Args:
+            batch_size: Number of documents per page
+            **filters: format, status and date_prefix as for query()
+            
+        Yields:
+            Lists of up to batch_size documents
+        """
+        cursor = None
+        while True:
+            documents, cursor = self.query(sort="upload_time", cursor=cursor, limit=batch_size, **filters)
+            if documents:
+                yield documents
+            if not cursor:
+                break
     
     def get_all(self, limit=10, offset=0):
         """
@@ -0,0 +1,175 @@
+# File: memory/page_cache.py
+
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS pdf_documents (
+        content_hash TEXT NOT NULL,
+        extractor TEXT NOT NULL,
+        page_count INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (content_hash, extractor)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_pdf_documents_last_used ON pdf_documents (last_used);
+
+    CREATE TABLE IF NOT EXISTS pdf_pages (
+        content_hash TEXT NOT NULL,
+        extractor TEXT NOT NULL,
+        page INTEGER NOT NULL,
+        text BLOB NOT NULL,
+        PRIMARY KEY (content_hash, extractor, page)
+    ) WITHOUT ROWID;
+"""
+
+SELECT_PAGE_COUNT_SQL = "SELECT page_count FROM pdf_documents WHERE content_hash = ? AND extractor = ?"
+TOUCH_DOCUMENT_SQL = "UPDATE pdf_documents SET last_used = ? WHERE content_hash = ? AND extractor = ?"
+SELECT_PAGE_SQL = "SELECT text FROM pdf_pages WHERE content_hash = ? AND extractor = ? AND page = ?"
+INSERT_DOCUMENT_SQL = (
+    "INSERT OR REPLACE INTO pdf_documents (content_hash, extractor, page_count, size, last_used) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+INSERT_PAGE_SQL = "INSERT OR REPLACE INTO pdf_pages (content_hash, extractor, page, text) VALUES (?, ?, ?, ?)"
+SELECT_TOTALS_SQL = "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pdf_documents"
+SELECT_OLDEST_SQL = "SELECT content_hash, extractor, size FROM pdf_documents ORDER BY last_used LIMIT ?"
+DELETE_DOCUMENT_SQL = "DELETE FROM pdf_documents WHERE content_hash = ? AND extractor = ?"
+DELETE_PAGES_SQL = "DELETE FROM pdf_pages WHERE content_hash = ? AND extractor = ?"
+
+class PageTextCache:
+    """
+    On-disk cache of the text extracted from each page of a PDF.
+
+    Documents are keyed by their content hash and the extractor version,
+    with each page stored as a zlib-compressed blob so single pages can be
+    read without the rest. When the compressed size exceeds max_bytes the
+    least recently used documents are evicted. Counts hits, misses and
+    evictions per document lookup.
+
+    Each thread keeps one open connection in WAL mode, so the API workers
+    can share one cache file.
+    """
+
+    def __init__(self, db_path: str = "page_cache.db", extractor: str = "", max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: Path to the SQLite database file
+            extractor: Extractor version; texts cached by other versions are ignored
+            max_bytes: Maximum total size of the compressed page texts
+        """
+        self.db_path = db_path
+        self.extractor = extractor
+        self.max_bytes = max(0, max_bytes)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._get_connection().executescript(SCHEMA_SQL)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close the connections of all threads."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def lookup(self, content_hash: str) -> Optional[int]:
+        """
+        Look up a document, marking it as recently used.
+
+        Returns:
+            The document's page count, or None if it is not cached
+        """
+        conn = self._get_connection()
+        row = conn.execute(SELECT_PAGE_COUNT_SQL, (content_hash, self.extractor)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        with conn:
+            conn.execute(TOUCH_DOCUMENT_SQL, (time.time(), content_hash, self.extractor))
+        return row[0]
+
+    def get_page(self, content_hash: str, page: int) -> Optional[str]:
+        """
+        Read the text of one page of a cached document.
+
+        Returns:
+            The page text, or None if the document is not (or no longer) cached
+        """
+        row = self._get_connection().execute(SELECT_PAGE_SQL, (content_hash, self.extractor, page)).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, content_hash: str, page_texts: List[str]) -> None:
+        """Cache the texts of every page of a document, then evict beyond max_bytes."""
+        if not self.max_bytes:
+            return
+
+        blobs = [zlib.compress(text.encode("utf-8")) for text in page_texts]
+        size = sum(len(blob) for blob in blobs)
+        if size > self.max_bytes:
+            return
+
+        conn = self._get_connection()
+        with conn:
+            conn.execute(DELETE_PAGES_SQL, (content_hash, self.extractor))
+            conn.executemany(INSERT_PAGE_SQL, [
+                (content_hash, self.extractor, page, blob) for page, blob in enumerate(blobs)
+            ])
+            conn.execute(INSERT_DOCUMENT_SQL, (content_hash, self.extractor, len(blobs), size, time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used documents until the cache fits in max_bytes."""
+        _, total = conn.execute(SELECT_TOTALS_SQL).fetchone()
+        while total > self.max_bytes:
+            oldest = conn.execute(SELECT_OLDEST_SQL, (16,)).fetchall()
+            if not oldest:
+                break
+            for content_hash, extractor, size in oldest:
+                conn.execute(DELETE_PAGES_SQL, (content_hash, extractor))
+                conn.execute(DELETE_DOCUMENT_SQL, (content_hash, extractor))
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict:
+        """Report the cache size and hit/miss counters."""
+        entries, size = self._get_connection().execute(SELECT_TOTALS_SQL).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,446 @@
+# File: memory/redis_store.py
+
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import redis
+
+from .memory_store import MemoryStore, QUERY_SORTS, encode_cursor, decode_cursor, timed
+
+# Keys, under the store's key prefix:
+#   doc:{id}                 hash of data type -> JSON, plus _status, _created_at,
+#                            _updated_at and the indexed _format and _upload_time
+#   updated                  every document as "updated_at\0id"
+#   upload                   documents with an upload time as "upload_time\0id"
+#   upload:format:{format}   the same, per format
+#   upload:status:{status}   the same, per status
+#   counts:{dimension}       document counts per format, status, day and
+#                            "format\x1fstatus\x1fday" combination
+# Sorted sets all use score 0 and are read with the BYLEX range commands, which
+# order members like the (time, document_id) keys of the other stores.
+
+# Applies one write and moves the document between indexes and counters, so each
+# write is atomic and a batch of them is a single round trip.
+# ARGV: prefix, document_id, now, data_type, data, status,
+#       has_format, format, has_upload_time, upload_time
+WRITE_SCRIPT = r"""
+local prefix, id, now = ARGV[1], ARGV[2], ARGV[3]
+local doc_key = prefix .. 'doc:' .. id
+local old = redis.call('HMGET', doc_key, '_status', '_format', '_upload_time', '_updated_at')
+local exists = old[4] ~= false
+if not exists and ARGV[4] == '' then
+    -- Status update for an unknown document
+    return 0
+end
+
+local old_status, old_format, old_upload = old[1] or '', old[2] or '', old[3] or ''
+local status, format, upload = old_status, old_format, old_upload
+if not exists then status = 'received' end
+if ARGV[6] ~= '' then status = ARGV[6] end
+if ARGV[7] == '1' then format = ARGV[8] end
+if ARGV[9] == '1' then upload = ARGV[10] end
+
+if not exists then
+    redis.call('HSET', doc_key, '_created_at', now)
+end
+if ARGV[4] ~= '' then
+    redis.call('HSET', doc_key, ARGV[4], ARGV[5])
+end
+redis.call('HSET', doc_key, '_status', status, '_format', format, '_upload_time', upload, '_updated_at', now)
+
+if exists then
+    redis.call('ZREM', prefix .. 'updated', old[4] .. '\0' .. id)
+end
+redis.call('ZADD', prefix .. 'updated', 0, now .. '\0' .. id)
+
+-- Sorted set a document belongs in, or false without an upload time
+local function index_key(time, suffix)
+    if time == '' or not suffix then return false end
+    return prefix .. 'upload' .. suffix
+end
+local function suffix(name, value)
+    if value == '' then return false end
+    return name .. value
+end
+local function move(old_key, new_key)
+    local old_member, new_member = old_upload .. '\0' .. id, upload .. '\0' .. id
+    if old_key == new_key and old_member == new_member then return end
+    if old_key then redis.call('ZREM', old_key, old_member) end
+    if new_key then redis.call('ZADD', new_key, 0, new_member) end
+end
+move(index_key(old_upload, ''), index_key(upload, ''))
+move(index_key(old_upload, suffix(':format:', old_format)), index_key(upload, suffix(':format:', format)))
+move(index_key(old_upload, suffix(':status:', old_status)), index_key(upload, suffix(':status:', status)))
+
+local function count(dimension, old_value, new_value)
+    if exists and old_value == new_value then return end
+    local key = prefix .. 'counts:' .. dimension
+    if exists and old_value ~= '' then
+        if redis.call('HINCRBY', key, old_value, -1) <= 0 then
+            redis.call('HDEL', key, old_value)
+        end
+    end
+    if new_value ~= '' then
+        redis.call('HINCRBY', key, new_value, 1)
+    end
+end
+local old_day, day = string.match(old_upload, '^[^T]*'), string.match(upload, '^[^T]*')
+count('format', old_format, format)
+count('status', old_status, status)
+count('day', old_day, day)
+count('combination', old_format .. '\31' .. old_status .. '\31' .. old_day, format .. '\31' .. status .. '\31' .. day)
+return 1
+"""
+
+# Sorts after every character, closing a lexicographic prefix range
+PREFIX_END = "\U0010ffff"
+
+# get_many() pipelines this many documents per round trip
+GET_MANY_CHUNK_SIZE = 500
+
+class RedisStore(MemoryStore):
+    """
+    Redis implementation of the memory store.
+    
+    Every uvicorn worker (or host) pointed at the same Redis server shares one
+    store. Threads share a bounded connection pool, and writes made inside
+    batch() are pipelined into a single round trip.
+    """
+    
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 max_connections: int = 20, key_prefix: str = "documents:",
+                 client: Optional[redis.Redis] = None):
+        """
+        Initialize the Redis memory store
+        
+        Args:
+            host: Redis server host
+            port: Redis server port
+            db: Redis database number
+            max_connections: Size of the connection pool shared by all threads
+                (threads wait for a free connection beyond it)
+            key_prefix: Prefix for every key the store uses
+            client: Client to use instead of opening a pool, e.g. a fake in tests
+                (must be created with decode_responses=True)
+        """
+        if client is None:
+            pool = redis.BlockingConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                max_connections=max_connections,
+                decode_responses=True
+            )
+            client = redis.Redis(connection_pool=pool)
+        
+        self.client = client
+        self.key_prefix = key_prefix
+        self._write_script = client.register_script(WRITE_SCRIPT)
+        self._local = threading.local()
+    
+    def _key(self, name: str) -> str:
+        return self.key_prefix + name
+    
+    def close(self) -> None:
+        """Close the pooled connections"""
+        self.client.close()
+    
+    @contextmanager
+    def batch(self):
+        """Buffer this thread's writes and send them in one round trip when the block exits"""
+        if getattr(self._local, "pipeline", None) is not None:
+            # Nested batch: the outermost one sends the writes
+            yield
+            return
+        
+        self._local.pipeline = self.client.pipeline(transaction=True)
+        try:
+            yield
+        finally:
+            pipeline, self._local.pipeline = self._local.pipeline, None
+            pipeline.execute()
+    
+    def _write(self, document_id: str, data_type: str = "", data: str = "", status: str = "",
+               format: Optional[str] = None, upload_time: Optional[str] = None) -> None:
+        """Run the write script, on this thread's batch pipeline if there is one"""
+        args = [
+            self.key_prefix, document_id, datetime.utcnow().isoformat(), data_type, data, status,
+            "0" if format is None else "1", format or "",
+            "0" if upload_time is None else "1", upload_time or ""
+        ]
+        pipeline = getattr(self._local, "pipeline", None)
+        self._write_script(args=args, client=self.client if pipeline is None else pipeline)
+    
+    @timed("store")
+    def store(self, document_id: str, data_type: str, data: Dict) -> None:
+        """Store data in Redis"""
+        format = upload_time = None
+        if data_type == "classification":
+            format = (data or {}).get("format") or ""
+        elif data_type == "metadata":
+            upload_time = (data or {}).get("upload_time") or ""
+        
+        self._write(document_id, data_type, json.dumps(data), format=format, upload_time=upload_time)
+    
+    @timed("update_status")
+    def update_status(self, document_id: str, status: str) -> None:
+        """Update the processing status of a document"""
+        self._write(document_id, status=status)
+    
+    @timed("get")
+    def get(self, document_id: str, data_type: Optional[str] = None) -> Union[Dict, List, None]:
+        """Retrieve data from Redis"""
+        key = self._key(f"doc:{document_id}")
+        
+        if data_type:
+            value = self.client.hget(key, data_type)
+            return json.loads(value) if value is not None else None
+        
+        fields = self.client.hgetall(key)
+        return self._to_document(document_id, fields) if fields else None
+    
+    @timed("get_many")
+    def get_many(self, document_ids: List[str]) -> Dict[str, Dict]:
+        """Retrieve several documents, one pipelined round trip per chunk of IDs"""
+        document_ids = list(dict.fromkeys(document_ids))
+        documents = {}
+        for start in range(0, len(document_ids), GET_MANY_CHUNK_SIZE):
+            for document in self._fetch_documents(document_ids[start:start + GET_MANY_CHUNK_SIZE]):
+                documents[document["document_id"]] = document
+        return documents
+    
+    def _to_document(self, document_id: str, fields: Dict[str, str]) -> Dict:
+        """Build a document dictionary from its hash fields"""
+        return {
+            "document_id": document_id,
+            "status": fields.get("_status"),
+            "data": {
+                data_type: json.loads(value)
+                for data_type, value in fields.items() if not data_type.startswith("_") and value is not None
+            },
+            "created_at": fields.get("_created_at"),
+            "updated_at": fields.get("_updated_at")
+        }
+    
+    def _fetch_documents(self, document_ids: List[str], data_types: Optional[List[str]] = None) -> List[Dict]:
+        """Read several documents in one round trip, optionally only some data types"""
+        pipeline = self.client.pipeline(transaction=False)
+        fields = ["_status", "_created_at", "_updated_at"] + (data_types or [])
+        for document_id in document_ids:
+            key = self._key(f"doc:{document_id}")
+            if data_types is None:
+                pipeline.hgetall(key)
+            else:
+                pipeline.hmget(key, fields)
+        
+        documents = []
+        for document_id, values in zip(document_ids, pipeline.execute()):
+            if data_types is not None:
+                values = dict(zip(fields, values))
+            if values.get("_status") is not None:
+                documents.append(self._to_document(document_id, values))
+        return documents
+    
+    def get_all_documents(self, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """Retrieve documents, most recently updated first"""
+        members = self.client.zrevrangebylex(self._key("updated"), "+", "-", start=offset, num=limit)
+        return self._fetch_documents([member.split("\0", 1)[1] for member in members])
+    
+    def list_documents(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        List documents, most recently updated first, with keyset pagination.
+        
+        Returns:
+            Tuple of (documents, next_cursor), shaped like MemoryStore.list_documents
+        """
+        high = "(" + "\0".join(decode_cursor(cursor)) if cursor else "+"
+        members = self.client.zrevrangebylex(self._key("updated"), high, "-", start=0, num=limit + 1)
+        
+        page = [member.split("\0", 1) for member in members[:limit]]
+        documents = self._fetch_documents(
+            [document_id for _, document_id in page], data_types=["metadata", "classification"]
+        )
+        
+        next_cursor = encode_cursor(*page[-1]) if len(members) > limit and page else None
+        return documents, next_cursor
+    
+    def _query_index(self, format: Optional[str], status: Optional[str]) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """
+        Pick the sorted set to walk for a query.
+        
+        Returns:
+            Tuple of (sorted set key, (hash field, value) still to check or None)
+        """
+        if format and status:
+            format_key = self._key(f"upload:format:{format}")
+            status_key = self._key(f"upload:status:{status}")
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.zcard(format_key)
+            pipeline.zcard(status_key)
+            format_size, status_size = pipeline.execute()
+            if format_size <= status_size:
+                return format_key, ("_status", status)
+            return status_key, ("_format", format)
+        if format:
+            return self._key(f"upload:format:{format}"), None
+        if status:
+            return self._key(f"upload:status:{status}"), None
+        return self._key("upload"), None
+    
+    def _walk(self, key: str, check: Optional[Tuple[str, str]], low: str, high: str,
+              descending: bool, chunk_size: int) -> Iterator[str]:
+        """Yield the members of a lexicographic range in order, skipping documents that fail the check"""
+        while True:
+            if descending:
+                members = self.client.zrevrangebylex(key, high, low, start=0, num=chunk_size)
+            else:
+                members = self.client.zrangebylex(key, low, high, start=0, num=chunk_size)
+            if not members:
+                return
+            
+            if check is None:
+                yield from members
+            else:
+                field, value = check
+                pipeline = self.client.pipeline(transaction=False)
+                for member in members:
+                    document_id = member.split("\0", 1)[1]
+                    pipeline.hget(self._key(f"doc:{document_id}"), field)
+                for member, member_value in zip(members, pipeline.execute()):
+                    if member_value == value:
+                        yield member
+            
+            if len(members) < chunk_size:
+                return
+            if descending:
+                high = "(" + members[-1]
+            else:
+                low = "(" + members[-1]
+    
+    @timed("query")
+    def query(self, format: Optional[str] = None, status: Optional[str] = None,
+              date_prefix: Optional[str] = None, sort: str = "-upload_time",
+              cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Filter and order documents with the per-format and per-status sorted sets,
+        with keyset pagination.
+        
+        Arguments and result are as for MemoryStore.query.
+        """
+        if sort not in QUERY_SORTS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        descending = sort.startswith("-")
+        
+        low, high = ("[" + date_prefix, "(" + date_prefix + PREFIX_END) if date_prefix else ("-", "+")
+        if cursor:
+            after = "\0".join(decode_cursor(cursor))
+            if descending and (not date_prefix or after < date_prefix + PREFIX_END):
+                high = "(" + after
+            elif not descending and (not date_prefix or after >= date_prefix):
+                low = "(" + after
+        
+        key, check = self._query_index(format, status)
+        page = []
+        for member in self._walk(key, check, low, high, descending, max(limit + 1, 100) if check else limit + 1):
+            page.append(member.split("\0", 1))
+            if len(page) > limit:
+                break
+        
+        has_more = len(page) > limit
+        page = page[:limit]
+        documents = self._fetch_documents([document_id for _, document_id in page])
+        
+        next_cursor = encode_cursor(*page[-1]) if has_more and page else None
+        return documents, next_cursor
+    
+    @timed("count")
+    def count(self, format: Optional[str] = None, status: Optional[str] = None,
+              date_prefix: Optional[str] = None) -> int:
+        """Count the documents query() would return for the given filters"""
+        low, high = ("[" + date_prefix, "(" + date_prefix + PREFIX_END) if date_prefix else ("-", "+")
+        
+        if not (format and status):
+            key, _ = self._query_index(format, status)
+            return self.client.zlexcount(key, low, high)
+        
+        if not date_prefix or len(date_prefix) <= 10:
+            # Day granularity: add up the matching combinations
+            total = 0
+            for combination, count in self.client.hgetall(self._key("counts:combination")).items():
+                doc_format, doc_status, day = combination.split("\x1f")
+                if doc_format == format and doc_status == status and day and day.startswith(date_prefix or ""):
+                    total += int(count)
+            return total
+        
+        key, check = self._query_index(format, status)
+        return sum(1 for _ in self._walk(key, check, low, high, False, 500))
+    
+    @timed("get_counts")
+    def get_counts(self) -> Dict:
+        """
+        Get the dashboard aggregates from the maintained counters.
+        
+        Returns:
+            Dictionary with total_count and format_counts, status_counts
+            and daily_counts keyed by format, status and upload day
+        """
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.zcard(self._key("updated"))
+        for dimension in ("format", "status", "day"):
+            pipeline.hgetall(self._key(f"counts:{dimension}"))
+        total, formats, statuses, days = pipeline.execute()
+        
+        return {
+            "total_count": total,
+            "format_counts": {key: int(count) for key, count in formats.items()},
+            "status_counts": {key: int(count) for key, count in statuses.items()},
+            "daily_counts": {key: int(count) for key, count in sorted(days.items())}
+        }
+    
+    def rebuild_counts(self) -> None:
+        """
+        Recompute the index fields, sorted sets and counters from the stored documents.
+        
+        Not atomic: run it while nothing else is writing.
+        """
+        derived = [self._key("updated")]
+        derived += self.client.scan_iter(match=self._key("upload*"))
+        derived += self.client.scan_iter(match=self._key("counts:*"))
+        self.client.delete(*derived)
+        
+        doc_prefix = self._key("doc:")
+        fields = ["_status", "_updated_at", "metadata", "classification"]
+        keys = list(self.client.scan_iter(match=doc_prefix + "*", count=500))
+        
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            pipeline = self.client.pipeline(transaction=False)
+            for key in chunk:
+                pipeline.hmget(key, fields)
+            rows = pipeline.execute()
+            
+            pipeline = self.client.pipeline(transaction=False)
+            for key, (status, updated_at, metadata, classification) in zip(chunk, rows):
+                document_id = key[len(doc_prefix):]
+                status = status or ""
+                format = json.loads(classification or "{}").get("format") or ""
+                upload = json.loads(metadata or "{}").get("upload_time") or ""
+                day = upload.split("T")[0]
+                
+                pipeline.hset(key, mapping={"_format": format, "_upload_time": upload})
+                pipeline.zadd(self._key("updated"), {f"{updated_at}\0{document_id}": 0})
+                if upload:
+                    member = f"{upload}\0{document_id}"
+                    pipeline.zadd(self._key("upload"), {member: 0})
+                    if format:
+                        pipeline.zadd(self._key(f"upload:format:{format}"), {member: 0})
+                    if status:
+                        pipeline.zadd(self._key(f"upload:status:{status}"), {member: 0})
+                for dimension, value in (("format", format), ("status", status), ("day", day)):
+                    if value:
+                        pipeline.hincrby(self._key(f"counts:{dimension}"), value, 1)
+                pipeline.hincrby(self._key("counts:combination"), f"{format}\x1f{status}\x1f{day}", 1)
+            pipeline.execute()
@@ -0,0 +1,133 @@
+# File: memory/result_cache.py
+
+import copy
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from utils import tracing
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of processing results.
+
+    Entries are keyed by the uploaded content's hash, the agent versions, the
+    user intent and the parts of the file name and content type the agents
+    read, so a repeat upload can reuse the classification and analysis of an
+    earlier one. Counts hits, misses and evictions.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of results kept (0 disables the cache)
+        """
+        self.max_entries = max(0, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(content_hash: str, agent_version: str, intent: str = "", name_inputs: str = "") -> str:
+        """
+        Build the cache key for an upload.
+
+        Args:
+            content_hash: SHA-256 of the uploaded content
+            agent_version: Versions of the agents producing the results
+            intent: User-provided intent
+            name_inputs: The parts of the file name and content type the
+                results depend on (see Agent.cache_inputs)
+        """
+        return f"{content_hash}:{agent_version}:{intent}:{name_inputs}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a result, marking it as recently used.
+
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Callers store the result on a new document, so never hand out the cached objects
+        return copy.deepcopy(entry)
+
+    def put(self, key: str, result: Dict) -> None:
+        """Cache a result, evicting the least recently used ones beyond max_entries."""
+        if not self.max_entries:
+            return
+
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached result (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Report the cache size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class RecordingStore:
+    """
+    Memory store wrapper that records the data each thread stores inside record().
+
+    Agents write through it so their results can be cached and replayed onto
+    another document, and their writes are timed as the traced document's
+    store_write stage; every other call goes straight to the wrapped store.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+    def store(self, document_id: str, data_type: str, data: Dict) -> None:
+        writes = getattr(self._local, "writes", None)
+        if writes is not None:
+            writes.append((data_type, data))
+        with tracing.stage("store_write"):
+            self._store.store(document_id, data_type, data)
+
+    @contextmanager
+    def record(self):
+        """
+        Record this thread's store() calls made inside the block.
+
+        Yields:
+            List that collects (data_type, data) for each write, in order
+        """
+        self._local.writes = []
+        try:
+            yield self._local.writes
+        finally:
+            self._local.writes = None
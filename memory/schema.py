@@ -35,6 +35,17 @@ class ActionRecord(BaseModel):
     details: Dict[str, Any]
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+class StageTiming(BaseModel):
+    """Schema for the timing of one processing stage"""
+    stage: str
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    bytes_read: int = 0
+    page_count: Optional[int] = None
+    field_count: Optional[int] = None
+    error: Optional[str] = None
+
 class ProcessingTrace(BaseModel):
     """Schema for full processing trace"""
     document_id: str
@@ -42,5 +53,7 @@ class ProcessingTrace(BaseModel):
     classification: Optional[ClassificationResult] = None
     extractions: Dict[str, ExtractionResult] = {}
     actions: List[ActionRecord] = []
+    stages: List[StageTiming] = []
+    cached: bool = False
     status: str = "received"
     last_updated: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
@@ -1,86 +1,336 @@
 import sqlite3
 import json
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Tuple, Union, Any
 import os
-from .memory_store import MemoryStore
+from .memory_store import MemoryStore, QUERY_SORTS, encode_cursor, decode_cursor, timed
+
+# SQL is kept in constants so each connection's statement cache
+# reuses the compiled statements across calls
+INSERT_DOCUMENT_SQL = "INSERT OR IGNORE INTO documents (document_id, status, last_updated) VALUES (?, ?, ?)"
+INSERT_DATA_SQL = "INSERT INTO document_data (document_id, data_type, data, timestamp) VALUES (?, ?, ?, ?)"
+SELECT_DATA_SQL = "SELECT data FROM document_current WHERE document_id = ? AND data_type = ?"
+SELECT_STATUS_SQL = "SELECT status FROM documents WHERE document_id = ?"
+SELECT_ALL_DATA_SQL = "SELECT data_type, data FROM document_current WHERE document_id = ?"
+UPDATE_STATUS_SQL = "UPDATE documents SET status = ?, last_updated = ? WHERE document_id = ?"
+
+# get_many() reads documents in chunks of this many IDs, below SQLite's variable limit
+GET_MANY_CHUNK_SIZE = 500
+SELECT_MANY_STATUS_SQL = "SELECT document_id, status FROM documents WHERE document_id IN ({placeholders})"
+SELECT_MANY_DATA_SQL = "SELECT document_id, data_type, data FROM document_current WHERE document_id IN ({placeholders})"
+
+# Documents joined with their latest metadata and classification in one query
+DOCUMENTS_WITH_DATA_SQL = """
+    SELECT d.document_id, d.status, d.last_updated,
+           m.data AS metadata, c.data AS classification
+    FROM documents d
+    LEFT JOIN document_current m ON m.document_id = d.document_id AND m.data_type = 'metadata'
+    LEFT JOIN document_current c ON c.document_id = d.document_id AND c.data_type = 'classification'
+"""
+SELECT_DOCUMENTS_SQL = DOCUMENTS_WITH_DATA_SQL + "ORDER BY d.last_updated DESC LIMIT ? OFFSET ?"
+LIST_DOCUMENTS_SQL = DOCUMENTS_WITH_DATA_SQL + "ORDER BY d.last_updated DESC, d.document_id DESC LIMIT ?"
+LIST_DOCUMENTS_AFTER_SQL = (
+    DOCUMENTS_WITH_DATA_SQL
+    + "WHERE (d.last_updated, d.document_id) < (?, ?) ORDER BY d.last_updated DESC, d.document_id DESC LIMIT ?"
+)
+
+# Filtered listing ordered by upload time; query() appends the WHERE clauses
+QUERY_DOCUMENTS_SQL = DOCUMENTS_WITH_DATA_SQL + "WHERE d.upload_time IS NOT NULL"
+COUNT_DOCUMENTS_SQL = "SELECT COUNT(*) FROM documents d WHERE d.upload_time IS NOT NULL"
+# Counted from the maintained counters: documents by upload day range, and by format or status
+COUNT_DAYS_SQL = "SELECT COALESCE(SUM(count), 0) FROM document_counts WHERE dimension = 'day' AND key >= ? AND key < ?"
+COUNT_FACET_SQL = "SELECT count FROM document_counts WHERE dimension = ? AND key = ?"
+
+# Date part of an ISO upload time, matching upload_time.split("T")[0]
+UPLOAD_DAY_SQL = "substr({time}, 1, CASE WHEN instr({time}, 'T') > 0 THEN instr({time}, 'T') - 1 ELSE length({time}) END)"
+
+SELECT_COUNTS_SQL = "SELECT dimension, key, count FROM document_counts WHERE count > 0 ORDER BY dimension, key"
+REBUILD_DOCUMENT_COLUMNS_SQL = """
+    UPDATE documents SET
+        format = (SELECT NULLIF(json_extract(data, '$.format'), '') FROM document_current
+                  WHERE document_id = documents.document_id AND data_type = 'classification'),
+        upload_time = (SELECT NULLIF(json_extract(data, '$.upload_time'), '') FROM document_current
+                       WHERE document_id = documents.document_id AND data_type = 'metadata')
+"""
+REBUILD_UPLOAD_DAY_SQL = "UPDATE documents SET upload_day = NULLIF(" + UPLOAD_DAY_SQL.format(time="upload_time") + ", '')"
+REBUILD_COUNTS_SQL = """
+    INSERT INTO document_counts (dimension, key, count)
+        SELECT 'total', '', COUNT(*) FROM documents
+        UNION ALL
+        SELECT 'status', status, COUNT(*) FROM documents WHERE status IS NOT NULL AND status != '' GROUP BY status
+        UNION ALL
+        SELECT 'format', format, COUNT(*) FROM documents WHERE format IS NOT NULL GROUP BY format
+        UNION ALL
+        SELECT 'day', upload_day, COUNT(*) FROM documents WHERE upload_day IS NOT NULL GROUP BY upload_day
+"""
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+MIGRATIONS = [
+    # 1: lookup indexes and a trigger-maintained table holding the latest
+    #    value per (document_id, data_type), backfilled from document_data
+    """
+    CREATE INDEX IF NOT EXISTS idx_document_data_lookup
+        ON document_data (document_id, data_type, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_documents_last_updated
+        ON documents (last_updated);
+
+    CREATE TABLE IF NOT EXISTS document_current (
+        document_id TEXT NOT NULL,
+        data_type TEXT NOT NULL,
+        data TEXT,
+        timestamp TEXT,
+        PRIMARY KEY (document_id, data_type)
+    ) WITHOUT ROWID;
+
+    INSERT OR REPLACE INTO document_current (document_id, data_type, data, timestamp)
+        SELECT document_id, data_type, data, timestamp FROM document_data
+        ORDER BY timestamp, id;
+
+    CREATE TRIGGER IF NOT EXISTS trg_document_data_current
+    AFTER INSERT ON document_data
+    BEGIN
+        INSERT OR REPLACE INTO document_current (document_id, data_type, data, timestamp)
+        VALUES (NEW.document_id, NEW.data_type, NEW.data, NEW.timestamp);
+    END;
+    """,
+    # 2: composite index for keyset pagination on (last_updated, document_id)
+    """
+    DROP INDEX IF EXISTS idx_documents_last_updated;
+    CREATE INDEX IF NOT EXISTS idx_documents_updated_id
+        ON documents (last_updated, document_id);
+    """,
+    # 3: per-document format and upload time columns, filled from the latest
+    #    classification and metadata, and aggregate counters kept current by triggers
+    """
+    ALTER TABLE documents ADD COLUMN format TEXT;
+    ALTER TABLE documents ADD COLUMN upload_time TEXT;
+    ALTER TABLE documents ADD COLUMN upload_day TEXT;
+
+    CREATE TABLE IF NOT EXISTS document_counts (
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, key)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS trg_document_data_classification
+    AFTER INSERT ON document_data WHEN NEW.data_type = 'classification'
+    BEGIN
+        UPDATE documents SET format = NULLIF(json_extract(NEW.data, '$.format'), '')
+        WHERE document_id = NEW.document_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_document_data_metadata
+    AFTER INSERT ON document_data WHEN NEW.data_type = 'metadata'
+    BEGIN
+        UPDATE documents SET
+            upload_time = NULLIF(json_extract(NEW.data, '$.upload_time'), ''),
+            upload_day = NULLIF(""" + UPLOAD_DAY_SQL.format(time="json_extract(NEW.data, '$.upload_time')") + """, '')
+        WHERE document_id = NEW.document_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_documents_count_insert
+    AFTER INSERT ON documents
+    BEGIN
+        INSERT INTO document_counts (dimension, key, count) VALUES ('total', '', 1)
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+        INSERT INTO document_counts (dimension, key, count)
+            SELECT 'status', NEW.status, 1 WHERE NEW.status IS NOT NULL AND NEW.status != ''
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_documents_count_status
+    AFTER UPDATE OF status ON documents WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE document_counts SET count = count - 1
+            WHERE dimension = 'status' AND key = OLD.status;
+        INSERT INTO document_counts (dimension, key, count)
+            SELECT 'status', NEW.status, 1 WHERE NEW.status IS NOT NULL AND NEW.status != ''
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_documents_count_format
+    AFTER UPDATE OF format ON documents WHEN OLD.format IS NOT NEW.format
+    BEGIN
+        UPDATE document_counts SET count = count - 1
+            WHERE dimension = 'format' AND key = OLD.format;
+        INSERT INTO document_counts (dimension, key, count)
+            SELECT 'format', NEW.format, 1 WHERE NEW.format IS NOT NULL AND NEW.format != ''
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_documents_count_upload_day
+    AFTER UPDATE OF upload_day ON documents WHEN OLD.upload_day IS NOT NEW.upload_day
+    BEGIN
+        UPDATE document_counts SET count = count - 1
+            WHERE dimension = 'day' AND key = OLD.upload_day;
+        INSERT INTO document_counts (dimension, key, count)
+            SELECT 'day', NEW.upload_day, 1 WHERE NEW.upload_day IS NOT NULL AND NEW.upload_day != ''
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + 1;
+    END;
+    """,
+    # 4: indexes serving query(): filter by format or status, order by upload time
+    """
+    CREATE INDEX IF NOT EXISTS idx_documents_upload
+        ON documents (upload_time, document_id);
+    CREATE INDEX IF NOT EXISTS idx_documents_format_upload
+        ON documents (format, upload_time, document_id);
+    CREATE INDEX IF NOT EXISTS idx_documents_status_upload
+        ON documents (status, upload_time, document_id);
+    """,
+]
 
 class SQLiteStore(MemoryStore):
-    """SQLite implementation of the memory store"""
+    """
+    SQLite implementation of the memory store.
+    
+    Each thread keeps one open connection in WAL mode, so readers don't
+    block the writer and worker pool threads can share the store.
+    """
     
-    def __init__(self, db_path: str = "memory.db"):
+    def __init__(self, db_path: str = "memory.db", synchronous: str = "NORMAL",
+                 cache_size_kb: int = 8192, statement_cache_size: int = 64):
         """
         Initialize the SQLite memory store
         
         Args:
             db_path: Path to the SQLite database file
+            synchronous: SQLite synchronous pragma (NORMAL is durable in WAL mode
+                except for the last transactions on power loss)
+            cache_size_kb: Page cache size per connection in KiB
+            statement_cache_size: Number of prepared statements cached per connection
         """
         self.db_path = db_path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self._create_tables()
+        self._migrate()
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=30,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+            
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self) -> None:
+        """Close the connections of all threads"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
     
     def _create_tables(self):
         """Create necessary database tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Documents table stores basic document info and status
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS documents (
-            document_id TEXT PRIMARY KEY,
-            status TEXT,
-            last_updated TEXT
-        )
-        ''')
-        
-        # Data table stores all types of data with JSON serialization
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS document_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            document_id TEXT,
-            data_type TEXT,
-            data TEXT,
-            timestamp TEXT,
-            FOREIGN KEY (document_id) REFERENCES documents(document_id)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        conn = self._get_connection()
+        
+        with conn:
+            # Documents table stores basic document info and status
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY,
+                status TEXT,
+                last_updated TEXT
+            )
+            ''')
+            
+            # Data table stores all types of data with JSON serialization
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS document_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id TEXT,
+                data_type TEXT,
+                data TEXT,
+                timestamp TEXT,
+                FOREIGN KEY (document_id) REFERENCES documents(document_id)
+            )
+            ''')
     
-    def store(self, document_id: str, data_type: str, data: Dict) -> None:
-        """Store data in the SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _migrate(self):
+        """Apply pending schema migrations"""
+        conn = self._get_connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            # executescript commits first, so run each migration as one transaction
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        
+        if version < 3 <= len(MIGRATIONS):
+            # Existing documents predate the aggregate triggers
+            self.rebuild_counts()
+    
+    @timed("get_counts")
+    def get_counts(self) -> Dict:
+        """
+        Get the dashboard aggregates from the maintained counters.
+        
+        Returns:
+            Dictionary with total_count and format_counts, status_counts
+            and daily_counts keyed by format, status and upload day
+        """
+        conn = self._get_connection()
+        
+        counts = {"total": {}, "format": {}, "status": {}, "day": {}}
+        for row in conn.execute(SELECT_COUNTS_SQL).fetchall():
+            counts[row['dimension']][row['key']] = row['count']
         
-        # Ensure document exists
-        cursor.execute(
-            "INSERT OR IGNORE INTO documents (document_id, status, last_updated) VALUES (?, ?, ?)",
-            (document_id, "received", datetime.utcnow().isoformat())
-        )
+        return {
+            "total_count": counts["total"].get("", 0),
+            "format_counts": counts["format"],
+            "status_counts": counts["status"],
+            "daily_counts": counts["day"]
+        }
+    
+    def rebuild_counts(self) -> None:
+        """Recompute the per-document columns and aggregate counters from the stored data"""
+        conn = self._get_connection()
         
-        # Store the data
-        cursor.execute(
-            "INSERT INTO document_data (document_id, data_type, data, timestamp) VALUES (?, ?, ?, ?)",
-            (document_id, data_type, json.dumps(data), datetime.utcnow().isoformat())
-        )
+        with conn:
+            conn.execute(REBUILD_DOCUMENT_COLUMNS_SQL)
+            conn.execute(REBUILD_UPLOAD_DAY_SQL)
+            conn.execute("DELETE FROM document_counts")
+            conn.execute(REBUILD_COUNTS_SQL)
+    
+    @timed("store")
+    def store(self, document_id: str, data_type: str, data: Dict) -> None:
+        """Store data in the SQLite database"""
+        conn = self._get_connection()
+        timestamp = datetime.utcnow().isoformat()
         
-        conn.commit()
-        conn.close()
+        with conn:
+            # Ensure document exists
+            conn.execute(INSERT_DOCUMENT_SQL, (document_id, "received", timestamp))
+            
+            # Store the data
+            conn.execute(INSERT_DATA_SQL, (document_id, data_type, json.dumps(data), timestamp))
     
+    @timed("get")
     def get(self, document_id: str, data_type: Optional[str] = None) -> Union[Dict, List, None]:
         """Retrieve data from the SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        conn = self._get_connection()
         
         if data_type:
             # Get specific data type
-            cursor.execute(
-                "SELECT data FROM document_data WHERE document_id = ? AND data_type = ? ORDER BY timestamp DESC LIMIT 1",
-                (document_id, data_type)
-            )
-            row = cursor.fetchone()
-            conn.close()
+            row = conn.execute(SELECT_DATA_SQL, (document_id, data_type)).fetchone()
             
             if row:
                 return json.loads(row['data'])
@@ -92,68 +342,184 @@ class SQLiteStore(MemoryStore):
                 'data': {}
             }
             
-            # Get document status
-            cursor.execute("SELECT status FROM documents WHERE document_id = ?", (document_id,))
-            status_row = cursor.fetchone()
-            if status_row:
-                result['status'] = status_row['status']
+            # Get document status (unknown documents return None, as in MemoryStore)
+            status_row = conn.execute(SELECT_STATUS_SQL, (document_id,)).fetchone()
+            if status_row is None:
+                return None
+            result['status'] = status_row['status']
             
             # Get all data types
-            cursor.execute(
-                """
-                SELECT data_type, data FROM document_data 
-                WHERE document_id = ? 
-                GROUP BY data_type 
-                HAVING timestamp = MAX(timestamp)
-                """,
-                (document_id,)
-            )
-            
-            for row in cursor.fetchall():
+            for row in conn.execute(SELECT_ALL_DATA_SQL, (document_id,)).fetchall():
                 result['data'][row['data_type']] = json.loads(row['data'])
             
-            conn.close()
             return result
     
+    @timed("get_many")
+    def get_many(self, document_ids: List[str]) -> Dict[str, Dict]:
+        """Retrieve several documents with two queries per chunk of IDs"""
+        conn = self._get_connection()
+        document_ids = list(dict.fromkeys(document_ids))
+        
+        documents = {}
+        for start in range(0, len(document_ids), GET_MANY_CHUNK_SIZE):
+            chunk = document_ids[start:start + GET_MANY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(SELECT_MANY_STATUS_SQL.format(placeholders=placeholders), chunk):
+                documents[row['document_id']] = {
+                    'document_id': row['document_id'],
+                    'data': {},
+                    'status': row['status']
+                }
+            for row in conn.execute(SELECT_MANY_DATA_SQL.format(placeholders=placeholders), chunk):
+                if row['document_id'] in documents:
+                    documents[row['document_id']]['data'][row['data_type']] = json.loads(row['data'])
+        
+        return documents
+    
+    @timed("update_status")
     def update_status(self, document_id: str, status: str) -> None:
         """Update the processing status of a document"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE documents SET status = ?, last_updated = ? WHERE document_id = ?",
-            (status, datetime.utcnow().isoformat(), document_id)
-        )
+        conn = self._get_connection()
         
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute(UPDATE_STATUS_SQL, (status, datetime.utcnow().isoformat(), document_id))
     
     def get_all_documents(self, limit: int = 100, offset: int = 0) -> List[Dict]:
         """Retrieve a list of all documents in the store"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT document_id, status, last_updated FROM documents ORDER BY last_updated DESC LIMIT ? OFFSET ?",
-            (limit, offset)
-        )
+        conn = self._get_connection()
         
         result = []
-        for row in cursor.fetchall():
-            document = dict(row)
-            
-            # Get document metadata if available
-            cursor.execute(
-                "SELECT data FROM document_data WHERE document_id = ? AND data_type = 'metadata' ORDER BY timestamp DESC LIMIT 1",
-                (row['document_id'],)
-            )
-            metadata_row = cursor.fetchone()
+        for row in conn.execute(SELECT_DOCUMENTS_SQL, (limit, offset)).fetchall():
+            document = {
+                'document_id': row['document_id'],
+                'status': row['status'],
+                'last_updated': row['last_updated']
+            }
             
-            if metadata_row:
-                document['metadata'] = json.loads(metadata_row['data'])
+            # Add document metadata and classification if available
+            if row['metadata'] is not None:
+                document['metadata'] = json.loads(row['metadata'])
+            if row['classification'] is not None:
+                document['classification'] = json.loads(row['classification'])
             
             result.append(document)
         
-        conn.close()
-        return result
\ No newline at end of file
+        return result
+    
+    def list_documents(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        List documents, most recently updated first, with keyset pagination.
+        
+        Args:
+            limit: Maximum number of documents to return
+            cursor: Cursor returned by the previous page, or None for the first page
+            
+        Returns:
+            Tuple of (documents, next_cursor), shaped like MemoryStore.list_documents
+        """
+        conn = self._get_connection()
+        
+        # Fetch one extra row to know whether there is a next page
+        if cursor:
+            last_updated, document_id = decode_cursor(cursor)
+            rows = conn.execute(LIST_DOCUMENTS_AFTER_SQL, (last_updated, document_id, limit + 1)).fetchall()
+        else:
+            rows = conn.execute(LIST_DOCUMENTS_SQL, (limit + 1,)).fetchall()
+        
+        documents = [self._row_to_document(row) for row in rows[:limit]]
+        
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last['last_updated'], last['document_id'])
+        
+        return documents, next_cursor
+    
+    def _query_filters(self, format: Optional[str], status: Optional[str],
+                       date_prefix: Optional[str]) -> Tuple[str, List]:
+        """Build the WHERE clauses and parameters shared by query() and count()"""
+        clauses = []
+        params = []
+        if format:
+            clauses.append("d.format = ?")
+            params.append(format)
+        if status:
+            clauses.append("d.status = ?")
+            params.append(status)
+        if date_prefix:
+            # Range rather than LIKE so the upload_time indexes apply
+            clauses.append("d.upload_time >= ? AND d.upload_time < ?")
+            params.extend([date_prefix, date_prefix + "\U0010ffff"])
+        
+        return "".join(f" AND {clause}" for clause in clauses), params
+    
+    @timed("query")
+    def query(self, format: Optional[str] = None, status: Optional[str] = None,
+              date_prefix: Optional[str] = None, sort: str = "-upload_time",
+              cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Filter and order documents with the documents table indexes, with keyset pagination.
+        
+        Arguments and result are as for MemoryStore.query.
+        """
+        if sort not in QUERY_SORTS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        direction, comparison = ("DESC", "<") if sort.startswith("-") else ("ASC", ">")
+        
+        where, params = self._query_filters(format, status, date_prefix)
+        if cursor:
+            where += f" AND (d.upload_time, d.document_id) {comparison} (?, ?)"
+            params.extend(decode_cursor(cursor))
+        sql = (QUERY_DOCUMENTS_SQL + where
+               + f" ORDER BY d.upload_time {direction}, d.document_id {direction} LIMIT ?")
+        
+        conn = self._get_connection()
+        rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        documents = [self._row_to_document(row) for row in rows[:limit]]
+        
+        next_cursor = None
+        if len(rows) > limit and documents:
+            last = documents[-1]
+            next_cursor = encode_cursor(last['created_at'], last['document_id'])
+        
+        return documents, next_cursor
+    
+    @timed("count")
+    def count(self, format: Optional[str] = None, status: Optional[str] = None,
+              date_prefix: Optional[str] = None) -> int:
+        """
+        Count the documents query() would return for the given filters.
+        
+        No filter, a date prefix alone (down to the day) or a format or status
+        alone is read from the maintained counters; other combinations are
+        counted with the documents table indexes.
+        """
+        conn = self._get_connection()
+        if not (format or status) and (not date_prefix or "T" not in date_prefix):
+            # Upload days add up to the documents with an upload time
+            prefix = date_prefix or ""
+            return conn.execute(COUNT_DAYS_SQL, (prefix, prefix + "\U0010ffff")).fetchone()[0]
+        if not date_prefix and not (format and status):
+            # Every upload is stored with its upload time, so these match query()
+            dimension, key = ("format", format) if format else ("status", status)
+            row = conn.execute(COUNT_FACET_SQL, (dimension, key)).fetchone()
+            return row[0] if row else 0
+        
+        where, params = self._query_filters(format, status, date_prefix)
+        return conn.execute(COUNT_DOCUMENTS_SQL + where, params).fetchone()[0]
+    
+    def _row_to_document(self, row) -> Dict:
+        """Build a document dictionary from a documents row joined with its latest data"""
+        data = {}
+        if row['metadata'] is not None:
+            data['metadata'] = json.loads(row['metadata'])
+        if row['classification'] is not None:
+            data['classification'] = json.loads(row['classification'])
+        
+        return {
+            'document_id': row['document_id'],
+            'status': row['status'],
+            'created_at': data.get('metadata', {}).get('upload_time'),
+            'updated_at': row['last_updated'],
+            'data': data
+        }
\ No newline at end of file
@@ -0,0 +1,84 @@
+# File: memory/trace_store.py
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from memory.schema import DocumentMetadata, ProcessingTrace
+from utils.tracing import StageTracer
+
+
+def trace_summary(trace: ProcessingTrace) -> Dict:
+    """Total and slowest stage of a trace, for listing documents."""
+    slowest = max(trace.stages, key=lambda timing: timing.wall_seconds, default=None)
+    return {
+        "document_id": trace.document_id,
+        "filename": trace.metadata.filename,
+        "status": trace.status,
+        "cached": trace.cached,
+        "wall_seconds": round(sum(timing.wall_seconds for timing in trace.stages), 6),
+        "cpu_seconds": round(sum(timing.cpu_seconds for timing in trace.stages), 6),
+        "slowest_stage": slowest.stage if slowest is not None else None
+    }
+
+
+class TraceStore:
+    """
+    Processing traces of the most recently received documents.
+
+    Kept in this process's memory and bounded like the result cache: past
+    max_traces, the trace of the oldest received document is dropped.
+    """
+
+    def __init__(self, max_traces: int = 1000):
+        """
+        Initialize the store.
+
+        Args:
+            max_traces: Maximum number of traces kept (0 keeps none)
+        """
+        self.max_traces = max(0, max_traces)
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def start(self, metadata: DocumentMetadata) -> ProcessingTrace:
+        """
+        Start the trace of a received document.
+
+        Returns:
+            The new trace (not kept if the store keeps none)
+        """
+        trace = ProcessingTrace(document_id=metadata.document_id, metadata=metadata)
+        if not self.max_traces:
+            return trace
+
+        with self._lock:
+            self._traces[trace.document_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+                self.evictions += 1
+        return trace
+
+    def get(self, document_id: str) -> Optional[ProcessingTrace]:
+        """Look up a document's trace (None if unknown or dropped)."""
+        with self._lock:
+            return self._traces.get(document_id)
+
+    def tracer(self, document_id: str) -> Optional[StageTracer]:
+        """A tracer adding stages to a document's trace, or None if there is no trace."""
+        trace = self.get(document_id)
+        return StageTracer(trace) if trace is not None else None
+
+    def slowest(self, limit: int = 20) -> List[Dict]:
+        """Summaries of the traces with the most total wall time, slowest first."""
+        with self._lock:
+            traces = list(self._traces.values())
+        summaries = [trace_summary(trace) for trace in traces]
+        summaries.sort(key=lambda summary: summary["wall_seconds"], reverse=True)
+        return summaries[:limit]
+
+    def stats(self) -> Dict:
+        """Report the number of traces kept and dropped."""
+        with self._lock:
+            return {"traces": len(self._traces), "max_traces": self.max_traces, "evictions": self.evictions}
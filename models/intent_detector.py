@@ -3,6 +3,7 @@
 import json
 import logging
 from models.classifier import IntentClassifier
+from utils.parsed_document import ParsedDocument
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +21,7 @@ class IntentDetector:
         """
         self.classifier = classifier_model if classifier_model else IntentClassifier()
     
-    def detect_intent(self, file_path, content_type, text_content=None):
+    def detect_intent(self, file_path, content_type, text_content=None, document=None):
         """
         Detect the intent of a document.
         
@@ -28,6 +29,7 @@ class IntentDetector:
             file_path: Path to the document file
             content_type: MIME type of the document
             text_content: Pre-extracted text content (optional)
+            document: Already parsed file content (optional ParsedDocument)
             
         Returns:
             dict: Intent classification results
@@ -36,7 +38,7 @@ class IntentDetector:
             # Special handling for JSON files
             if content_type == 'application/json':
                 # Try to detect JSON schema specifically
-                json_intent = self._detect_json_intent(file_path)
+                json_intent = self._detect_json_intent(file_path, document)
                 if json_intent:
                     return json_intent
             
@@ -55,22 +57,23 @@ class IntentDetector:
                 "confidence": 0.1  # Low confidence for error cases
             }
     
-    def _detect_json_intent(self, file_path):
+    def _detect_json_intent(self, file_path, document=None):
         """
         Special handling for JSON files to detect schema files.
         
         Args:
             file_path: Path to the JSON file
+            document: Already parsed file content (optional ParsedDocument)
             
         Returns:
             dict: Intent classification results, or None if not a special JSON type
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+            if document is None:
+                document = ParsedDocument(file_path)
                 
             try:
-                json_data = json.loads(content)
+                json_data = document.json_data
                 
                 # Check if this is a JSON schema file
                 if isinstance(json_data, dict):
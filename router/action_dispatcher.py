@@ -0,0 +1,230 @@
+# File: router/action_dispatcher.py
+
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: the endpoint timed out, was overloaded or failed
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class ActionDispatchError(Exception):
+    """
+    An action request was rejected by the endpoint or failed on every attempt.
+
+    status_code is the rejecting 4xx status, or None if every attempt failed.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class EndpointStats:
+    """Request counters and latency histogram of one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.latency = Histogram()
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency": self.latency.snapshot()
+        }
+
+
+class ActionDispatcher:
+    """
+    Sends action requests to the downstream systems (CRM, finance, compliance).
+
+    One httpx.AsyncClient runs on a private event loop thread, so the worker
+    threads calling dispatch() share its keep-alive connection pool instead
+    of opening a connection per action. Each endpoint path has its own
+    concurrency limit. Connection errors, timeouts and 408/429/5xx responses
+    are retried with exponential backoff and full jitter; every attempt of a
+    request carries the same Idempotency-Key header so the endpoint can
+    discard duplicates.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10.0, max_connections: int = 20,
+                 endpoint_concurrency: int = 8, retries: int = 3, backoff_base: float = 0.2,
+                 backoff_max: float = 5.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Start the dispatcher loop.
+
+        Args:
+            base_url: URL the endpoint paths are resolved against
+            timeout: Seconds to wait for a connection or a response, per attempt
+            max_connections: Size of the connection pool shared by all endpoints
+            endpoint_concurrency: Maximum requests in flight per endpoint
+            retries: Retries after the first attempt (0 never retries)
+            backoff_base: Upper bound of the first retry delay in seconds, doubled per retry
+            backoff_max: Upper bound of any retry delay in seconds
+            transport: httpx transport replacing the network one (for tests)
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.endpoint_concurrency = max(1, endpoint_concurrency)
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+        # Semaphores and request counters are only touched from the loop thread
+        self._semaphores = {}
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="action-dispatcher", daemon=True)
+        self._thread.start()
+
+    def _endpoint_stats(self, endpoint: str) -> EndpointStats:
+        with self._stats_lock:
+            if endpoint not in self._stats:
+                self._stats[endpoint] = EndpointStats()
+            return self._stats[endpoint]
+
+    def _backoff(self, retry: int, response: Optional[httpx.Response]) -> float:
+        """Delay before a retry, at least the response's Retry-After seconds."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+        return delay
+
+    async def send(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                   idempotency_key: Optional[str] = None) -> Dict:
+        """
+        Send a request and retry transient failures. Runs on the dispatcher loop.
+
+        Args:
+            method: HTTP method
+            endpoint: Path relative to the base URL
+            data: JSON body
+            idempotency_key: Key identifying the request (a new one by default)
+
+        Returns:
+            The JSON response, or the status code if the body is not JSON
+
+        Raises:
+            ActionDispatchError: The endpoint answered 4xx or every attempt failed
+        """
+        stats = self._endpoint_stats(endpoint)
+        stats.requests += 1
+        semaphore = self._semaphores.setdefault(endpoint, asyncio.Semaphore(self.endpoint_concurrency))
+        headers = {"Idempotency-Key": idempotency_key or uuid.uuid4().hex}
+
+        response = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                stats.retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await self._client.request(method, endpoint, json=data, headers=headers)
+                    error = f"HTTP {response.status_code}"
+                except httpx.TransportError as e:
+                    response = None
+                    error = f"{type(e).__name__}: {e}"
+                stats.latency.observe(time.perf_counter() - start)
+
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                break
+            logger.warning(f"{method} {endpoint} failed ({error}), attempt {attempt + 1} of {self.retries + 1}")
+        else:
+            stats.failures += 1
+            raise ActionDispatchError(f"{method} {endpoint} failed after {self.retries + 1} attempts: {error}")
+
+        if response.is_error:
+            stats.failures += 1
+            raise ActionDispatchError(
+                f"{method} {endpoint} returned HTTP {response.status_code}: {response.text[:200]}",
+                response.status_code
+            )
+
+        try:
+            return response.json()
+        except ValueError:
+            return {"status": "success", "status_code": response.status_code}
+
+    def dispatch(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                 idempotency_key: Optional[str] = None) -> Dict:
+        """
+        Send a request from a worker thread and wait for the response.
+
+        Takes the same arguments and raises the same errors as send().
+        """
+        future = asyncio.run_coroutine_threadsafe(self.send(method, endpoint, data, idempotency_key), self._loop)
+        return future.result()
+
+    def dispatch_many(self, method: str, endpoint: str, requests: List[Tuple[Dict, str]]) -> List:
+        """
+        Send several requests to one endpoint concurrently and wait for all of them.
+
+        Args:
+            method: HTTP method
+            endpoint: Path relative to the base URL
+            requests: (JSON body, idempotency key) of each request
+
+        Returns:
+            For each request, its response or the exception it raised
+        """
+        async def send_all():
+            return await asyncio.gather(
+                *(self.send(method, endpoint, data, key) for data, key in requests), return_exceptions=True
+            )
+
+        return asyncio.run_coroutine_threadsafe(send_all(), self._loop).result()
+
+    def max_delivery_seconds(self, requests: int = 1) -> float:
+        """
+        Upper bound of the time dispatch_many() takes for this many requests
+        to one endpoint, reached when every attempt times out.
+        """
+        waves = math.ceil(max(1, requests) / self.endpoint_concurrency)
+        return waves * ((self.retries + 1) * self.timeout + self.retries * self.backoff_max)
+
+    def endpoint_stats(self) -> Dict[str, EndpointStats]:
+        """The request counters and latency histogram of each endpoint called so far."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def stats(self) -> Dict:
+        """Report request, retry and failure counts and the latency histogram per endpoint."""
+        endpoints = self.endpoint_stats()
+        return {
+            "base_url": self.base_url,
+            "endpoints": {endpoint: stats.snapshot() for endpoint, stats in sorted(endpoints.items())}
+        }
+
+    def close(self) -> None:
+        """Close the connection pool and stop the loop thread."""
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
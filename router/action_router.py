@@ -1,18 +1,47 @@
 # File: router/action_router.py
 
+import hashlib
 import logging
-import requests
+from contextlib import nullcontext
 from datetime import datetime
 
+from memory.schema import ActionRecord
+from router.routing_rules import RoutingRules
+from utils.metrics import Counter
+
 logger = logging.getLogger(__name__)
 
+# Actions by name and outcome: recorded, sent, queued, duplicate, delivered,
+# abandoned, unknown (named "unknown", whatever was requested) or error
+ACTION_OUTCOMES = Counter(("action", "outcome"))
+
 class ActionRouter:
     """
     Router for triggering follow-up actions based on document analysis.
+    
+    Which action a document gets, and what each action calls, is defined by
+    declarative routing rules (see router/routing_rules.json), reloaded
+    when their file changes.
     """
     
-    def __init__(self, memory_store):
+    def __init__(self, memory_store, dispatcher=None, outbox=None, rules=None, traces=None):
+        """
+        Initialize the router.
+
+        Args:
+            memory_store: Store holding the analyzed documents
+            dispatcher: ActionDispatcher sending the actions' API calls
+                (None only simulates them)
+            outbox: ActionOutbox queueing the API calls for background
+                delivery (None sends them while the caller waits)
+            rules: RoutingRules to route with (None loads the default rules file)
+            traces: TraceStore whose document traces record the routing
+        """
         self.memory_store = memory_store
+        self.dispatcher = dispatcher
+        self.outbox = outbox
+        self.rules = rules or RoutingRules()
+        self.traces = traces
         
     def route_action(self, document_id, action=None):
         """
@@ -32,170 +61,128 @@ class ActionRouter:
             if not document_data:
                 return {"success": False, "message": f"Document with ID {document_id} not found"}
             
-            # Get classification and analysis data
-            classification = document_data.get("data", {}).get("classification", {})
-            document_format = classification.get("format")
-            
-            # If action is specified, use that directly
-            if action:
-                return self._execute_action(action, document_id, document_data)
-                
-            # Otherwise, determine action based on document type and analysis
-            if document_format == "email":
-                return self._route_email_action(document_id, document_data)
-            elif document_format == "pdf":
-                return self._route_pdf_action(document_id, document_data)
-            elif document_format == "json":
-                return self._route_json_action(document_id, document_data)
-            else:
-                return {"success": False, "message": f"Unsupported document format: {document_format}"}
+            return self._route_traced(document_id, document_data, action, self.rules.current())
                 
         except Exception as e:
             logger.error(f"Error routing action: {e}", exc_info=True)
             return {"success": False, "message": f"Error routing action: {str(e)}"}
     
-    def _route_email_action(self, document_id, document_data):
-        """Route actions for email documents."""
-        email_analysis = document_data.get("data", {}).get("email_analysis", {})
-        
-        # Determine action based on email analysis
-        recommended_action = email_analysis.get("recommended_action", "")
-        tone = email_analysis.get("tone", "")
-        urgency = email_analysis.get("urgency", "")
-        
-        if recommended_action == "Escalate" or tone == "Angry" or urgency == "High":
-            return self._execute_action("escalate", document_id, document_data)
-        elif recommended_action == "Respond within 24 hours":
-            return self._execute_action("respond", document_id, document_data)
-        else:
-            return self._execute_action("log", document_id, document_data)
+    def route_many(self, document_ids, action=None):
+        """
+        Route many documents at once, such as a backlog after a rule change.
+        
+        The documents are read with one store call and all routed with the
+        same version of the rules. An action already queued for a document
+        is not queued again.
+        
+        Args:
+            document_ids (list): The IDs of the documents
+            action (str, optional): Specific action to trigger for all of them
+        
+        Returns:
+            dict: Result of the action by document ID
+        """
+        rules = self.rules.current()
+        try:
+            documents = self.memory_store.get_many(document_ids)
+        except Exception as e:
+            logger.error(f"Error routing actions: {e}", exc_info=True)
+            return {
+                document_id: {"success": False, "message": f"Error routing action: {str(e)}"}
+                for document_id in document_ids
+            }
+        
+        results = {}
+        with self.memory_store.batch(), (self.outbox.batch() if self.outbox is not None else nullcontext()):
+            for document_id in document_ids:
+                document_data = documents.get(document_id)
+                if not document_data:
+                    results[document_id] = {"success": False, "message": f"Document with ID {document_id} not found"}
+                    continue
+                try:
+                    results[document_id] = self._route_traced(document_id, document_data, action, rules)
+                except Exception as e:
+                    logger.error(f"Error routing action: {e}", exc_info=True)
+                    results[document_id] = {"success": False, "message": f"Error routing action: {str(e)}"}
+        return results
     
-    def _route_pdf_action(self, document_id, document_data):
-        """Route actions for PDF documents."""
-        pdf_analysis = document_data.get("data", {}).get("pdf_analysis", {})
-        
-        # Check for high-value invoices
-        invoice_data = pdf_analysis.get("invoice_data", {})
-        if invoice_data and invoice_data.get("total", 0) > 10000:
-            return self._execute_action("review_invoice", document_id, document_data)
-        
-        # Check for policy documents with regulatory mentions
-        policy_data = pdf_analysis.get("policy_data", {})
-        if policy_data and policy_data.get("regulations"):
-            return self._execute_action("compliance_review", document_id, document_data)
-            
-        # Default action for PDFs
-        return self._execute_action("archive", document_id, document_data)
+    def _route_traced(self, document_id, document_data, action, rules):
+        """Route a document, timing it as the action_routing stage of its trace if it has one."""
+        tracer = self.traces.tracer(document_id) if self.traces is not None else None
+        if tracer is None:
+            return self._route_document(document_id, document_data, action, rules)
+        
+        with tracer.stage("action_routing"):
+            result = self._route_document(document_id, document_data, action, rules)
+        
+        tracer.trace.actions.append(ActionRecord(
+            document_id=document_id,
+            action_type=result.get("action") or action or "",
+            status="triggered" if result.get("success") else "failed",
+            details=result.get("details") or {"message": result.get("message")}
+        ))
+        if result.get("success"):
+            tracer.trace.status = "action_triggered"
+        return result
     
-    def _route_json_action(self, document_id, document_data):
-        """Route actions for JSON documents."""
-        json_analysis = document_data.get("data", {}).get("json_analysis", {})
+    def _route_document(self, document_id, document_data, action, rules):
+        """Execute the given action, or the one the rules select for the document's format and analysis."""
+        # If action is specified, use that directly
+        if action:
+            return self._execute_action(action, document_id, document_data, rules)
         
-        # Check for anomalies or validation errors
-        if not json_analysis.get("validity", {}).get("is_valid", True) or json_analysis.get("anomalies"):
-            return self._execute_action("technical_review", document_id, document_data)
+        # Otherwise, the first rule for the document's format that matches its analysis decides
+        data = document_data.get("data", {})
+        document_format = (data.get("classification") or {}).get("format")
+        if document_format not in rules.routes:
+            return {"success": False, "message": f"Unsupported document format: {document_format}"}
         
-        # Default action for valid JSON
-        return self._execute_action("process", document_id, document_data)
+        action = rules.select(document_format, data)
+        if action is None:
+            return {"success": False, "message": f"No routing rule matched the {document_format} document"}
+        return self._execute_action(action, document_id, document_data, rules)
     
-    def _execute_action(self, action, document_id, document_data):
-        """Execute the specified action."""
+    def _execute_action(self, action, document_id, document_data, rules):
+        """Execute the specified action, or queue its API call in the outbox."""
         logger.info(f"Executing action '{action}' for document {document_id}")
         
         # Get metadata for logging
         metadata = document_data.get("data", {}).get("metadata", {})
         filename = metadata.get("filename", "unknown")
         
-        result = {
-            "action": action,
-            "document_id": document_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "success": True
-        }
+        result = self._action_result(action, document_id)
+        
+        spec = rules.actions.get(action)
         
         try:
-            # Simulate API calls based on action
-            if action == "escalate":
-                # Simulate CRM escalation call
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/crm/escalate", 
-                    {
-                        "document_id": document_id,
-                        "priority": "high",
-                        "reason": "Customer complaint requiring immediate attention"
-                    }
-                )
-                
-            elif action == "respond":
-                # Simulate response scheduling
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/crm/schedule-response", 
-                    {
-                        "document_id": document_id,
-                        "due_within": "24 hours"
-                    }
-                )
-                
-            elif action == "review_invoice":
-                # Simulate finance system notification
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/finance/review", 
-                    {
-                        "document_id": document_id,
-                        "reason": "High-value invoice exceeding threshold"
-                    }
-                )
+            if spec is not None and spec.endpoint is None:
+                # Recorded without calling another system
+                result["details"] = dict(spec.details)
+                outcome = "recorded"
                 
-            elif action == "compliance_review":
-                # Simulate compliance team notification
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/compliance/review", 
-                    {
-                        "document_id": document_id,
-                        "reason": "Policy document containing regulatory references"
-                    }
-                )
+            elif spec is not None:
+                # Call the downstream API for the action
+                method, endpoint, data = spec.request(document_id)
                 
-            elif action == "technical_review":
-                # Simulate tech team notification
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/tech/review", 
-                    {
-                        "document_id": document_id,
-                        "reason": "JSON anomalies or validation errors"
-                    }
-                )
-                
-            elif action == "process":
-                # Simulate normal processing
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/workflow/process", 
-                    {"document_id": document_id}
-                )
-                
-            elif action == "archive":
-                # Simulate archiving
-                result["details"] = self._simulate_api_call(
-                    "POST", 
-                    "/archive/store", 
-                    {"document_id": document_id}
-                )
-                
-            elif action == "log":
-                # Simulate simple logging of the document
-                result["details"] = {"status": "logged", "message": "Document logged for reference"}
+                if self.outbox is None:
+                    result["details"] = self._call_api(method, endpoint, data)
+                    outcome = "sent"
+                else:
+                    # Delivered in the background, which then records the response
+                    key, status = self.outbox.enqueue(document_id, action, method, endpoint, data)
+                    result["details"] = {"status": status, "endpoint": endpoint, "idempotency_key": key}
+                    if status != "queued":
+                        logger.info(f"Action '{action}' already {status} for {filename}")
+                        ACTION_OUTCOMES.inc(action, "duplicate")
+                        return result
+                    outcome = "queued"
                 
             else:
                 # Unknown action
                 result["success"] = False
                 result["message"] = f"Unknown action: {action}"
                 logger.warning(f"Unknown action requested: {action}")
+                ACTION_OUTCOMES.inc("unknown", "unknown")
                 return result
             
             # Store action in memory
@@ -205,26 +192,101 @@ class ActionRouter:
             self.memory_store.update_status(document_id, "action_triggered")
             
             logger.info(f"Action '{action}' executed successfully for {filename}")
+            ACTION_OUTCOMES.inc(action, outcome)
             return result
             
         except Exception as e:
             logger.error(f"Error executing action '{action}': {e}", exc_info=True)
+            ACTION_OUTCOMES.inc(action, "error")
             result["success"] = False
             result["message"] = f"Error executing action: {str(e)}"
             return result
     
+    def _action_result(self, action, document_id):
+        """Start the record stored for an action."""
+        return {
+            "action": action,
+            "document_id": document_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "success": True
+        }
+    
+    def deliver(self, method, endpoint, entries, bulk_suffix=""):
+        """
+        Send the API calls of queued actions to one endpoint.
+        
+        Args:
+            method (str): HTTP method of the calls
+            endpoint (str): Endpoint of the calls
+            entries (list): OutboxEntry of each call
+            bulk_suffix (str): Suffix of the endpoint's bulk path; if set, the
+                calls go out as one request with all their bodies
+        
+        Returns:
+            list: For each entry, the response or the exception raised
+        """
+        if self.dispatcher is None:
+            results = []
+            for entry in entries:
+                try:
+                    results.append(self._simulate_api_call(method, endpoint, entry.payload))
+                except Exception as e:
+                    results.append(e)
+            return results
+        
+        if bulk_suffix and len(entries) > 1:
+            body = {"actions": [dict(entry.payload, idempotency_key=entry.key) for entry in entries]}
+            bulk_key = hashlib.sha256("\n".join(entry.key for entry in entries).encode("utf-8")).hexdigest()
+            try:
+                response = self.dispatcher.dispatch(method, endpoint + bulk_suffix, body, bulk_key)
+            except Exception as e:
+                return [e] * len(entries)
+            return [response] * len(entries)
+        
+        return self.dispatcher.dispatch_many(method, endpoint, [(entry.payload, entry.key) for entry in entries])
+    
+    def record_delivery(self, entry, response=None, error=None):
+        """
+        Store the outcome of a queued action as the document's action.
+        
+        Args:
+            entry (OutboxEntry): The delivered (or abandoned) entry
+            response (dict, optional): The endpoint's response
+            error (Exception, optional): Why the last attempt failed, if it did
+        """
+        result = self._action_result(entry.action, entry.document_id)
+        result["delivery"] = {
+            "status": "failed" if error is not None else "delivered",
+            "attempts": entry.attempts,
+            "idempotency_key": entry.key
+        }
+        if error is not None:
+            result["success"] = False
+            result["message"] = f"Error executing action: {str(error)}"
+        else:
+            result["details"] = response
+        self.memory_store.store(entry.document_id, "action", result)
+        ACTION_OUTCOMES.inc(entry.action, "abandoned" if error is not None else "delivered")
+    
+    def _call_api(self, method, endpoint, data):
+        """
+        Call an external system through the dispatcher, or simulate the call without one.
+        
+        Raises:
+            ActionDispatchError: The call was rejected or failed after retries
+        """
+        if self.dispatcher is not None:
+            return self.dispatcher.dispatch(method, endpoint, data)
+        return self._simulate_api_call(method, endpoint, data)
+    
     def _simulate_api_call(self, method, endpoint, data):
         """
         Simulate an API call to an external system.
-        In a real implementation, this would make actual HTTP requests.
+        Used when no action API base URL is configured.
         """
         logger.info(f"Simulating {method} call to {endpoint} with data: {data}")
         
-        # In a real implementation, this would be:
-        # response = requests.request(method, f"https://api.example.com{endpoint}", json=data)
-        # return response.json()
-        
-        # For simulation, return a mock successful response
+        # Return a mock successful response
         return {
             "status": "success",
             "request_id": f"req_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
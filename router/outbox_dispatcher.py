@@ -0,0 +1,189 @@
+# File: router/outbox_dispatcher.py
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDispatcher:
+    """
+    Background thread delivering the action outbox.
+
+    Due entries are claimed in batches and grouped by endpoint, so a burst
+    of actions reaches each endpoint as one group of concurrent requests, or
+    as a single bulk request when the downstream systems have bulk paths.
+    Delivered and abandoned actions are recorded on their documents through
+    the ActionRouter. Failed entries are retried with exponential backoff
+    until max_attempts; entries the endpoint rejected are not retried.
+    Settled entries older than the retention are pruned periodically, and
+    the outbox counts are refreshed every stats_interval for callers that
+    must not wait on a scan of the outbox.
+    """
+
+    def __init__(self, outbox, router, batch_size: int = 50, max_attempts: int = 8, bulk_suffix: str = "",
+                 poll_interval: float = 1.0, linger: float = 0.05, lease: float = 60.0,
+                 retry_base: float = 2.0, retry_max: float = 300.0, retention: Optional[float] = None,
+                 prune_interval: float = 3600.0, stats_interval: float = 5.0):
+        """
+        Start the dispatcher thread.
+
+        Args:
+            outbox: ActionOutbox to drain
+            router: ActionRouter sending the calls and recording their outcome
+            batch_size: Maximum entries claimed at once
+            max_attempts: Delivery attempts before an entry is marked failed
+            bulk_suffix: Suffix of the endpoints' bulk paths ("" sends one request per action)
+            poll_interval: Seconds between checks for entries queued by other processes
+            linger: Seconds to wait after an enqueue so a burst is claimed together
+            lease: Seconds a claimed entry stays reserved for this dispatcher; the
+                lease of the batch is renewed before each endpoint group, so it
+                must cover the delivery of one group (see
+                ActionDispatcher.max_delivery_seconds)
+            retry_base: Upper bound of the first retry delay in seconds, doubled per attempt
+            retry_max: Upper bound of any retry delay in seconds
+            retention: Seconds delivered and failed entries are kept (None keeps them)
+            prune_interval: Seconds between prunes of the settled entries
+            stats_interval: Seconds between refreshes of the cached outbox counts
+        """
+        self.outbox = outbox
+        self.router = router
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.bulk_suffix = bulk_suffix
+        self.poll_interval = poll_interval
+        self.linger = linger
+        self.lease = lease
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._next_prune = time.monotonic()
+        self.stats_interval = stats_interval
+        self._next_stats = time.monotonic() + stats_interval
+        self._lock = threading.Lock()
+        self._counts = {"batches": 0, "delivered": 0, "retried": 0, "failed": 0, "pruned": 0}
+        self._outbox_stats = outbox.stats()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                claimed = self.drain_once()
+            except Exception as e:
+                logger.error(f"Error draining the action outbox: {e}", exc_info=True)
+                claimed = 0
+
+            if self.retention is not None and time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                try:
+                    self.prune()
+                except Exception as e:
+                    logger.error(f"Error pruning the action outbox: {e}", exc_info=True)
+
+            if time.monotonic() >= self._next_stats:
+                self._next_stats = time.monotonic() + self.stats_interval
+                try:
+                    self._outbox_stats = self.outbox.stats()
+                except Exception as e:
+                    logger.error(f"Error counting the action outbox entries: {e}", exc_info=True)
+
+            # A full batch means more may be due; otherwise wait for the next enqueue
+            if claimed < self.batch_size and self.outbox.enqueued.wait(self.poll_interval):
+                self.outbox.enqueued.clear()
+                self._stopped.wait(self.linger)
+
+    def drain_once(self) -> int:
+        """
+        Claim one batch of due entries and deliver it.
+
+        Returns:
+            Number of entries claimed
+        """
+        entries = self.outbox.claim(self.batch_size, self.lease)
+        groups = {}
+        for entry in entries:
+            groups.setdefault((entry.method, entry.endpoint), []).append(entry)
+
+        keys = [entry.key for group in groups.values() for entry in group]
+        sent = 0
+        for (method, endpoint), group in groups.items():
+            if sent:
+                # The earlier groups used up part of the lease of the ones not yet sent
+                self.outbox.renew(keys[sent:], self.lease)
+            results = self.router.deliver(method, endpoint, group, self.bulk_suffix)
+            self._settle(group, results)
+            sent += len(group)
+
+        if entries:
+            with self._lock:
+                self._counts["batches"] += 1
+        return len(entries)
+
+    def prune(self) -> int:
+        """
+        Delete the entries settled longer ago than the retention.
+
+        Returns:
+            Number of entries deleted
+        """
+        pruned = self.outbox.prune(self.retention)
+        if pruned:
+            logger.info(f"Pruned {pruned} settled entries from the action outbox")
+            with self._lock:
+                self._counts["pruned"] += pruned
+        return pruned
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Delay before the next attempt, with jitter so failed bursts spread out."""
+        return min(self.retry_max, self.retry_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def _settle(self, entries: List, results: List) -> None:
+        """Mark each entry delivered, due again or failed, and record the finished ones."""
+        delivered = [entry for entry, result in zip(entries, results) if not isinstance(result, Exception)]
+        self.outbox.mark_delivered([entry.key for entry in delivered])
+
+        counts = {"delivered": len(delivered), "retried": 0, "failed": 0}
+        with self.router.memory_store.batch():
+            for entry, result in zip(entries, results):
+                if not isinstance(result, Exception):
+                    self.router.record_delivery(entry, response=result)
+                elif entry.attempts < self.max_attempts and getattr(result, "status_code", None) is None:
+                    logger.warning(f"Delivery of {entry.key} to {entry.endpoint} failed "
+                                   f"(attempt {entry.attempts} of {self.max_attempts}): {result}")
+                    self.outbox.mark_failed(entry, str(result), self._retry_delay(entry.attempts))
+                    counts["retried"] += 1
+                else:
+                    logger.error(f"Giving up on {entry.key} after {entry.attempts} attempts: {result}")
+                    self.outbox.mark_failed(entry, str(result), None)
+                    self.router.record_delivery(entry, error=result)
+                    counts["failed"] += 1
+
+        with self._lock:
+            for name, count in counts.items():
+                self._counts[name] += count
+
+    def stats(self, cached: bool = False) -> Dict:
+        """
+        Report the outbox entries by status and what this dispatcher delivered.
+
+        Args:
+            cached: Report the outbox counts of the last refresh (at most
+                stats_interval old) instead of scanning the outbox
+        """
+        stats = dict(self._outbox_stats) if cached else self.outbox.stats()
+        with self._lock:
+            stats["dispatcher"] = dict(self._counts)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the dispatcher thread; claimed entries left undelivered are retried after their lease."""
+        self._stopped.set()
+        self.outbox.enqueued.set()
+        if wait:
+            self._thread.join()
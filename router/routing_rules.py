@@ -0,0 +1,298 @@
+# File: router/routing_rules.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_rules.json")
+
+
+class RoutingRulesError(ValueError):
+    """A routing rules file is malformed."""
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compare(test: Callable) -> Callable:
+    """Wrap an ordering test so it only applies to numbers."""
+    return lambda value, expected: _is_number(value) and test(value, expected)
+
+
+# Field operators: each takes the field value (None if missing) and the rule's operand
+OPERATORS = {
+    "eq": lambda value, expected: value == expected,
+    "ne": lambda value, expected: value != expected,
+    "gt": _compare(lambda value, expected: value > expected),
+    "gte": _compare(lambda value, expected: value >= expected),
+    "lt": _compare(lambda value, expected: value < expected),
+    "lte": _compare(lambda value, expected: value <= expected),
+    "in": lambda value, expected: value in expected,
+    "contains": lambda value, expected: isinstance(value, (str, list)) and expected in value,
+    "truthy": lambda value, expected: bool(value) == expected,
+    "exists": lambda value, expected: (value is not None) == expected,
+}
+
+
+def _field_getter(path: str) -> Callable[[Dict], object]:
+    """Compile a dotted path into a lookup in a document's data (None where missing)."""
+    keys = tuple(path.split("."))
+
+    def get(data: Dict):
+        value = data
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    return get
+
+
+def compile_condition(condition: Dict, where: str) -> Callable[[Dict], bool]:
+    """
+    Compile a condition into a predicate over a document's data.
+
+    A condition is {"all": [...]}, {"any": [...]}, {"not": condition}, or
+    {"field": "path.to.value", <operator>: operand, ...}, true when every
+    operator holds for the field.
+
+    Args:
+        condition: The condition
+        where: Position of the condition in the file, for error messages
+
+    Raises:
+        RoutingRulesError: If the condition is malformed
+    """
+    if not isinstance(condition, dict):
+        raise RoutingRulesError(f"{where}: condition must be an object")
+
+    for combinator, combine in (("all", all), ("any", any)):
+        if combinator in condition:
+            if len(condition) != 1 or not isinstance(condition[combinator], list):
+                raise RoutingRulesError(f"{where}: '{combinator}' takes a list of conditions and nothing else")
+            predicates = tuple(
+                compile_condition(item, f"{where}.{combinator}[{i}]") for i, item in enumerate(condition[combinator])
+            )
+            return lambda data: combine(predicate(data) for predicate in predicates)
+
+    if "not" in condition:
+        if len(condition) != 1:
+            raise RoutingRulesError(f"{where}: 'not' takes one condition and nothing else")
+        negated = compile_condition(condition["not"], f"{where}.not")
+        return lambda data: not negated(data)
+
+    field = condition.get("field")
+    if not isinstance(field, str) or not field:
+        raise RoutingRulesError(f"{where}: condition needs 'field', 'all', 'any' or 'not'")
+    tests = []
+    for name, operand in condition.items():
+        if name == "field":
+            continue
+        if name not in OPERATORS:
+            raise RoutingRulesError(f"{where}: unknown operator '{name}'")
+        if name == "in" and not isinstance(operand, list):
+            raise RoutingRulesError(f"{where}: 'in' takes a list")
+        tests.append((OPERATORS[name], operand))
+    if not tests:
+        raise RoutingRulesError(f"{where}: condition on '{field}' has no operator")
+
+    get = _field_getter(field)
+    if len(tests) == 1:
+        test, operand = tests[0]
+        return lambda data: test(get(data), operand)
+    return lambda data: all(test(get(data), operand) for test, operand in tests)
+
+
+class ActionSpec:
+    """
+    What an action does: an API call, or a fixed result recorded locally.
+
+    The call's body is the document_id followed by the spec's body fields.
+    """
+
+    def __init__(self, name: str, method: Optional[str] = None, endpoint: Optional[str] = None,
+                 body: Optional[Dict] = None, details: Optional[Dict] = None):
+        self.name = name
+        self.method = method
+        self.endpoint = endpoint
+        self.body = body or {}
+        self.details = details
+
+    def request(self, document_id: str) -> Tuple[str, str, Dict]:
+        """Build the method, endpoint and JSON body of the action's call for a document."""
+        return self.method, self.endpoint, {"document_id": document_id, **self.body}
+
+
+class CompiledRules:
+    """
+    Routing rules compiled for evaluation.
+
+    Each document format maps to its rules in order; a rule is a predicate
+    over the document's data and the action taken when it is the first
+    predicate to hold.
+    """
+
+    def __init__(self, actions: Dict[str, ActionSpec], routes: Dict[str, List[Tuple[Callable, str]]], version: str):
+        self.actions = actions
+        self.routes = routes
+        self.version = version
+
+    def select(self, document_format: Optional[str], data: Dict) -> Optional[str]:
+        """
+        Select the action for a document.
+
+        Args:
+            document_format: The document's classified format
+            data: The document's data (analysis results by type)
+
+        Returns:
+            The name of the action of the first matching rule, or None if no
+            rule matched
+
+        Raises:
+            KeyError: If there are no rules for the format
+        """
+        for predicate, action in self.routes[document_format]:
+            if predicate(data):
+                return action
+        return None
+
+
+def compile_rules(rules: Dict, version: str = "") -> CompiledRules:
+    """
+    Compile a parsed rules file.
+
+    The file has two sections: "actions", mapping each action name to its
+    call ({"method", "endpoint", "body"}) or local result ({"details"}), and
+    "routes", mapping each document format to its rules in order, each
+    {"when": condition, "action": name}. A rule without "when" always matches.
+
+    Raises:
+        RoutingRulesError: If the rules are malformed
+    """
+    if not isinstance(rules, dict) or not isinstance(rules.get("actions"), dict) \
+            or not isinstance(rules.get("routes"), dict):
+        raise RoutingRulesError("rules need an 'actions' object and a 'routes' object")
+
+    actions = {}
+    for name, spec in rules["actions"].items():
+        if not isinstance(spec, dict) or set(spec) - {"method", "endpoint", "body", "details"}:
+            raise RoutingRulesError(f"actions.{name}: expected method, endpoint and body, or details")
+        if "endpoint" in spec:
+            if "details" in spec or not isinstance(spec.get("body", {}), dict):
+                raise RoutingRulesError(f"actions.{name}: an API call has a method, an endpoint and a body object")
+            actions[name] = ActionSpec(name, spec.get("method", "POST"), spec["endpoint"], spec.get("body"))
+        elif isinstance(spec.get("details"), dict):
+            actions[name] = ActionSpec(name, details=spec["details"])
+        else:
+            raise RoutingRulesError(f"actions.{name}: needs an endpoint or details")
+
+    routes = {}
+    for document_format, format_rules in rules["routes"].items():
+        if not isinstance(format_rules, list):
+            raise RoutingRulesError(f"routes.{document_format}: expected a list of rules")
+        compiled = []
+        for i, rule in enumerate(format_rules):
+            where = f"routes.{document_format}[{i}]"
+            if not isinstance(rule, dict) or rule.get("action") not in actions:
+                raise RoutingRulesError(f"{where}: 'action' must name one of the actions")
+            if "when" in rule:
+                predicate = compile_condition(rule["when"], f"{where}.when")
+            else:
+                predicate = lambda data: True
+            compiled.append((predicate, rule["action"]))
+        routes[document_format] = compiled
+
+    return CompiledRules(actions, routes, version)
+
+
+class RoutingRules:
+    """
+    Routing rules loaded from a JSON file and reloaded when it changes.
+
+    current() checks the file's modification time and size, so an edited
+    file takes effect on the next routed document without a restart. A
+    file that fails to load or compile is logged and the previous rules
+    stay in use.
+    """
+
+    def __init__(self, path: str = DEFAULT_RULES_PATH):
+        """
+        Load the rules.
+
+        Args:
+            path: Path to the rules file
+
+        Raises:
+            RoutingRulesError: If the file cannot be loaded the first time
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._rules = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+        self.current()
+        if self._rules is None:
+            raise RoutingRulesError(f"Cannot load routing rules from {path}: {self.last_error}")
+
+    def current(self) -> CompiledRules:
+        """Return the compiled rules, reloading the file first if it changed."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            stamp = None
+            error = str(e)
+        if stamp is not None and stamp == self._stamp:
+            return self._rules
+
+        with self._lock:
+            if stamp is None:
+                if self.last_error != error:
+                    logger.error(f"Cannot read routing rules {self.path}, keeping the loaded ones: {error}")
+                    self.last_error = error
+            elif stamp != self._stamp:
+                self._load(stamp)
+            return self._rules
+
+    def _load(self, stamp: Tuple[int, int]) -> None:
+        """Compile the file's rules; caller holds the lock."""
+        try:
+            with open(self.path, "rb") as f:
+                content = f.read()
+            rules = compile_rules(json.loads(content), hashlib.sha256(content).hexdigest()[:12])
+        except (OSError, ValueError) as e:
+            logger.error(f"Invalid routing rules in {self.path}, keeping the loaded ones: {e}")
+            self.last_error = str(e)
+        else:
+            if self._rules is not None:
+                self.reloads += 1
+                logger.info(f"Reloaded routing rules from {self.path} (version {rules.version})")
+            self._rules = rules
+            self.loaded_at = time.time()
+            self.last_error = None
+        # Not retried until the file changes again
+        self._stamp = stamp
+
+    def stats(self) -> Dict:
+        """Report the loaded rules' version, the number of reloads and the last load error."""
+        rules = self.current()
+        return {
+            "path": self.path,
+            "version": rules.version,
+            "formats": {document_format: len(format_rules) for document_format, format_rules in rules.routes.items()},
+            "actions": sorted(rules.actions),
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error
+        }
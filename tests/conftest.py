@@ -0,0 +1,98 @@
+# tests/conftest.py
+import os
+
+# Set before utils.config is loaded: the API under test keeps its documents
+# in memory and writes no database files
+os.environ.update({"SQLITE_PATH": "", "PAGE_CACHE_PATH": "", "ACTION_OUTBOX_PATH": ""})
+
+import pytest
+
+from memory.memory_store import MemoryStore
+from memory.sqlite_store import SQLiteStore
+
+STORE_BACKENDS = ("memory", "sqlite", "redis")
+
+FORMATS = ("pdf", "email", "json")
+STATUSES = ("received", "processing", "completed", "error")
+
+
+def make_store(backend, tmp_path):
+    """Create an empty store of a backend; Redis runs on fakeredis."""
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SQLiteStore(str(tmp_path / "memory.db"))
+
+    fakeredis = pytest.importorskip("fakeredis")
+    # The store's writes are Lua scripts
+    pytest.importorskip("lupa")
+    from memory.redis_store import RedisStore
+    return RedisStore(client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def seed_documents(store, count=40):
+    """
+    Store documents spread over formats, statuses and three upload days.
+
+    Every seventh document is never classified, so it has no format.
+
+    Returns:
+        The stored documents' IDs
+    """
+    document_ids = []
+    for i in range(count):
+        document_id = f"doc-{i:03d}"
+        store.store(document_id, "metadata", {
+            "document_id": document_id,
+            "filename": f"file{i}.{FORMATS[i % 3]}",
+            "upload_time": f"2025-06-0{1 + i % 3}T{i % 24:02d}:{i % 60:02d}:00"
+        })
+        if i % 7:
+            store.store(document_id, "classification", {"format": FORMATS[i % 3], "intent": "Invoice"})
+        store.update_status(document_id, STATUSES[i % 4])
+        document_ids.append(document_id)
+    return document_ids
+
+
+def make_pdf(page_texts):
+    """Build a PDF with one page per text, each line drawn in Helvetica."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in page_texts:
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.split("\n")]
+        stream = "BT /F1 12 Tf 14 TL 72 720 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return pdf
+
+@pytest.fixture(params=STORE_BACKENDS)
+def store(request, tmp_path):
+    """An empty store of each backend."""
+    store = make_store(request.param, tmp_path)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def seeded_stores(tmp_path):
+    """The same seeded documents in a store of every backend, by backend name."""
+    stores = {backend: make_store(backend, tmp_path) for backend in STORE_BACKENDS}
+    for store in stores.values():
+        seed_documents(store)
+    yield stores
+    for store in stores.values():
+        store.close()
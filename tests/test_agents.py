@@ -0,0 +1,213 @@
+# tests/test_agents.py
+import io
+import json
+import random
+
+import pytest
+
+from agents.email_agent import EMAIL_LEXICON, SUMMARY_TERMS, EmailFeatures
+from agents.json_agent import JsonAgent
+from agents.pdf_agent import PdfAgent
+from memory.memory_store import MemoryStore
+from utils.json_parser import NUMERIC_FIELDS, can_stream, stream_json, walk_json
+from utils.parsed_document import ParsedDocument
+
+
+def make_orders(count):
+    """An order export with nested customers and items, and some null or non-numeric prices."""
+    rng = random.Random(42)
+    orders = []
+    for i in range(count):
+        items = [
+            {"sku": f"SKU-{rng.randint(1, 9999)}", "quantity": rng.randint(1, 5),
+             "unit_price": rng.choice([round(rng.uniform(1, 500), 2)] * 8 + ["n/a", None])}
+            for _ in range(rng.randint(1, 4))
+        ]
+        orders.append({
+            "order_id": i,
+            "customer": {"email": None if i % 7 == 0 else f"c{i}@example.com", "address": {"city": "Springfield"}},
+            "items": items,
+            "total": sum(item["unit_price"] for item in items if isinstance(item["unit_price"], float))
+        })
+    return {"generated": "2026-01-01", "orders": orders}
+
+
+def recursive_walks(json_data):
+    """The JsonAgent analysis walk_json replaced: three separate recursive walks."""
+    fields_count = 0
+    max_depth = 0
+    total_nodes = 0
+    anomalies = []
+
+    def containers(obj):
+        values = obj.values() if isinstance(obj, dict) else obj if isinstance(obj, list) else ()
+        return [value for value in values if isinstance(value, (dict, list))]
+
+    def count_fields(obj):
+        nonlocal fields_count
+        if isinstance(obj, dict):
+            fields_count += len(obj)
+        for value in containers(obj):
+            count_fields(value)
+
+    def analyze_depth(obj, depth=0):
+        nonlocal max_depth, total_nodes
+        max_depth = max(depth, max_depth)
+        total_nodes += 1
+        for value in containers(obj):
+            analyze_depth(value, depth + 1)
+
+    def check_anomalies(obj, path=""):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                current_path = f"{path}.{key}" if path else key
+                if value is None:
+                    anomalies.append(f"Missing value for field '{current_path}'")
+                if key in NUMERIC_FIELDS and not isinstance(value, (int, float)):
+                    anomalies.append(f"Field '{current_path}' should be numeric but is {type(value).__name__}")
+                if isinstance(value, (dict, list)):
+                    check_anomalies(value, current_path)
+        elif isinstance(obj, list):
+            for i, item in enumerate(obj):
+                if isinstance(item, (dict, list)):
+                    check_anomalies(item, f"{path}[{i}]")
+
+    count_fields(json_data)
+    analyze_depth(json_data)
+    check_anomalies(json_data)
+    return fields_count, max_depth, total_nodes, anomalies
+
+
+JSON_DOCUMENTS = [
+    {},
+    [],
+    "text",
+    None,
+    {"price": None, "total": "12", "amount": True, "unit_price": 1.5},
+    [1, [2, [3, {"price": "free"}]], {"items": [{"amount": None}, []]}],
+    {"a": {"b": {"c": {"d": [{"total": []}, {"price": {}}]}}}},
+    make_orders(40),
+]
+
+
+def structure_of(structure):
+    return structure.fields_count, structure.max_depth, structure.total_nodes, structure.anomalies
+
+
+# PDF document type
+
+def test_document_type_stops_once_one_type_clearly_leads():
+    pages = ["invoice " * 12, "policy " * 40, "report"]
+    read = []
+
+    def page_texts():
+        for text in pages:
+            read.append(text)
+            yield text
+
+    assert PdfAgent(MemoryStore())._determine_document_type(page_texts()) == "Invoice"
+    assert len(read) == 1
+
+
+def test_document_type_reads_on_while_undecided():
+    pages = ["invoice invoice", "policy " * 4, "policy compliance"]
+
+    assert PdfAgent(MemoryStore())._determine_document_type(iter(pages)) == "Policy Document"
+
+
+# Email features
+
+def test_email_features_match_a_search_per_term():
+    words = [term for terms in EMAIL_LEXICON.values() for term in terms] + list(SUMMARY_TERMS)
+    words += ["right", "now", "ord", "er", "Thank", "URGENT", "!", "x"]
+    rng = random.Random(7)
+
+    for _ in range(500):
+        subject = " ".join(rng.choice(words) for _ in range(rng.randint(0, 4)))
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+        text = (subject + " " + body).lower()
+
+        features = EmailFeatures(subject, body)
+
+        for group, terms in EMAIL_LEXICON.items():
+            assert features.matches(group) == sum(1 for term in terms if term in text)
+        assert features.body_terms == {term for term in SUMMARY_TERMS if term in body.lower()}
+        assert features.urgent_subject == ("urgent" in subject.lower())
+        assert features.exclamation_count == text.count("!")
+
+
+# JSON structure
+
+@pytest.mark.parametrize("document", JSON_DOCUMENTS)
+def test_walk_json_matches_the_recursive_walks(document):
+    fields_count, max_depth, total_nodes, anomalies = recursive_walks(document)
+
+    structure = walk_json(document)
+
+    assert structure_of(structure) == (fields_count, max_depth, total_nodes, anomalies)
+    assert structure.anomaly_count == len(anomalies)
+
+
+def test_walk_json_caps_reported_anomalies():
+    document = make_orders(200)
+    anomalies = recursive_walks(document)[3]
+
+    structure = walk_json(document, max_anomalies=5)
+
+    assert structure.anomalies == anomalies[:5]
+    assert structure.anomaly_count == len(anomalies)
+
+
+def test_walk_json_handles_deep_nesting():
+    document = []
+    for _ in range(50000):
+        document = [document]
+
+    structure = walk_json(document)
+
+    assert structure.max_depth == 50000
+    assert structure.total_nodes == 50001
+
+
+@pytest.mark.skipif(not can_stream(), reason="ijson is not installed")
+@pytest.mark.parametrize("document", [document for document in JSON_DOCUMENTS if isinstance(document, (dict, list))])
+def test_stream_json_matches_walk_json(document):
+    summary = stream_json(io.BytesIO(json.dumps(document).encode("utf-8")))
+
+    assert summary.error is None
+    assert structure_of(summary) == structure_of(walk_json(document))
+    assert summary.anomaly_count == walk_json(document).anomaly_count
+
+
+@pytest.mark.skipif(not can_stream(), reason="ijson is not installed")
+def test_stream_json_samples_the_first_array_elements():
+    document = {"orders": [{"id": 1, "items": [1, 2]}, {"id": 2}], "count": 2}
+
+    summary = stream_json(io.BytesIO(json.dumps(document).encode("utf-8")))
+
+    assert summary.sample == {"orders": [{"id": 1, "items": [1]}], "count": 2}
+
+
+@pytest.mark.skipif(not can_stream(), reason="ijson is not installed")
+def test_stream_json_reports_invalid_json():
+    summary = stream_json(io.BytesIO(b'{"note": null, "items": [1, 2'))
+
+    assert summary.error is not None
+    assert summary.anomalies == ["Missing value for field 'note'"]
+
+
+@pytest.mark.skipif(not can_stream(), reason="ijson is not installed")
+def test_json_agent_analysis_is_the_same_when_streamed(tmp_path):
+    path = tmp_path / "orders.json"
+    path.write_text(json.dumps(make_orders(30)))
+    metadata = {"document_id": "a", "filename": "orders.json", "content_type": "application/json"}
+
+    analyses = []
+    for threshold in (None, 100):
+        store = MemoryStore()
+        document = ParsedDocument(str(path), json_stream_threshold=threshold)
+        JsonAgent(store).process(str(path), metadata, document=document)
+        analyses.append(store.get("a")["data"]["json_analysis"])
+        assert document.json_streaming == (threshold is not None)
+
+    assert analyses[1] == analyses[0]
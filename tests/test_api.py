@@ -0,0 +1,264 @@
+# tests/test_api.py
+import csv
+import io
+import json
+import threading
+import time
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import main
+from memory.page_cache import PageTextCache
+from tests.conftest import make_pdf
+from utils import config
+from utils.parsed_document import ParsedDocument
+from utils.pdf_parser import extract_page_texts
+
+EMAIL = """From: customer@example.com
+To: support@example.com
+Subject: Complaint about my order
+
+I am unhappy with the issue and want a refund for this problem.
+"""
+
+# The classifier reads a complaint here; JsonAgent stores a different intent
+ORDERS = json.dumps({"complaint": "refund for this issue", "orders": [{"order_id": 1, "total": 12.5}]})
+
+
+# The first page alone decides the intent
+INVOICE_PAGES = ["Invoice\nInvoice number 7, total due, payment terms, amount due"] + [f"Page {i}" for i in range(1, 6)]
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Uploads are saved under the test's directory
+    monkeypatch.setattr(main, "TEMP_DIR", str(tmp_path))
+    # Without a with block the shutdown handler does not stop the shared pools
+    return TestClient(main.app)
+
+
+def test_upload_is_processed_on_the_worker_pool(client, monkeypatch):
+    threads = []
+    receive_and_process = main.receive_and_process
+
+    def record_thread(*args):
+        threads.append(threading.current_thread().name)
+        return receive_and_process(*args)
+
+    monkeypatch.setattr(main, "receive_and_process", record_thread)
+
+    response = client.post("/upload", files={"file": ("message.eml", EMAIL, "message/rfc822")},
+                           follow_redirects=False)
+
+    assert response.status_code == 303
+    document_id = response.headers["location"].rsplit("/", 1)[1]
+    assert main.memory_store.get(document_id)["data"]["classification"]["intent"] == "Complaint"
+    assert threads[0].startswith("agent-worker")
+
+
+def test_async_upload_is_accepted_and_polled(client):
+    response = client.post("/upload/async", files={"file": ("message.eml", EMAIL, "message/rfc822")})
+
+    assert response.status_code == 202
+    status_url = response.json()["status_url"]
+    assert wait_for(lambda: client.get(status_url).json()["job"] is None)
+    job = client.get(status_url).json()
+    assert job["status"] == "analyzed"
+    assert job["classification"]["intent"] == "Complaint"
+    assert job["error"] is None
+
+
+def test_async_upload_is_refused_while_the_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(main.job_queue, "full", lambda: True)
+
+    response = client.post("/upload/async", files={"file": ("message.eml", EMAIL, "message/rfc822")})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_batch_upload_expands_zip_archives(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("mail/complaint.eml", EMAIL)
+        zip_file.writestr("mail/", "")
+        zip_file.writestr("__MACOSX/mail/._complaint.eml", "resource fork")
+        zip_file.writestr("orders.json", ORDERS)
+    files = [
+        ("files", ("message.eml", EMAIL, "message/rfc822")),
+        ("files", ("archive.zip", archive.getvalue(), "application/zip")),
+    ]
+
+    response = client.post("/upload/batch", files=files)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(document["filename"] for document in body["documents"]) == \
+        ["complaint.eml", "message.eml", "orders.json"]
+    assert body["timing"]["succeeded"] == 3
+    # Each reported intent is the stored one, after the format agent's updates
+    for document in body["documents"]:
+        stored = main.memory_store.get(document["document_id"])["data"]["classification"]
+        assert (document["format"], document["intent"]) == (stored["format"], stored["intent"])
+
+
+def test_batch_upload_rejects_invalid_zip_archives(client):
+    response = client.post("/upload/batch", files=[("files", ("archive.zip", b"not a zip", "application/zip"))])
+
+    assert response.status_code == 400
+
+
+def test_documents_are_listed_by_cursor(client):
+    for _ in range(3):
+        client.post("/upload", files={"file": ("message.eml", EMAIL, "message/rfc822")}, follow_redirects=False)
+
+    listed = []
+    cursor = ""
+    while True:
+        page = client.get("/documents", params={"limit": 2, "cursor": cursor}).json()
+        assert len(page["documents"]) <= 2
+        listed += [document["document_id"] for document in page["documents"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(listed) == len(set(listed)) == len(main.memory_store.documents)
+    assert client.get("/documents", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_dashboard_pages_filtered_documents(client):
+    for _ in range(12):
+        client.post("/upload", files={"file": ("message.eml", EMAIL, "message/rfc822")}, follow_redirects=False)
+    pages = (main.memory_store.count(format="email") + 9) // 10
+
+    response = client.get("/dashboard", params={"format_filter": "email"})
+
+    assert response.status_code == 200
+    assert f"Page 1 of {pages}" in response.text
+    assert client.get("/dashboard", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_exports_stream_every_document(client):
+    client.post("/upload", files={"file": ("message.eml", EMAIL, "message/rfc822")}, follow_redirects=False)
+    total = len(main.memory_store.documents)
+
+    export = client.get("/dashboard/metrics/export/json").json()
+    ndjson = client.get("/dashboard/metrics/export/ndjson").text.splitlines()
+    rows = list(csv.reader(io.StringIO(client.get("/dashboard/metrics/export/csv").text)))
+
+    assert export["total_count"] == len(export["documents"]) == total
+    assert sorted(json.loads(line)["document_id"] for line in ndjson) == \
+        sorted(document["document_id"] for document in export["documents"])
+    assert rows[0][0] == "Document ID"
+    assert len(rows) == total + 1
+
+
+def test_identical_uploads_replay_the_cached_results(client):
+    # Content no other test uploads, so the first upload is processed
+    content = EMAIL.replace("my order", "my second order")
+    document_ids = [
+        client.post("/upload", files={"file": ("message.eml", content, "message/rfc822")},
+                    follow_redirects=False).headers["location"].rsplit("/", 1)[1]
+        for _ in range(2)
+    ]
+
+    first, second = (main.memory_store.get(document_id) for document_id in document_ids)
+    assert client.get(f"/traces/{document_ids[0]}").json()["cached"] is False
+    assert client.get(f"/traces/{document_ids[1]}").json()["cached"] is True
+    assert second["data"]["email_analysis"] == first["data"]["email_analysis"]
+    assert second["data"]["classification"] == first["data"]["classification"]
+
+
+@pytest.mark.parametrize("min_pages", [2, 100])
+def test_pdf_pages_are_extracted_on_the_process_pool(tmp_path, monkeypatch, min_pages):
+    monkeypatch.setattr(config, "PDF_PARALLEL_MIN_PAGES", min_pages)
+    pdf = make_pdf([f"Page {i}" for i in range(7)])
+    path = tmp_path / "report.pdf"
+    path.write_bytes(pdf)
+
+    assert main.extract_pdf_pages(ParsedDocument(str(path))) == extract_page_texts(pdf)
+
+
+def test_pdf_pages_after_the_classified_ones_are_extracted_once(tmp_path):
+    pdf = make_pdf(INVOICE_PAGES)
+    path = tmp_path / "invoice.pdf"
+    path.write_bytes(pdf)
+    document = ParsedDocument(str(path))
+    main.classifier_agent.classify(str(path), {"filename": "invoice.pdf"}, document=document)
+    first_page = document.page_text(0)
+    assert document.pages_extracted == 1
+
+    page_texts = main.extract_pdf_pages(document)
+
+    assert page_texts == extract_page_texts(pdf)
+    assert page_texts[0] is first_page
+
+
+def test_pdf_upload_is_classified_and_analyzed(client):
+    pdf = make_pdf(INVOICE_PAGES)
+
+    response = client.post("/upload", files={"file": ("invoice.pdf", pdf, "application/pdf")}, follow_redirects=False)
+
+    document = main.memory_store.get(response.headers["location"].rsplit("/", 1)[1])
+    assert document["data"]["classification"]["intent"] == "Invoice"
+    assert document["data"]["pdf_analysis"]["document_type"] == "Invoice"
+    assert document["data"]["pdf_analysis"]["page_count"] == 6
+
+
+def test_pdf_upload_fills_the_page_cache(client, tmp_path, monkeypatch):
+    cache = PageTextCache(str(tmp_path / "pages.db"), "test")
+    monkeypatch.setattr(main, "page_cache", cache)
+    pdf = make_pdf(["Quarterly report"] + INVOICE_PAGES[1:])
+
+    response = client.post("/upload", files={"file": ("report.pdf", pdf, "application/pdf")}, follow_redirects=False)
+
+    metadata = main.memory_store.get(response.headers["location"].rsplit("/", 1)[1])["data"]["metadata"]
+    assert cache.lookup(metadata["sha256"]) == 6
+    assert cache.get_page(metadata["sha256"], 5) == extract_page_texts(pdf)[5]
+    cache.close()
+
+
+def test_upload_trace_times_each_stage(client):
+    pdf = make_pdf(["Traced report"] + INVOICE_PAGES[1:])
+
+    response = client.post("/upload", files={"file": ("traced.pdf", pdf, "application/pdf")}, follow_redirects=False)
+    document_id = response.headers["location"].rsplit("/", 1)[1]
+
+    trace = client.get(f"/traces/{document_id}").json()
+    stages = {timing["stage"]: timing for timing in trace["stages"]}
+    assert {"file_save", "store_write", "intent_detection", "agent_extraction"} <= set(stages)
+    assert stages["file_save"]["bytes_read"] == len(pdf)
+    assert stages["agent_extraction"]["page_count"] == 6
+    assert trace["status"] == "analyzed"
+    assert document_id in [summary["document_id"] for summary in client.get("/traces?limit=1000").json()["documents"]]
+    assert client.get("/traces/unknown").status_code == 404
+
+
+def test_metrics_are_exposed_in_the_text_format(client):
+    content = json.dumps({"invoice": 42, "total": 1})
+    client.post("/upload", files={"file": ("metrics.json", content, "application/json")}, follow_redirects=False)
+
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE documents_processed_total counter" in lines
+    assert any(line.startswith('documents_processed_total{format="json",intent=') for line in lines)
+    assert any(line.startswith('http_request_duration_seconds_count{method="POST",route="/upload"}')
+               for line in lines)
+    assert any(line.startswith('document_processing_seconds_bucket{le="+Inf"}') for line in lines)
@@ -0,0 +1,107 @@
+# tests/test_classifier.py
+import json
+
+import pytest
+
+from agents.classifier_agent import ClassifierAgent
+from agents.email_agent import EmailAgent
+from memory.memory_store import MemoryStore
+from tests.conftest import make_pdf
+from utils.parsed_document import ParsedDocument
+
+EMAIL = """From: customer@example.com
+To: support@example.com
+Subject: Complaint about my order
+
+I am unhappy with the issue and want a refund for this problem.
+"""
+
+
+@pytest.fixture
+def classifier():
+    return ClassifierAgent(MemoryStore())
+
+
+@pytest.mark.parametrize("filename, content, content_type, expected", [
+    ("message.eml", EMAIL, "", "email"),
+    ("message.txt", EMAIL, "text/plain", "email"),
+    ("data.json", json.dumps({"invoice": 1}), "", "json"),
+    ("data.bin", json.dumps({"invoice": 1}), "application/octet-stream", "json"),
+    ("notes.txt", "plain words", "text/plain", "binary"),
+])
+def test_format_from_extension_content_type_or_content(classifier, tmp_path, filename, content, content_type,
+                                                      expected):
+    path = tmp_path / filename
+    path.write_text(content)
+
+    result = classifier.classify(str(path), {"filename": filename, "content_type": content_type})
+
+    assert result["format"] == expected
+
+
+def test_intent_from_email_content(classifier, tmp_path):
+    path = tmp_path / "message.eml"
+    path.write_text(EMAIL)
+
+    result = classifier.classify(str(path), {"filename": "message.eml", "content_type": "message/rfc822"})
+
+    assert result["intent"] == "Complaint"
+    assert 0.5 < result["confidence"] <= 0.9
+
+
+def test_user_intent_wins(classifier, tmp_path):
+    path = tmp_path / "message.eml"
+    path.write_text(EMAIL)
+
+    result = classifier.classify(str(path), {"filename": "message.eml"}, user_intent="RFQ")
+
+    assert result == {"format": "email", "intent": "RFQ", "confidence": 1.0}
+
+
+
+def test_classifier_and_agent_share_one_read(tmp_path):
+    path = tmp_path / "message.eml"
+    path.write_text(EMAIL)
+    metadata = {"document_id": "a", "filename": "message.eml", "content_type": "message/rfc822"}
+    store = MemoryStore()
+    document = ParsedDocument(str(path))
+
+    ClassifierAgent(store).classify(str(path), metadata, document=document)
+    EmailAgent(store).process(str(path), metadata, document=document)
+
+    assert document.bytes_read == path.stat().st_size
+    assert "email_analysis" in store.get("a")["data"]
+
+
+def classify_pdf(classifier, tmp_path, page_texts):
+    path = tmp_path / "document.pdf"
+    path.write_bytes(make_pdf(page_texts))
+    document = ParsedDocument(str(path))
+    result = classifier.classify(str(path), {"filename": "document.pdf"}, document=document)
+    return result, document
+
+
+def test_pdf_intent_stops_at_the_first_decisive_page(classifier, tmp_path):
+    pages = ["Invoice\nInvoice number 7, total due, payment terms, amount due", "Quarterly report", "Fraud alert"]
+
+    result, document = classify_pdf(classifier, tmp_path, pages)
+
+    assert result["intent"] == "Invoice"
+    assert document.pages_extracted == 1
+
+
+def test_pdf_intent_scores_the_first_three_pages_until_decided(classifier, tmp_path):
+    pages = ["Complaint", "We are unhappy", "The refund issue", "Invoice " * 20]
+
+    result, document = classify_pdf(classifier, tmp_path, pages)
+
+    joined = "".join(document.page_text(i) + "\n" for i in range(3))
+    assert result == {"format": "pdf", **classifier._classify_text_intent(joined)}
+    assert result["intent"] == "Complaint"
+    assert document.pages_extracted == 3
+
+
+def test_cache_inputs_are_the_extension_and_content_type(classifier):
+    assert classifier.cache_inputs({"filename": "Report.PDF", "content_type": "application/pdf"}) == \
+        ".pdf,application/pdf"
+    assert classifier.cache_inputs({"filename": "noext"}) == ","
@@ -0,0 +1,477 @@
+# tests/test_memory.py
+import random
+import sqlite3
+import string
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import memory
+from agents.classifier_agent import ClassifierAgent
+from agents.json_agent import JsonAgent
+from memory.action_outbox import ActionOutbox
+from memory.memory_store import MemoryStore
+from memory.page_cache import PageTextCache
+from memory.result_cache import RecordingStore, ResultCache
+from memory.schema import DocumentMetadata, StageTiming
+from memory.sqlite_store import SQLiteStore
+from memory.trace_store import TraceStore
+from utils import config
+from tests.conftest import make_pdf, seed_documents
+from utils.parsed_document import ParsedDocument
+
+# Filters of the dashboard views: (format, status, date_prefix)
+QUERY_FILTERS = [
+    (None, None, None),
+    ("pdf", None, None),
+    (None, "completed", None),
+    ("email", "processing", None),
+    (None, None, "2025-06-02"),
+    (None, None, "2025-06"),
+    ("json", None, "2025-06-03"),
+    (None, None, "2025-06-01T1"),
+    ("pdf", "error", "2025-06"),
+    ("unknown", None, None),
+]
+
+
+def page_through(store, limit=7, **filters):
+    """Collect the document IDs of every query() page."""
+    document_ids = []
+    cursor = None
+    while True:
+        documents, cursor = store.query(cursor=cursor, limit=limit, **filters)
+        assert len(documents) <= limit
+        document_ids += [document["document_id"] for document in documents]
+        if not cursor:
+            return document_ids
+
+
+# Stores
+
+def test_sqlite_store_writes_from_many_threads(tmp_path):
+    store = SQLiteStore(str(tmp_path / "memory.db"))
+
+    def write(i):
+        store.store(f"doc-{i}", "metadata", {"filename": f"file{i}.pdf"})
+        store.update_status(f"doc-{i}", "completed")
+        # Each thread keeps its own connection
+        return store._get_connection() is store._get_connection()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert all(executor.map(write, range(40)))
+
+    assert all(store.get(f"doc-{i}")["status"] == "completed" for i in range(40))
+    store.close()
+    conn = sqlite3.connect(str(tmp_path / "memory.db"))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_get_returns_the_latest_data(store):
+    for version in range(3):
+        store.store("a", "classification", {"format": "pdf", "version": version})
+    store.store("a", "metadata", {"filename": "a.pdf"})
+    store.store("b", "metadata", {"filename": "b.json"})
+
+    assert store.get("a")["data"] == {"classification": {"format": "pdf", "version": 2},
+                                      "metadata": {"filename": "a.pdf"}}
+    assert store.get("missing") is None
+    documents = store.get_many(["b", "missing", "a"])
+    assert set(documents) == {"a", "b"}
+    assert documents["a"]["data"]["classification"]["version"] == 2
+
+
+def test_sqlite_store_gets_one_data_type(tmp_path):
+    store = SQLiteStore(str(tmp_path / "memory.db"))
+    store.store("a", "classification", {"format": "pdf"})
+    store.store("a", "classification", {"format": "email"})
+
+    assert store.get("a", "classification") == {"format": "email"}
+    assert store.get("a", "metadata") is None
+    store.close()
+
+
+def test_list_documents_pages_by_update_time(store):
+    document_ids = seed_documents(store, 12)
+    # Touch a few documents so the update order differs from the insertion order
+    for document_id in ("doc-003", "doc-000", "doc-007"):
+        time.sleep(0.002)
+        store.update_status(document_id, "completed")
+
+    listed = []
+    cursor = None
+    while True:
+        documents, cursor = store.list_documents(limit=5, cursor=cursor)
+        listed += documents
+        if not cursor:
+            break
+
+    assert sorted(document["document_id"] for document in listed) == sorted(document_ids)
+    assert [document["document_id"] for document in listed[:3]] == ["doc-007", "doc-000", "doc-003"]
+    assert all(set(document["data"]) <= {"metadata", "classification"} for document in listed)
+    assert listed[0]["status"] == "completed"
+
+
+def test_get_counts_match_across_backends(seeded_stores):
+    counts = {backend: store.get_counts() for backend, store in seeded_stores.items()}
+
+    assert counts["memory"]["total_count"] == 40
+    assert sum(counts["memory"]["status_counts"].values()) == 40
+    assert counts["memory"]["daily_counts"] == {"2025-06-01": 14, "2025-06-02": 13, "2025-06-03": 13}
+    assert counts["sqlite"] == counts["memory"]
+    assert counts["redis"] == counts["memory"]
+
+
+def test_get_counts_follow_updates(store):
+    store.store("a", "metadata", {"upload_time": "2025-06-01T10:00:00"})
+    store.store("a", "classification", {"format": "pdf"})
+    store.store("b", "metadata", {"upload_time": "2025-06-02T10:00:00"})
+
+    store.update_status("a", "completed")
+    store.store("a", "classification", {"format": "email"})
+    store.store("b", "metadata", {"upload_time": "2025-06-01T11:00:00"})
+
+    assert store.get_counts() == {
+        "total_count": 2,
+        "format_counts": {"email": 1},
+        "status_counts": {"completed": 1, "received": 1},
+        "daily_counts": {"2025-06-01": 2}
+    }
+
+
+def test_rebuild_counts_recomputes_the_aggregates(store):
+    seed_documents(store, 10)
+    counts = store.get_counts()
+
+    store.rebuild_counts()
+
+    assert store.get_counts() == counts
+
+
+@pytest.mark.parametrize("sort", ["-upload_time", "upload_time"])
+@pytest.mark.parametrize("format, status, date_prefix", QUERY_FILTERS)
+def test_query_pages_match_across_backends(seeded_stores, format, status, date_prefix, sort):
+    filters = {"format": format, "status": status, "date_prefix": date_prefix, "sort": sort}
+    pages = {backend: page_through(store, **filters) for backend, store in seeded_stores.items()}
+
+    # Expected from the seeded documents themselves
+    documents = seeded_stores["memory"].documents.values()
+    expected = sorted(
+        (
+            (document["data"]["metadata"]["upload_time"], document["document_id"])
+            for document in documents
+            if (not format or document["data"].get("classification", {}).get("format") == format)
+            and (not status or document["status"] == status)
+            and (not date_prefix or document["data"]["metadata"]["upload_time"].startswith(date_prefix))
+        ),
+        reverse=sort.startswith("-")
+    )
+    assert pages["memory"] == [document_id for _, document_id in expected]
+    assert pages["sqlite"] == pages["memory"]
+    assert pages["redis"] == pages["memory"]
+
+
+@pytest.mark.parametrize("format, status, date_prefix", QUERY_FILTERS)
+def test_count_matches_query(seeded_stores, format, status, date_prefix):
+    for backend, store in seeded_stores.items():
+        matching = page_through(store, limit=100, format=format, status=status, date_prefix=date_prefix)
+        assert store.count(format=format, status=status, date_prefix=date_prefix) == len(matching), backend
+
+
+def test_query_rejects_bad_cursor_and_sort(store):
+    seed_documents(store, 5)
+
+    with pytest.raises(ValueError):
+        store.query(cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        store.query(sort="filename")
+
+
+def test_iter_document_pages_covers_every_document(store):
+    document_ids = seed_documents(store, 25)
+
+    pages = list(store.iter_document_pages(batch_size=4, format="pdf"))
+
+    assert all(len(page) <= 4 for page in pages)
+    seen = [document["document_id"] for page in pages for document in page]
+    assert sorted(seen) == sorted(
+        document_id for i, document_id in enumerate(document_ids) if i % 3 == 0 and i % 7
+    )
+
+
+def test_store_backend_follows_the_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "USE_REDIS", False)
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "shared.db"))
+    store = memory.create_memory_store()
+    assert isinstance(store, SQLiteStore)
+    assert store.db_path == str(tmp_path / "shared.db")
+    store.close()
+
+    monkeypatch.setattr(config, "SQLITE_PATH", "")
+    assert type(memory.create_memory_store()) is MemoryStore
+
+
+def test_store_is_created_once_per_process(monkeypatch):
+    monkeypatch.setattr(memory, "_memory_store", None)
+
+    assert memory.get_memory_store() is memory.get_memory_store()
+
+
+# Result cache
+
+def test_cache_key_depends_on_the_name_inputs_the_agents_read():
+    classifier, json_agent = ClassifierAgent(MemoryStore()), JsonAgent(MemoryStore())
+
+    def key(filename, content_type="application/json"):
+        metadata = {"filename": filename, "content_type": content_type}
+        name_inputs = "|".join(agent.cache_inputs(metadata) for agent in (classifier, json_agent))
+        return ResultCache.make_key("abc", "v1", "", name_inputs)
+
+    assert key("settings_config.json") != key("plain.json")
+    assert key("orders.JSON") != key("orders.txt")
+    assert key("plain.json") != key("plain.json", "text/plain")
+    # Names that differ in nothing the agents read share the entry
+    assert key("export-1.json") == key("export-2.json")
+    assert ResultCache.make_key("abc", "v1", "Invoice") != ResultCache.make_key("abc", "v1")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"value": 1})
+    cache.put("b", {"value": 2})
+    assert cache.get("a") == {"value": 1}
+
+    cache.put("c", {"value": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": 1}
+    assert cache.get("c") == {"value": 3}
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 3, "misses": 1, "evictions": 1,
+                             "hit_rate": 0.75}
+
+
+def test_cache_returns_copies():
+    cache = ResultCache()
+    result = {"writes": [["classification", {"format": "pdf"}]]}
+    cache.put("a", result)
+    result["writes"].clear()
+
+    cached = cache.get("a")
+    cached["writes"].clear()
+
+    assert cache.get("a") == {"writes": [["classification", {"format": "pdf"}]]}
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = ResultCache(max_entries=0)
+    cache.put("a", {"value": 1})
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_recording_store_records_writes_inside_the_block():
+    store = RecordingStore(MemoryStore())
+    store.store("a", "metadata", {"filename": "a.pdf"})
+
+    with store.record() as writes:
+        store.store("a", "classification", {"format": "pdf"})
+        store.update_status("a", "completed")
+
+    assert writes == [("classification", {"format": "pdf"})]
+    assert store.get("a")["status"] == "completed"
+
+
+# Trace store
+
+def test_trace_store_keeps_the_latest_traces_and_lists_the_slowest():
+    traces = TraceStore(max_traces=2)
+    for i, seconds in enumerate([0.3, 0.1, 0.2]):
+        trace = traces.start(DocumentMetadata(document_id=f"doc-{i}", filename="a.pdf", content_type="", size=1))
+        trace.stages.append(StageTiming(stage="agent_extraction", wall_seconds=seconds))
+
+    assert traces.get("doc-0") is None
+    assert [summary["document_id"] for summary in traces.slowest()] == ["doc-2", "doc-1"]
+    assert traces.slowest(1)[0]["slowest_stage"] == "agent_extraction"
+    assert traces.stats() == {"traces": 2, "max_traces": 2, "evictions": 1}
+
+
+# Page text cache
+
+def page_of(seed, length=2000):
+    """A page text that barely compresses."""
+    rng = random.Random(seed)
+    return "".join(rng.choice(string.ascii_letters) for _ in range(length))
+
+
+def test_page_cache_returns_single_pages(tmp_path):
+    cache = PageTextCache(str(tmp_path / "pages.db"), "v1")
+    cache.put("abc", ["first page", "", "third page"])
+
+    assert cache.lookup("abc") == 3
+    assert cache.get_page("abc", 2) == "third page"
+    assert cache.get_page("abc", 1) == ""
+    assert cache.get_page("abc", 3) is None
+    assert cache.lookup("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    cache.close()
+
+
+def test_page_cache_is_keyed_by_extractor_version(tmp_path):
+    path = str(tmp_path / "pages.db")
+    old = PageTextCache(path, "v1")
+    old.put("abc", ["old text"])
+    new = PageTextCache(path, "v2")
+
+    assert new.lookup("abc") is None
+    assert new.get_page("abc", 0) is None
+    new.put("abc", ["new text"])
+
+    assert old.get_page("abc", 0) == "old text"
+    assert new.get_page("abc", 0) == "new text"
+    old.close()
+    new.close()
+
+
+def test_page_cache_evicts_least_recently_used_documents(tmp_path):
+    pages = {name: [page_of(name)] for name in ("a", "b", "c")}
+    sizes = {name: len(zlib.compress(texts[0].encode("utf-8"))) for name, texts in pages.items()}
+    cache = PageTextCache(str(tmp_path / "pages.db"), "v1", max_bytes=sum(sizes.values()) - 1)
+    cache.put("a", pages["a"])
+    time.sleep(0.01)
+    cache.put("b", pages["b"])
+    time.sleep(0.01)
+    assert cache.lookup("a") == 1
+
+    time.sleep(0.01)
+    cache.put("c", pages["c"])
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == cache.lookup("c") == 1
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == sizes["a"] + sizes["c"]
+    # A document larger than the whole cache is not kept
+    cache.put("d", [page_of("d", 20000)])
+    assert cache.lookup("d") is None
+    cache.close()
+
+
+def test_parsed_document_reads_cached_pages_without_the_pdf(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf(["One", "Two"]))
+    cache = PageTextCache(str(tmp_path / "pages.db"), "v1")
+    cache.put("hash", ["cached one", "cached two"])
+
+    document = ParsedDocument(str(path), page_cache=cache, content_hash="hash")
+
+    assert document.pages_cached
+    assert document.page_texts == ["cached one", "cached two"]
+    assert document.bytes_read == 0
+    cache.close()
+
+
+# Action outbox
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = ActionOutbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+
+
+def test_outbox_queues_an_action_once(outbox):
+    assert outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {"document_id": "doc-1"}) == \
+        ("doc-1:archive", "queued")
+    assert outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {}) == ("doc-1:archive", "pending")
+
+    entry, = outbox.claim(10, lease=60)
+    outbox.mark_delivered([entry.key])
+
+    assert outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {}) == ("doc-1:archive", "delivered")
+    assert outbox.stats()["delivered"] == 1
+
+
+def test_outbox_batch_commits_together(outbox):
+    outbox.enqueued.clear()
+    with outbox.batch():
+        for i in range(3):
+            outbox.enqueue(f"doc-{i}", "archive", "POST", "/archive/store", {})
+        assert not outbox.enqueued.is_set()
+
+    assert outbox.enqueued.is_set()
+    assert outbox.stats()["pending"] == 3
+
+
+def test_outbox_claims_oldest_first_within_limit(outbox):
+    for i in range(5):
+        outbox.enqueue(f"doc-{i}", "archive", "POST", "/archive/store", {"n": i})
+
+    first = outbox.claim(3, lease=60)
+    second = outbox.claim(3, lease=60)
+
+    assert [entry.document_id for entry in first] == ["doc-0", "doc-1", "doc-2"]
+    assert [entry.document_id for entry in second] == ["doc-3", "doc-4"]
+    assert [entry.attempts for entry in first + second] == [1] * 5
+    assert second[1].payload == {"n": 4}
+    assert outbox.claim(3, lease=60) == []
+
+
+def test_outbox_lease_expiry_makes_entries_due_again(outbox):
+    outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {})
+    outbox.claim(10, lease=0.2)
+    assert outbox.claim(10, lease=0.2) == []
+
+    time.sleep(0.25)
+    entry, = outbox.claim(10, lease=60)
+
+    assert entry.attempts == 2
+
+
+def test_outbox_renew_extends_the_lease(outbox):
+    outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {})
+    entry, = outbox.claim(10, lease=0.2)
+
+    outbox.renew([entry.key], 60)
+    time.sleep(0.25)
+
+    assert outbox.claim(10, lease=60) == []
+
+
+def test_outbox_retries_and_gives_up(outbox):
+    outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {})
+    entry, = outbox.claim(10, lease=60)
+
+    outbox.mark_failed(entry, "HTTP 503", retry_delay=0)
+    entry, = outbox.claim(10, lease=60)
+    outbox.mark_failed(entry, "HTTP 503", retry_delay=None)
+
+    assert outbox.claim(10, lease=60) == []
+    assert outbox.stats() == {"pending": 0, "delivered": 0, "failed": 1, "oldest_pending_seconds": None}
+    # A settled entry is not moved by a late delivery report
+    outbox.mark_delivered([entry.key])
+    assert outbox.stats()["failed"] == 1
+
+
+def test_outbox_prunes_old_settled_entries(outbox):
+    for i in range(5):
+        outbox.enqueue(f"doc-{i}", "archive", "POST", "/archive/store", {})
+    entries = outbox.claim(4, lease=60)
+    outbox.mark_delivered([entry.key for entry in entries[:3]])
+    outbox.mark_failed(entries[3], "HTTP 400", retry_delay=None)
+    # Age every entry but doc-0 by two hours
+    conn = sqlite3.connect(outbox.db_path)
+    with conn:
+        conn.execute("UPDATE action_outbox SET updated = updated - 7200 WHERE document_id != 'doc-0'")
+    conn.close()
+
+    assert outbox.prune(3600, chunk_size=2) == 3
+
+    assert outbox.stats()["delivered"] == 1
+    assert outbox.stats()["failed"] == 0
+    assert outbox.stats()["pending"] == 1
+    # A pruned action can be queued again
+    assert outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {})[1] == "queued"
@@ -0,0 +1,357 @@
+# tests/test_router.py
+import json
+import os
+import time
+
+import httpx
+import pytest
+
+from memory.action_outbox import ActionOutbox
+from memory.memory_store import MemoryStore
+from router.action_dispatcher import ActionDispatcher, ActionDispatchError
+from router.action_router import ActionRouter
+from router.outbox_dispatcher import OutboxDispatcher
+from router.routing_rules import DEFAULT_RULES_PATH, RoutingRules, RoutingRulesError, compile_condition, compile_rules
+
+RULES = {
+    "actions": {
+        "escalate": {"method": "POST", "endpoint": "/crm/escalate", "body": {"priority": "high"}},
+        "archive": {"endpoint": "/archive/store"},
+        "log": {"details": {"status": "logged"}}
+    },
+    "routes": {
+        "pdf": [
+            {"when": {"field": "pdf_analysis.invoice_data.total", "gt": 10000}, "action": "escalate"},
+            {"action": "archive"}
+        ],
+        "email": [
+            {
+                "when": {"all": [
+                    {"field": "email_analysis.tone", "in": ["Angry", "Urgent"]},
+                    {"not": {"field": "email_analysis.urgency", "eq": "Low"}}
+                ]},
+                "action": "escalate"
+            }
+        ]
+    }
+}
+
+
+def write_rules(path, rules):
+    """Write a rules file, moving its modification time so the change is seen."""
+    path.write_text(json.dumps(rules))
+    stamp = time.time_ns() + 1_000_000_000
+    os.utime(path, ns=(stamp, stamp))
+
+
+def make_dispatcher(responses, requests, **kwargs):
+    """A dispatcher whose transport records each request and answers with the next of the given responses."""
+    responses = iter(responses)
+
+    def handler(request):
+        requests.append(request)
+        return next(responses)
+
+    kwargs.setdefault("backoff_base", 0.01)
+    return ActionDispatcher("http://actions.test", transport=httpx.MockTransport(handler), **kwargs)
+
+
+# Action dispatcher
+
+def test_dispatch_retries_with_one_idempotency_key():
+    requests = []
+    dispatcher = make_dispatcher([httpx.Response(503), httpx.Response(502), httpx.Response(200, json={"id": 7})],
+                                 requests)
+    try:
+        assert dispatcher.dispatch("POST", "/crm/escalate", {"priority": "high"}) == {"id": 7}
+
+        assert len(requests) == 3
+        assert len({request.headers["Idempotency-Key"] for request in requests}) == 1
+        stats = dispatcher.stats()["endpoints"]["/crm/escalate"]
+        assert (stats["requests"], stats["retries"], stats["failures"]) == (1, 2, 0)
+    finally:
+        dispatcher.close()
+
+
+def test_dispatch_sends_the_given_idempotency_key():
+    requests = []
+    dispatcher = make_dispatcher([httpx.Response(204)], requests)
+    try:
+        result = dispatcher.dispatch("POST", "/finance/invoice", {}, idempotency_key="doc-1:invoice")
+
+        assert result == {"status": "success", "status_code": 204}
+        assert requests[0].headers["Idempotency-Key"] == "doc-1:invoice"
+    finally:
+        dispatcher.close()
+
+
+def test_dispatch_waits_for_retry_after():
+    requests = []
+    dispatcher = make_dispatcher([httpx.Response(429, headers={"Retry-After": "1"}), httpx.Response(200, json={})],
+                                 requests, backoff_max=5)
+    try:
+        start = time.perf_counter()
+        dispatcher.dispatch("POST", "/crm/escalate", {})
+
+        assert time.perf_counter() - start >= 1
+        assert len(requests) == 2
+    finally:
+        dispatcher.close()
+
+
+def test_client_errors_are_not_retried():
+    requests = []
+    dispatcher = make_dispatcher([httpx.Response(422, text="bad request"), httpx.Response(200, json={})], requests)
+    try:
+        with pytest.raises(ActionDispatchError) as error:
+            dispatcher.dispatch("POST", "/compliance/flag", {})
+
+        assert error.value.status_code == 422
+        assert len(requests) == 1
+        assert dispatcher.stats()["endpoints"]["/compliance/flag"]["failures"] == 1
+    finally:
+        dispatcher.close()
+
+
+def test_dispatch_gives_up_after_the_retries():
+    requests = []
+    dispatcher = make_dispatcher([httpx.Response(503)] * 3, requests, retries=2)
+    try:
+        with pytest.raises(ActionDispatchError) as error:
+            dispatcher.dispatch("POST", "/crm/escalate", {})
+
+        assert error.value.status_code is None
+        assert len(requests) == 3
+    finally:
+        dispatcher.close()
+
+
+def test_dispatch_many_returns_each_result_or_error():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(400 if request.headers["Idempotency-Key"] == "bad" else 200, json={})
+
+    dispatcher = ActionDispatcher("http://actions.test", transport=httpx.MockTransport(handler))
+    try:
+        results = dispatcher.dispatch_many("POST", "/crm/escalate", [({}, "a"), ({}, "bad"), ({}, "c")])
+
+        assert results[0] == {} and results[2] == {}
+        assert isinstance(results[1], ActionDispatchError)
+        assert len(requests) == 3
+    finally:
+        dispatcher.close()
+
+
+def test_delivery_time_bound():
+    dispatcher = ActionDispatcher("http://localhost", timeout=10, endpoint_concurrency=8, retries=3, backoff_max=5)
+    try:
+        assert dispatcher.max_delivery_seconds(1) == 55
+        assert dispatcher.max_delivery_seconds(8) == 55
+        assert dispatcher.max_delivery_seconds(50) == 7 * 55
+    finally:
+        dispatcher.close()
+
+
+# Routing rules
+
+def test_compiled_rules_pick_the_first_matching_action():
+    rules = compile_rules(RULES)
+
+    assert rules.select("pdf", {"pdf_analysis": {"invoice_data": {"total": 25000}}}) == "escalate"
+    assert rules.select("pdf", {"pdf_analysis": {"invoice_data": {"total": "25000"}}}) == "archive"
+    assert rules.select("pdf", {}) == "archive"
+    assert rules.select("email", {"email_analysis": {"tone": "Angry", "urgency": "High"}}) == "escalate"
+    assert rules.select("email", {"email_analysis": {"tone": "Angry", "urgency": "Low"}}) is None
+    with pytest.raises(KeyError):
+        rules.select("json", {})
+
+
+def test_compiled_actions():
+    actions = compile_rules(RULES).actions
+
+    assert actions["escalate"].request("doc-1") == \
+        ("POST", "/crm/escalate", {"document_id": "doc-1", "priority": "high"})
+    assert actions["archive"].request("doc-1") == ("POST", "/archive/store", {"document_id": "doc-1"})
+    assert actions["log"].details == {"status": "logged"}
+
+
+@pytest.mark.parametrize("condition, data, expected", [
+    ({"field": "a", "eq": 1}, {"a": 1}, True),
+    ({"field": "a", "ne": 1}, {}, True),
+    ({"field": "a", "gte": 2, "lt": 5}, {"a": 2}, True),
+    ({"field": "a", "gt": 0}, {"a": True}, False),
+    ({"field": "a.b", "contains": "x"}, {"a": {"b": "xyz"}}, True),
+    ({"field": "a.b", "exists": True}, {"a": "not an object"}, False),
+    ({"field": "a", "truthy": False}, {"a": []}, True),
+    ({"any": []}, {}, False),
+    ({"all": []}, {}, True),
+])
+def test_conditions(condition, data, expected):
+    assert compile_condition(condition, "test")(data) is expected
+
+
+@pytest.mark.parametrize("rules", [
+    {"actions": {}},
+    {"actions": {"a": {"endpoint": "/a", "details": {}}}, "routes": {}},
+    {"actions": {"a": {"method": "POST"}}, "routes": {}},
+    {"actions": {"a": {"endpoint": "/a"}}, "routes": {"pdf": [{"action": "b"}]}},
+    {"actions": {"a": {"endpoint": "/a"}}, "routes": {"pdf": [{"when": {"field": "x", "like": 1}, "action": "a"}]}},
+    {"actions": {"a": {"endpoint": "/a"}}, "routes": {"pdf": [{"when": {"field": "x"}, "action": "a"}]}},
+    {"actions": {"a": {"endpoint": "/a"}}, "routes": {"pdf": [{"when": {"any": [], "field": "x"}, "action": "a"}]}},
+])
+def test_malformed_rules_are_rejected(rules):
+    with pytest.raises(RoutingRulesError):
+        compile_rules(rules)
+
+
+def test_default_rules_compile():
+    rules = RoutingRules(DEFAULT_RULES_PATH).current()
+
+    assert set(rules.routes) == {"email", "pdf", "json"}
+
+
+def test_rules_reload_when_the_file_changes(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, RULES)
+    rules = RoutingRules(str(path))
+    first = rules.current()
+    assert rules.current() is first
+
+    changed = dict(RULES, routes={"pdf": [{"action": "log"}]})
+    write_rules(path, changed)
+
+    assert rules.current().select("pdf", {}) == "log"
+    assert rules.current().version != first.version
+    assert rules.stats()["reloads"] == 1
+
+
+def test_invalid_rules_keep_the_loaded_ones(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, RULES)
+    rules = RoutingRules(str(path))
+    version = rules.current().version
+
+    path.write_text("{not json")
+    os.utime(path, ns=(time.time_ns() + 2_000_000_000,) * 2)
+    assert rules.current().version == version
+    assert rules.stats()["last_error"]
+
+    path.unlink()
+    assert rules.current().version == version
+
+    write_rules(path, dict(RULES, routes={"pdf": [{"action": "log"}]}))
+    assert rules.current().select("pdf", {}) == "log"
+    assert rules.stats()["last_error"] is None
+
+
+def test_missing_rules_file_fails_at_startup(tmp_path):
+    with pytest.raises(RoutingRulesError):
+        RoutingRules(str(tmp_path / "missing.json"))
+
+
+def test_router_routes_by_the_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, RULES)
+    store = MemoryStore()
+    store.store("doc-1", "classification", {"format": "pdf", "intent": "Invoice"})
+    store.store("doc-1", "pdf_analysis", {"invoice_data": {"total": 25000}})
+    outbox = ActionOutbox(str(tmp_path / "outbox.db"))
+    try:
+        result = ActionRouter(store, None, outbox, RoutingRules(str(path))).route_action("doc-1")
+
+        assert result["action"] == "escalate"
+        assert result["details"] == \
+            {"status": "queued", "endpoint": "/crm/escalate", "idempotency_key": "doc-1:escalate"}
+        assert store.get("doc-1")["data"]["action"]["action"] == "escalate"
+    finally:
+        outbox.close()
+
+
+# Outbox delivery
+
+class SlowRouter:
+    """
+    ActionRouter stand-in taking delay seconds per endpoint group.
+
+    At the end of each group it claims from the outbox like a second
+    process would, recording what that process would have taken over.
+    """
+
+    def __init__(self, outbox, delay):
+        self.memory_store = MemoryStore()
+        self.outbox = outbox
+        self.delay = delay
+        self.calls = []
+        self.recorded = []
+
+    def deliver(self, method, endpoint, entries, bulk_suffix=""):
+        time.sleep(self.delay)
+        taken_over = self.outbox.claim(100, lease=60)
+        self.calls.append((endpoint, [entry.key for entry in taken_over]))
+        return [{"status": "success"} for _ in entries]
+
+    def record_delivery(self, entry, response=None, error=None):
+        self.recorded.append((entry.key, error is None))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = ActionOutbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+
+
+def test_dispatcher_renews_the_lease_between_endpoint_groups(outbox):
+    for i in range(3):
+        outbox.enqueue(f"doc-{i}", "archive", "POST", "/archive/store", {})
+        outbox.enqueue(f"doc-{i}", "escalate", "POST", "/crm/escalate", {})
+    # The lease covers one group, not both
+    router = SlowRouter(outbox, delay=0.2)
+    dispatcher = OutboxDispatcher(outbox, router, batch_size=10, lease=0.3, poll_interval=60)
+    try:
+        assert wait_for(lambda: outbox.stats()["delivered"] == 6)
+    finally:
+        dispatcher.shutdown()
+
+    assert sorted(endpoint for endpoint, _ in router.calls) == ["/archive/store", "/crm/escalate"]
+    assert [taken_over for _, taken_over in router.calls] == [[], []]
+    assert dispatcher.stats()["dispatcher"]["delivered"] == 6
+
+
+def test_dispatcher_retries_then_records_failures(outbox):
+    error = RuntimeError("connection reset")
+    outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {})
+    router = SlowRouter(outbox, delay=0)
+    router.deliver = lambda method, endpoint, entries, bulk_suffix="": [error] * len(entries)
+    dispatcher = OutboxDispatcher(outbox, router, max_attempts=2, retry_base=0.01, poll_interval=0.02)
+    try:
+        assert wait_for(lambda: outbox.stats()["failed"] == 1)
+    finally:
+        dispatcher.shutdown()
+
+    assert router.recorded == [("doc-1:archive", False)]
+    assert dispatcher.stats()["dispatcher"]["retried"] == 1
+
+
+def test_dispatcher_prunes_and_caches_counts(outbox):
+    outbox.enqueue("doc-1", "archive", "POST", "/archive/store", {})
+    router = ActionRouter(MemoryStore(), None, outbox)
+    dispatcher = OutboxDispatcher(outbox, router, retention=0.1, prune_interval=0.05, stats_interval=0.05,
+                                  poll_interval=0.02)
+    try:
+        assert dispatcher.stats(cached=True)["pending"] == 1
+        assert wait_for(lambda: dispatcher.stats()["dispatcher"]["pruned"] == 1)
+        assert wait_for(lambda: dispatcher.stats(cached=True)["delivered"] == 0)
+    finally:
+        dispatcher.shutdown()
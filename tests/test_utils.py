@@ -0,0 +1,320 @@
+# tests/test_utils.py
+import asyncio
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from memory.schema import DocumentMetadata, ProcessingTrace
+from tests.conftest import make_pdf
+from utils import tracing
+from utils.job_queue import JobQueue, JobQueueFull
+from utils.metrics import Counter, Exposition, Histogram
+from utils.pdf_parser import extract_page_range, extract_page_texts, split_pages
+from utils.text_processor import KeywordMatcher, KeywordTally
+from utils.tracing import StageTracer
+from utils.worker_pool import WorkerPool
+
+# Keywords that contain, prefix and overlap each other
+KEYWORDS = {"invoice": ["invoice", "voice", "in", "invoice number"], "repeat": ["aa", "aaa", "a a"],
+            "other": ["policy", "poli", "ice"]}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(thread_workers=2, process_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+# Worker pool
+
+def test_run_in_thread_runs_off_the_event_loop(pool):
+    async def run():
+        return await pool.run_in_thread(lambda: threading.current_thread().name)
+
+    assert asyncio.run(run()).startswith("agent-worker")
+
+
+def test_submit_process_runs_in_another_process(pool):
+    assert pool.submit_process(os.getpid).result() != os.getpid()
+
+
+def test_submit_process_without_processes_runs_inline():
+    pool = WorkerPool(thread_workers=1, process_workers=0)
+    try:
+        assert pool.submit_process(os.getpid).result() == os.getpid()
+        with pytest.raises(ZeroDivisionError):
+            pool.submit_process(divmod, 1, 0).result()
+    finally:
+        pool.shutdown()
+
+
+def test_stats_count_running_and_queued_tasks(pool):
+    release = threading.Event()
+    futures = [pool.submit_thread(release.wait) for _ in range(3)]
+
+    stats = pool.stats()
+
+    release.set()
+    for future in futures:
+        future.result()
+    assert stats["thread"] == {"workers": 2, "running": 2, "queued": 1}
+    assert pool.stats()["thread"]["running"] == 0
+
+
+# Job queue
+
+def test_job_queue_runs_jobs_and_reports_their_state():
+    release = threading.Event()
+    done = []
+    jobs = JobQueue(lambda value: (release.wait(), done.append(value)), workers=1, max_size=5)
+    try:
+        jobs.submit("a", 1)
+        jobs.submit("b", 2)
+        assert wait_for(lambda: jobs.get("a") == "running")
+        assert jobs.get("b") == "queued"
+        assert jobs.stats() == {"workers": 1, "capacity": 5, "queued": 1, "running": 1}
+
+        release.set()
+        assert wait_for(lambda: done == [1, 2])
+        assert wait_for(lambda: jobs.get("b") is None)
+    finally:
+        jobs.shutdown()
+
+
+def test_full_job_queue_rejects_jobs():
+    release = threading.Event()
+    jobs = JobQueue(lambda: release.wait(), workers=1, max_size=1)
+    try:
+        jobs.submit("a")
+        assert wait_for(lambda: jobs.get("a") == "running")
+        jobs.submit("b")
+
+        assert jobs.full()
+        with pytest.raises(JobQueueFull):
+            jobs.submit("c")
+        assert jobs.get("c") is None
+    finally:
+        release.set()
+        jobs.shutdown()
+
+
+def test_shutdown_with_a_full_queue_finishes_the_queued_jobs():
+    release = threading.Event()
+    done = []
+    jobs = JobQueue(lambda value: (release.wait(), done.append(value)), workers=2, max_size=2)
+    jobs.submit("0", 0)
+    jobs.submit("1", 1)
+    assert wait_for(lambda: jobs.stats()["running"] == 2)
+    jobs.submit("2", 2)
+    jobs.submit("3", 3)
+    assert jobs.full()
+
+    # Returns at once although there is no room for a stop sentinel
+    jobs.shutdown()
+    with pytest.raises(JobQueueFull):
+        jobs.submit("late", 9)
+    release.set()
+
+    for thread in jobs._threads:
+        thread.join(5)
+    assert sorted(done) == [0, 1, 2, 3]
+    assert not any(thread.is_alive() for thread in jobs._threads)
+
+
+# Keyword matching
+
+def test_keyword_matcher_counts_like_str_count():
+    matcher = KeywordMatcher(KEYWORDS)
+    pieces = [keyword for keywords in KEYWORDS.values() for keyword in keywords] + ["a", " ", "\n", "x", "number"]
+    rng = random.Random(3)
+
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+        header_lines = rng.randint(0, 4)
+
+        scan = matcher.scan(text, header_lines=header_lines, header_max_length=12)
+
+        headers = [line for line in text.split("\n")[:header_lines] if len(line) < 12]
+        for keyword in matcher.keywords:
+            assert scan.counts[keyword] == text.count(keyword), (text, keyword)
+            assert scan.header_hits[keyword] == sum(1 for line in headers if keyword in line), (text, keyword)
+        for group, keywords in KEYWORDS.items():
+            assert scan.total(group) == sum(text.count(keyword) for keyword in keywords)
+            assert scan.any(group) == any(keyword in text for keyword in keywords)
+
+
+
+def test_keyword_tally_of_line_chunks_matches_one_scan():
+    matcher = KeywordMatcher(KEYWORDS)
+    pieces = [keyword for keywords in KEYWORDS.values() for keyword in keywords] + ["a", " ", "x"]
+    rng = random.Random(5)
+
+    for _ in range(200):
+        lines = ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(1, 12))]
+        text = "".join(line + "\n" for line in lines)
+        tally = KeywordTally(matcher, header_lines=4, header_max_length=12)
+
+        # Chunks of whole lines, like PDF pages
+        start = 0
+        while start < len(lines):
+            stop = start + rng.randint(1, 4)
+            tally.add("".join(line + "\n" for line in lines[start:stop]))
+            start = stop
+
+        scan = matcher.scan(text, header_lines=4, header_max_length=12)
+        assert tally.counts == scan.counts
+        assert tally.header_hits == scan.header_hits
+
+def test_keyword_matcher_rejects_empty_keywords():
+    with pytest.raises(ValueError):
+        KeywordMatcher({"empty": [""]})
+    with pytest.raises(ValueError):
+        KeywordMatcher({})
+
+
+# PDF text extraction
+
+@pytest.mark.parametrize("page_count, parts", [(1, 4), (7, 2), (16, 3), (5, 5), (3, 1)])
+def test_split_pages_covers_every_page_in_order(page_count, parts):
+    ranges = split_pages(page_count, parts)
+
+    assert len(ranges) == min(page_count, parts)
+    assert [page for start, stop in ranges for page in range(start, stop)] == list(range(page_count))
+    sizes = [stop - start for start, stop in ranges]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_extract_page_range_matches_the_full_extraction():
+    pdf = make_pdf([f"Page {i}\nline two" for i in range(5)] + [""])
+    page_texts = extract_page_texts(pdf)
+
+    assert [text.split("\n")[0] for text in page_texts] == [f"Page {i}" for i in range(5)] + [""]
+    assert extract_page_range(pdf, 2, 5) == page_texts[2:5]
+    assert extract_page_range(pdf, 0, 6) == page_texts
+
+
+# Stage tracing
+
+def new_trace():
+    return ProcessingTrace(document_id="a", metadata=DocumentMetadata(document_id="a", filename="a.pdf",
+                                                                      content_type="application/pdf", size=1))
+
+
+def timings(trace):
+    return {timing.stage: timing for timing in trace.stages}
+
+
+def test_nested_stages_are_not_double_counted():
+    trace = new_trace()
+    tracer = StageTracer(trace)
+
+    with tracer.stage("outer"):
+        time.sleep(0.05)
+        with tracer.stage("inner"):
+            time.sleep(0.1)
+    total = sum(timing.wall_seconds for timing in trace.stages)
+
+    outer, inner = timings(trace)["outer"], timings(trace)["inner"]
+    assert 0.05 <= outer.wall_seconds < 0.1
+    assert inner.wall_seconds >= 0.1
+    assert 0.15 <= total < 0.25
+
+
+def test_entering_a_stage_again_adds_to_its_timing():
+    trace = new_trace()
+    read = [0]
+    tracer = StageTracer(trace, bytes_source=lambda: read[0])
+
+    for size in (100, 50):
+        with tracer.stage("store_write") as timing:
+            read[0] += size
+            timing.page_count = 2
+
+    timing, = trace.stages
+    assert (timing.stage, timing.calls, timing.bytes_read, timing.page_count) == ("store_write", 2, 150, 2)
+
+
+def test_failed_stage_records_the_error():
+    trace = new_trace()
+
+    with pytest.raises(ValueError):
+        with StageTracer(trace).stage("agent_extraction"):
+            raise ValueError("bad page")
+
+    assert trace.stages[0].error == "ValueError: bad page"
+    assert trace.stages[0].calls == 1
+
+
+def test_stage_times_the_activated_tracer_only():
+    trace = new_trace()
+
+    with tracing.stage("outside") as timing:
+        assert timing is None
+    with tracing.activate(StageTracer(trace)):
+        with tracing.stage("inside"):
+            pass
+
+    assert [timing.stage for timing in trace.stages] == ["inside"]
+
+
+# Metrics
+
+def test_histogram_counts_values_up_to_each_bound():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative_counts() == {"0.1": 2, "1": 3, "+Inf": 4}
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+    assert histogram.quantile(0.5) == pytest.approx(0.1)
+    assert histogram.quantile(0.75) == pytest.approx(1.0)
+    assert histogram.quantile(1.0) == 1.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_counter_counts_by_label_values():
+    counter = Counter(("format", "intent"))
+    counter.inc("pdf", "Invoice")
+    counter.inc("pdf", "Invoice", amount=2)
+    counter.inc("email", "RFQ")
+
+    assert sorted(counter.samples(), key=lambda sample: sample[1]) == \
+        [({"format": "email", "intent": "RFQ"}, 1), ({"format": "pdf", "intent": "Invoice"}, 3)]
+    assert Counter().samples() == [({}, 0)]
+
+
+def test_exposition_renders_the_text_format():
+    histogram = Histogram((0.5,))
+    histogram.observe(0.25)
+    exposition = Exposition()
+    exposition.counter("uploads_total", "Uploads", [({"name": 'a "quoted"\nname'}, 2)])
+    exposition.gauge("queued", "Queued jobs", None)
+    exposition.histogram("latency_seconds", "Latency", [({"route": "/upload"}, histogram)])
+
+    assert exposition.render().splitlines() == [
+        "# HELP uploads_total Uploads",
+        "# TYPE uploads_total counter",
+        'uploads_total{name="a \\"quoted\\"\\nname"} 2',
+        "# HELP queued Queued jobs",
+        "# TYPE queued gauge",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/upload",le="0.5"} 1',
+        'latency_seconds_bucket{route="/upload",le="+Inf"} 1',
+        'latency_seconds_sum{route="/upload"} 0.25',
+        'latency_seconds_count{route="/upload"} 1',
+    ]
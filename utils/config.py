@@ -15,8 +15,57 @@ USE_REDIS = os.getenv("USE_REDIS", "False").lower() in ("true", "1", "t")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+# Empty keeps documents in process memory (single worker only)
 SQLITE_PATH = os.getenv("SQLITE_PATH", "./memory.db")
 
+# Worker Pool Configuration
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", 4))
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", 2))
+# PDFs with at least this many pages are split across the PDF processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 16))
+
+# Job Queue Configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 100))
+
+# Result Cache Configuration (0 disables it)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 1000))
+
+# Processing Trace Configuration (traces of the most recent documents kept, 0 keeps none)
+TRACE_STORE_SIZE = int(os.getenv("TRACE_STORE_SIZE", 1000))
+
+# PDF Page Text Cache Configuration (empty path disables it)
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "./page_cache.db")
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", 256))
+
+# Action API Configuration (empty base URL only simulates the calls)
+ACTION_API_BASE_URL = os.getenv("ACTION_API_BASE_URL", "")
+ACTION_API_TIMEOUT = float(os.getenv("ACTION_API_TIMEOUT", 10))
+ACTION_API_MAX_CONNECTIONS = int(os.getenv("ACTION_API_MAX_CONNECTIONS", 20))
+# Requests in flight per endpoint path
+ACTION_API_ENDPOINT_CONCURRENCY = int(os.getenv("ACTION_API_ENDPOINT_CONCURRENCY", 8))
+ACTION_API_RETRIES = int(os.getenv("ACTION_API_RETRIES", 3))
+# First retry waits up to this many seconds, doubling per retry
+ACTION_API_BACKOFF = float(os.getenv("ACTION_API_BACKOFF", 0.2))
+
+# Action Routing Rules (reloaded when the file changes)
+ROUTING_RULES_PATH = os.getenv("ROUTING_RULES_PATH", "./router/routing_rules.json")
+
+# Action Outbox Configuration (empty path sends actions while the client waits)
+ACTION_OUTBOX_PATH = os.getenv("ACTION_OUTBOX_PATH", "./action_outbox.db")
+ACTION_OUTBOX_BATCH_SIZE = int(os.getenv("ACTION_OUTBOX_BATCH_SIZE", 50))
+ACTION_OUTBOX_MAX_ATTEMPTS = int(os.getenv("ACTION_OUTBOX_MAX_ATTEMPTS", 8))
+# Delivered and failed actions are deleted after this many hours (0 keeps them)
+ACTION_OUTBOX_RETENTION_HOURS = float(os.getenv("ACTION_OUTBOX_RETENTION_HOURS", 168)) or None
+# Suffix of the endpoints' bulk paths, e.g. "/batch" (empty sends one request per action)
+ACTION_BULK_SUFFIX = os.getenv("ACTION_BULK_SUFFIX", "")
+
+# JSON Analysis Configuration (anomalies reported per document, 0 for no limit)
+JSON_MAX_ANOMALIES = int(os.getenv("JSON_MAX_ANOMALIES", 100)) or None
+# Larger files are parsed incrementally with ijson instead of loaded (0 never streams)
+JSON_STREAM_THRESHOLD = int(os.getenv("JSON_STREAM_THRESHOLD", 50 * 1024 * 1024)) or None
+
 # Model Configuration
 MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "./model_cache")
 TEXT_CLASSIFIER_MODEL = os.getenv("TEXT_CLASSIFIER_MODEL", "distilbert-base-uncased")
@@ -0,0 +1,37 @@
+# utils/email_parser.py
+import email
+from email.message import Message
+
+
+def parse_email(raw_bytes: bytes) -> Message:
+    """
+    Parse a raw RFC 822 email.
+
+    Args:
+        raw_bytes: The raw email file content
+
+    Returns:
+        The parsed email Message
+    """
+    return email.message_from_bytes(raw_bytes)
+
+
+def get_body(msg: Message) -> str:
+    """
+    Get the plain text body of an email.
+
+    Args:
+        msg: The parsed email Message
+
+    Returns:
+        The concatenated text/plain parts of the email
+    """
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_type() == "text/plain":
+                body += part.get_payload(decode=True).decode('utf-8', errors='ignore')
+    else:
+        body = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
+
+    return body
@@ -0,0 +1,135 @@
+# utils/job_queue.py
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted to a queue that is at capacity."""
+
+
+class JobQueue:
+    """
+    Bounded in-process job queue drained by a fixed set of worker threads.
+
+    Submitting to a full queue raises JobQueueFull immediately instead of
+    blocking, so callers can push back on clients.
+    """
+
+    def __init__(self, handler: Callable, workers: int = 2, max_size: int = 100):
+        """
+        Initialize the job queue and start its workers.
+
+        Args:
+            handler: Callable invoked with each job's arguments
+            workers: Number of worker threads
+            max_size: Maximum number of jobs waiting in the queue
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        # Only jobs still queued or running are tracked here
+        self._jobs = {}
+        self._threads = []
+        # Set by shutdown(); the stop sentinel is queued behind the remaining jobs
+        self._stopping = False
+        self._sentinel_queued = False
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_id: str, *args, **kwargs) -> None:
+        """
+        Queue a job.
+
+        Args:
+            job_id: Identifier used to look the job up
+            *args, **kwargs: Arguments for the handler
+
+        Raises:
+            JobQueueFull: If the queue is at capacity or shutting down
+        """
+        with self._lock:
+            if self._stopping:
+                raise JobQueueFull("Job queue is shutting down")
+            try:
+                self._queue.put_nowait((job_id, args, kwargs))
+            except queue.Full:
+                raise JobQueueFull(f"Job queue is full ({self.max_size} jobs waiting)")
+            self._jobs[job_id] = "queued"
+
+    def full(self) -> bool:
+        """Whether the queue is at capacity."""
+        return self._queue.full()
+
+    def get(self, job_id: str) -> Optional[str]:
+        """
+        Get the state of a job.
+
+        Returns:
+            "queued" or "running", or None once the job has finished
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Report worker count, queue depth and running jobs."""
+        with self._lock:
+            running = sum(1 for state in self._jobs.values() if state == "running")
+        return {
+            "workers": self.workers,
+            "capacity": self.max_size,
+            "queued": self._queue.qsize(),
+            "running": running,
+        }
+
+    def shutdown(self) -> None:
+        """
+        Stop the workers once the jobs already queued are done, without blocking.
+
+        A stop sentinel is queued behind the jobs; if the queue is full, the
+        first worker to take a job queues it instead. Each worker passes the
+        sentinel on to the next before exiting.
+        """
+        with self._lock:
+            self._stopping = True
+        self._queue_sentinel()
+
+    def _queue_sentinel(self) -> None:
+        with self._lock:
+            if self._sentinel_queued:
+                return
+            try:
+                self._queue.put_nowait((None, (), {}))
+            except queue.Full:
+                return
+            self._sentinel_queued = True
+
+    def _worker(self) -> None:
+        while True:
+            job_id, args, kwargs = self._queue.get()
+            if job_id is None:
+                # Taking the sentinel freed its slot, and nothing is submitted after shutdown
+                self._queue.put_nowait((None, (), {}))
+                self._queue.task_done()
+                break
+            if self._stopping:
+                self._queue_sentinel()
+
+            with self._lock:
+                self._jobs[job_id] = "running"
+            try:
+                self.handler(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+                self._queue.task_done()
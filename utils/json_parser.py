@@ -0,0 +1,247 @@
+# utils/json_parser.py
+import importlib.util
+import json
+from typing import Any, BinaryIO, Optional, Tuple
+
+
+def parse_json(text: str) -> Tuple[Any, Optional[json.JSONDecodeError]]:
+    """
+    Parse JSON text without raising on syntax errors.
+
+    Args:
+        text: The JSON document as text
+
+    Returns:
+        Tuple of (parsed data, decode error). The data is None when the
+        error is set.
+    """
+    try:
+        return json.loads(text), None
+    except json.JSONDecodeError as e:
+        return None, e
+
+
+# Fields expected to hold numbers
+NUMERIC_FIELDS = ("price", "amount", "total", "unit_price")
+
+
+class JsonStructure:
+    """
+    Structure statistics of a parsed JSON document, from walk_json().
+
+    Attributes:
+        fields_count: Number of object fields at any depth
+        max_depth: Deepest nesting level of objects and arrays (the root is 0)
+        total_nodes: Number of objects and arrays, plus the root
+        anomalies: Reported anomaly messages, in document order
+        anomaly_count: Number of anomalies found, including unreported ones
+    """
+
+    def __init__(self, max_anomalies: Optional[int] = None):
+        self.fields_count = 0
+        self.max_depth = 0
+        self.total_nodes = 1
+        self.anomalies = []
+        self.anomaly_count = 0
+        self._max_anomalies = max_anomalies
+
+    def _add_anomaly(self, message: str, path: Tuple, **details: Any) -> None:
+        self.anomaly_count += 1
+        if self._max_anomalies is None or len(self.anomalies) < self._max_anomalies:
+            self.anomalies.append(message.format(path=_format_path(path), **details))
+
+
+def _format_path(path: Tuple) -> str:
+    """
+    Format a path chain built by walk_json(), e.g. 'orders[2].price'.
+
+    Each link is (parent link, key, is array index), the root is None.
+    """
+    links = []
+    while path is not None:
+        links.append(path)
+        path = path[0]
+
+    text = ""
+    for _, key, is_index in reversed(links):
+        if is_index:
+            text = f"{text}[{key}]"
+        else:
+            text = f"{text}.{key}" if text else key
+    return text
+
+
+def walk_json(json_data: Any, max_anomalies: Optional[int] = None) -> JsonStructure:
+    """
+    Collect field, depth, node and anomaly statistics in one pass.
+
+    The tree is walked depth-first with an explicit stack, so deeply nested
+    documents cannot hit the recursion limit. Anomalies are null values and
+    non-numeric values of numeric fields, reported with their path
+    (e.g. 'orders[2].price').
+
+    Args:
+        json_data: Parsed JSON document
+        max_anomalies: Maximum number of anomaly messages kept (None keeps all)
+
+    Returns:
+        JsonStructure with the statistics
+    """
+    structure = JsonStructure(max_anomalies)
+    if isinstance(json_data, dict):
+        structure.fields_count = len(json_data)
+        stack = [(iter(json_data.items()), False, None, 0)]
+    elif isinstance(json_data, list):
+        stack = [(iter(enumerate(json_data)), True, None, 0)]
+    else:
+        return structure
+
+    # Paths are kept as linked tuples and only formatted for reported
+    # anomalies: building every path string costs quadratic time on deep trees
+    while stack:
+        items, is_array, path, depth = stack[-1]
+        for key, value in items:
+            if is_array:
+                if not isinstance(value, (dict, list)):
+                    continue
+            else:
+                # Check null values
+                if value is None:
+                    structure._add_anomaly("Missing value for field '{path}'", (path, key, False))
+
+                # Check numeric fields with non-numeric values
+                if key in NUMERIC_FIELDS and not isinstance(value, (int, float)):
+                    structure._add_anomaly(
+                        "Field '{path}' should be numeric but is {type_name}",
+                        (path, key, False),
+                        type_name=type(value).__name__
+                    )
+
+            # Descend into nested objects and arrays; the parent's iterator
+            # stays on the stack and resumes after them
+            if isinstance(value, dict):
+                structure.fields_count += len(value)
+                stack.append((iter(value.items()), False, (path, key, is_array), depth + 1))
+                break
+            if isinstance(value, list):
+                stack.append((iter(enumerate(value)), True, (path, key, is_array), depth + 1))
+                break
+        else:
+            stack.pop()
+            continue
+
+        structure.total_nodes += 1
+        structure.max_depth = max(structure.max_depth, depth + 1)
+
+    return structure
+
+
+class JsonStreamSummary(JsonStructure):
+    """
+    JsonStructure of a document analyzed by stream_json(), plus what the
+    intent detection needs from it.
+
+    Attributes:
+        sample: A bounded preview of the document: its first values in
+            document order, where arrays keep only their first element
+        error: The parse error for invalid JSON, or None (the statistics then
+            cover the part read before the error)
+    """
+
+    def __init__(self, max_anomalies: Optional[int] = None):
+        super().__init__(max_anomalies)
+        self.sample = None
+        self.error = None
+
+
+def can_stream() -> bool:
+    """Check whether the optional ijson package needed by stream_json() is installed."""
+    return importlib.util.find_spec("ijson") is not None
+
+
+def stream_json(stream: BinaryIO, max_anomalies: Optional[int] = None,
+                sample_size: int = 1000) -> JsonStreamSummary:
+    """
+    Analyze a JSON document while parsing it incrementally.
+
+    Computes the same statistics as walk_json() from parser events without
+    building the tree, so memory use does not depend on the document size.
+    Unlike json.loads, repeated keys of an object are all counted.
+
+    Args:
+        stream: Binary file object positioned at the start of the document
+        max_anomalies: Maximum number of anomaly messages kept (None keeps all)
+        sample_size: Maximum number of values kept in the sample
+
+    Returns:
+        JsonStreamSummary with the statistics, the sample and the parse error if any
+    """
+    import ijson
+
+    structure = JsonStreamSummary(max_anomalies)
+    # Open containers as [is array, path link, depth, next index, sampled copy or None]
+    stack = []
+    key = None
+    sample_budget = sample_size
+
+    try:
+        for event, value in ijson.basic_parse(stream, use_float=True):
+            if event == "map_key":
+                key = value
+                structure.fields_count += 1
+                continue
+            if event == "end_map" or event == "end_array":
+                stack.pop()
+                continue
+
+            # A value: the root, an array element or an object field
+            if event == "start_map":
+                reduced = {}
+            elif event == "start_array":
+                reduced = []
+            else:
+                reduced = value
+
+            parent = stack[-1] if stack else None
+            sampled = False
+            if parent is None:
+                path = None
+                structure.sample = reduced
+                sampled = True
+            elif parent[0]:
+                path = (parent[1], parent[3], True)
+                if parent[3] == 0 and parent[4] is not None and sample_budget > 0:
+                    parent[4].append(reduced)
+                    sample_budget -= 1
+                    sampled = True
+                parent[3] += 1
+            else:
+                path = (parent[1], key, False)
+                if parent[4] is not None and sample_budget > 0:
+                    parent[4][key] = reduced
+                    sample_budget -= 1
+                    sampled = True
+
+                # Check null values
+                if event == "null":
+                    structure._add_anomaly("Missing value for field '{path}'", path)
+
+                # Check numeric fields with non-numeric values (booleans count as numbers, like in Python)
+                if key in NUMERIC_FIELDS and event not in ("number", "boolean"):
+                    structure._add_anomaly(
+                        "Field '{path}' should be numeric but is {type_name}",
+                        path,
+                        type_name=type(reduced).__name__
+                    )
+
+            if event == "start_map" or event == "start_array":
+                depth = 0
+                if parent is not None:
+                    depth = parent[2] + 1
+                    structure.total_nodes += 1
+                    structure.max_depth = max(structure.max_depth, depth)
+                stack.append([event == "start_array", path, depth, 0, reduced if sampled else None])
+    except ijson.JSONError as e:
+        structure.error = e
+
+    return structure
@@ -0,0 +1,267 @@
+# utils/metrics.py
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Upper bounds in seconds, from a local stub server up to a slow remote API
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Thread-safe histogram of observed values over fixed buckets.
+
+    Each bucket counts the values up to its upper bound (and above the
+    previous one); values above the last bound fall in a final +Inf bucket.
+    Quantiles are estimated by linear interpolation inside a bucket.
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets: Bucket upper bounds
+        """
+        self.buckets = tuple(sorted(buckets))
+        if not self.buckets:
+            raise ValueError("Histogram needs at least one bucket")
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        """Number of values observed."""
+        with self._lock:
+            return sum(self._counts)
+
+    def observe(self, value: float) -> None:
+        """Record one value."""
+        index = bisect_left(self.buckets, value)
+        # Called on every store call and request: acquire the lock directly
+        # (nothing in between can raise) and keep the count in the buckets
+        lock = self._lock
+        lock.acquire()
+        self._counts[index] += 1
+        self.sum += value
+        lock.release()
+
+    @contextmanager
+    def time(self):
+        """Observe the seconds the block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def collect(self) -> Tuple[Dict[str, int], float]:
+        """Cumulative bucket counts (see cumulative_counts) and sum, read together."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self.sum
+        return self._cumulative(counts), total
+
+    def _cumulative(self, counts: List[int]) -> Dict[str, int]:
+        cumulative = {}
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            seen += count
+            cumulative["+Inf" if bound == math.inf else f"{bound:g}"] = seen
+        return cumulative
+
+    def cumulative_counts(self) -> Dict[str, int]:
+        """
+        Count the values up to each bucket bound.
+
+        Returns:
+            Cumulative counts by bound, ending with "+Inf" (the total count)
+        """
+        with self._lock:
+            counts = list(self._counts)
+        return self._cumulative(counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile of the observed values.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The estimate, the last bound if it falls in the +Inf bucket,
+            or None before the first observation
+        """
+        with self._lock:
+            counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return None
+
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        """Report the count, sum, p50/p95/p99 estimates and cumulative bucket counts."""
+        with self._lock:
+            count = sum(self._counts)
+            total = self.sum
+
+        def estimate(q):
+            value = self.quantile(q)
+            return None if value is None else round(value, 6)
+
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "p50": estimate(0.5),
+            "p95": estimate(0.95),
+            "p99": estimate(0.99),
+            "buckets": self.cumulative_counts()
+        }
+
+
+class HistogramFamily:
+    """
+    Histograms of one metric by label values.
+
+    Each combination of label values gets its histogram on first use;
+    callers on a hot path can keep the child returned by labels().
+    """
+
+    def __init__(self, label_names: Tuple[str, ...], buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        """The histogram of one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def children(self) -> List[Tuple[Dict[str, str], Histogram]]:
+        """Each histogram with its labels."""
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.label_names, values)), child) for values, child in children]
+
+
+class Counter:
+    """Thread-safe counts of one metric by label values."""
+
+    def __init__(self, label_names: Tuple[str, ...] = ()):
+        self.label_names = tuple(label_names)
+        # Without labels there is one count, reported from zero
+        self._counts = {} if self.label_names else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        """Add to the count of one combination of label values."""
+        with self._lock:
+            self._counts[values] = self._counts.get(values, 0) + amount
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """Each count with its labels."""
+        with self._lock:
+            counts = list(self._counts.items())
+        return [(dict(zip(self.label_names, values)), count) for values, count in counts]
+
+
+Samples = Union[float, Iterable[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    """
+    Metrics in the Prometheus text format, built when they are scraped.
+
+    Samples are label dicts with values; a plain number is one sample
+    without labels. Samples whose value is None are left out.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines = []
+
+    def _add(self, name: str, kind: str, help: str, samples: Samples) -> None:
+        if samples is None or isinstance(samples, (int, float)):
+            samples = [({}, samples)]
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if value is not None:
+                self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter(self, name: str, help: str, samples: Samples) -> None:
+        self._add(name, "counter", help, samples)
+
+    def gauge(self, name: str, help: str, samples: Samples) -> None:
+        self._add(name, "gauge", help, samples)
+
+    def histogram(self, name: str, help: str, histograms: Iterable[Tuple[Dict[str, str], Histogram]]) -> None:
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in histograms:
+            buckets, total = histogram.collect()
+            for bound, count in buckets.items():
+                self._lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {buckets['+Inf']}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Report this process's resident and peak resident memory in bytes.
+
+    The resident size is read from /proc (None where it does not exist).
+    """
+    resident = None
+    try:
+        with open("/proc/self/statm") as f:
+            resident = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "resident_bytes": resident,
+        "peak_resident_bytes": peak if sys.platform == "darwin" else peak * 1024
+    }
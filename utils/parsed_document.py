@@ -0,0 +1,227 @@
+# utils/parsed_document.py
+import os
+import logging
+from email.message import Message
+from typing import Any, Iterator, List, Optional
+
+from utils import email_parser, json_parser, pdf_parser
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedDocument:
+    """
+    Parsed content of one uploaded file, shared by the classifier and the
+    format agents so the file is read and parsed only once per upload.
+
+    Every view (raw bytes, decoded text, PDF page texts, email message,
+    JSON tree) is computed on first access and cached. bytes_read counts
+    the bytes read from the file so far.
+    """
+
+    def __init__(self, file_path: str, raw_bytes: Optional[bytes] = None,
+                 json_stream_threshold: Optional[int] = None, json_max_anomalies: Optional[int] = None,
+                 page_cache=None, content_hash: Optional[str] = None):
+        """
+        Initialize the parsed document.
+
+        Args:
+            file_path: Path to the uploaded file
+            raw_bytes: File content, if already in memory
+            json_stream_threshold: File size in bytes above which JSON is streamed
+                instead of loaded (None always loads it)
+            json_max_anomalies: Maximum number of anomalies kept when streaming JSON
+            page_cache: PageTextCache consulted for PDF page texts before opening the PDF
+            content_hash: SHA-256 of the file content, the page cache key
+        """
+        self.file_path = file_path
+        self._raw_bytes = raw_bytes
+        self.bytes_read = 0
+        self.page_cache = page_cache
+        self.content_hash = content_hash
+        self._cached_page_count = None
+        self.json_stream_threshold = json_stream_threshold
+        self.json_max_anomalies = json_max_anomalies
+        self._json_summary = None
+        self._text = None
+        self._pdf_reader = None
+        self._page_texts = {}
+        self._message = None
+        self._email_body = None
+        self._json_parsed = False
+        self._json_data = None
+        self._json_error = None
+
+    @property
+    def size(self) -> int:
+        """Size of the file in bytes."""
+        if self._raw_bytes is not None:
+            return len(self._raw_bytes)
+        return os.path.getsize(self.file_path)
+
+    @property
+    def raw_bytes(self) -> bytes:
+        """The raw file content."""
+        if self._raw_bytes is None:
+            with open(self.file_path, 'rb') as f:
+                self._raw_bytes = f.read()
+            self.bytes_read += len(self._raw_bytes)
+        return self._raw_bytes
+
+    def head(self, size: int = 1024) -> bytes:
+        """Return the first bytes of the file without loading all of it."""
+        if self._raw_bytes is not None:
+            return self._raw_bytes[:size]
+        with open(self.file_path, 'rb') as f:
+            head = f.read(size)
+        self.bytes_read += len(head)
+        return head
+
+    @property
+    def text(self) -> str:
+        """
+        The file content decoded as UTF-8 with universal newlines, like a
+        text-mode read (raises UnicodeDecodeError for binary files).
+        """
+        if self._text is None:
+            self._text = self.raw_bytes.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        return self._text
+
+    # PDF views
+
+    @property
+    def pdf_reader(self):
+        """PyPDF2 reader over the file content."""
+        if self._pdf_reader is None:
+            self._pdf_reader = pdf_parser.open_pdf(self.raw_bytes)
+        return self._pdf_reader
+
+    @property
+    def pages_cached(self) -> bool:
+        """Whether the PDF page texts are in the page cache (looked up once)."""
+        if self._cached_page_count is None:
+            page_count = None
+            if self.page_cache is not None and self.content_hash:
+                page_count = self.page_cache.lookup(self.content_hash)
+            self._cached_page_count = -1 if page_count is None else page_count
+        return self._cached_page_count >= 0
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages in the PDF."""
+        if self.pages_cached:
+            return self._cached_page_count
+        return len(self.pdf_reader.pages)
+
+    def page_text(self, index: int) -> str:
+        """
+        Get the extracted text of a single PDF page.
+
+        Args:
+            index: Zero-based page number
+
+        Returns:
+            The page text (empty string if the page has no text)
+        """
+        if index not in self._page_texts:
+            text = None
+            if self.pages_cached:
+                text = self.page_cache.get_page(self.content_hash, index)
+            if text is None:
+                text = self.pdf_reader.pages[index].extract_text() or ""
+            self._page_texts[index] = text
+        return self._page_texts[index]
+
+    def iter_page_texts(self, max_pages: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the PDF page texts in order, extracting each page only when reached.
+
+        Args:
+            max_pages: Stop after this many pages (None for all)
+        """
+        page_count = self.page_count if max_pages is None else min(max_pages, self.page_count)
+        for i in range(page_count):
+            yield self.page_text(i)
+
+    @property
+    def pages_extracted(self) -> int:
+        """Number of leading PDF pages whose text has already been extracted."""
+        count = 0
+        while count in self._page_texts:
+            count += 1
+        return count
+
+    @property
+    def page_texts(self) -> List[str]:
+        """Extracted text of every PDF page."""
+        return [self.page_text(i) for i in range(self.page_count)]
+
+    @page_texts.setter
+    def page_texts(self, texts: List[str]) -> None:
+        self._page_texts = dict(enumerate(texts))
+
+    # Email views
+
+    @property
+    def message(self) -> Message:
+        """The parsed email message."""
+        if self._message is None:
+            self._message = email_parser.parse_email(self.raw_bytes)
+        return self._message
+
+    @property
+    def email_body(self) -> str:
+        """Plain text body of the email."""
+        if self._email_body is None:
+            self._email_body = email_parser.get_body(self.message)
+        return self._email_body
+
+    # JSON views
+
+    def _parse_json(self) -> None:
+        if not self._json_parsed:
+            self._json_data, self._json_error = json_parser.parse_json(self.text)
+            self._json_parsed = True
+
+    @property
+    def json_data(self) -> Any:
+        """The parsed JSON tree (raises the decode error for invalid JSON)."""
+        self._parse_json()
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json_data
+
+    @property
+    def json_error(self):
+        """The JSONDecodeError for invalid JSON, or None."""
+        self._parse_json()
+        return self._json_error
+
+    @property
+    def json_streaming(self) -> bool:
+        """
+        Whether the JSON views come from streaming the file: true for files
+        above the stream threshold when ijson is installed.
+        """
+        return (self.json_stream_threshold is not None and self._raw_bytes is None
+                and self.size > self.json_stream_threshold and json_parser.can_stream())
+
+    @property
+    def json_summary(self) -> json_parser.JsonStreamSummary:
+        """Structure statistics and top-level sample of the JSON, computed by streaming the file."""
+        if self._json_summary is None:
+            with open(self.file_path, 'rb') as f:
+                self._json_summary = json_parser.stream_json(f, self.json_max_anomalies)
+                self.bytes_read += f.tell()
+        return self._json_summary
+
+    @property
+    def json_sample(self) -> Any:
+        """The streamed JSON's top-level sample (raises the parse error for invalid JSON)."""
+        if self.json_summary.error is not None:
+            raise self.json_summary.error
+        return self.json_summary.sample
+
+    def text_sample(self, size: int = 1024 * 1024) -> str:
+        """Decode the first bytes of the file as text, skipping undecodable bytes such as a cut last character."""
+        return self.head(size).decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
@@ -0,0 +1,89 @@
+# utils/pdf_parser.py
+import io
+import logging
+from typing import List, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# Identifies the text extraction: cached page texts of another version are not reused
+EXTRACTOR_VERSION = f"PyPDF2-{PyPDF2.__version__}"
+
+
+def is_pdf(head: bytes) -> bool:
+    """
+    Check for the PDF file signature.
+
+    Args:
+        head: The first bytes of a file
+
+    Returns:
+        True if the bytes start with the PDF signature
+    """
+    return head.startswith(b'%PDF-')
+
+
+def open_pdf(raw_bytes: bytes) -> PyPDF2.PdfReader:
+    """
+    Open a PDF held in memory.
+
+    Args:
+        raw_bytes: The raw PDF file content
+
+    Returns:
+        A PdfReader over the content
+    """
+    return PyPDF2.PdfReader(io.BytesIO(raw_bytes))
+
+
+def extract_page_texts(raw_bytes: bytes) -> List[str]:
+    """
+    Extract the text of every page of a PDF.
+
+    Args:
+        raw_bytes: The raw PDF file content
+
+    Returns:
+        List of page texts, one entry per page (empty string for pages without text)
+    """
+    pdf_reader = open_pdf(raw_bytes)
+    return [page.extract_text() or "" for page in pdf_reader.pages]
+
+
+def extract_page_range(raw_bytes: bytes, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of a range of pages of a PDF.
+
+    Args:
+        raw_bytes: The raw PDF file content
+        start: First page number (zero-based)
+        stop: Page number after the last page
+
+    Returns:
+        List of page texts for pages start to stop - 1
+    """
+    pdf_reader = open_pdf(raw_bytes)
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def split_pages(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """
+    Split the pages of a document into contiguous ranges of near equal size.
+
+    Args:
+        page_count: Number of pages
+        parts: Number of ranges wanted (fewer are returned for short documents)
+
+    Returns:
+        List of (start, stop) page ranges covering every page in order
+    """
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
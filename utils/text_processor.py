@@ -0,0 +1,181 @@
+# utils/text_processor.py
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Build a regex alternation of keywords factored into a prefix trie.
+
+    Keywords sharing a prefix share one branch, so the regex engine tests each
+    character once per position instead of once per keyword. Optional suffixes
+    are greedy: at any position the longest matching keyword wins.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = "|".join(branches)
+        if "" in node:
+            return f"(?:{body})?"
+        return body if len(branches) == 1 else f"(?:{body})"
+
+    return build(trie)
+
+
+class KeywordScan:
+    """
+    Keyword counts from one KeywordMatcher.scan() call.
+
+    counts holds the non-overlapping occurrences of each keyword (the same
+    value as text.count(keyword)); header_hits the number of header lines
+    containing it.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]], counts: Dict[str, int], header_hits: Dict[str, int]):
+        self.groups = groups
+        self.counts = counts
+        self.header_hits = header_hits
+
+    def __contains__(self, keyword: str) -> bool:
+        return self.counts.get(keyword, 0) > 0
+
+    def total(self, group: str, include_headers: bool = False) -> int:
+        """
+        Sum the counts of a group's keywords.
+
+        Args:
+            group: Name of the keyword group
+            include_headers: Also add one per header line containing each keyword
+
+        Returns:
+            Total number of occurrences
+        """
+        total = sum(self.counts[keyword] for keyword in self.groups[group])
+        if include_headers:
+            total += sum(self.header_hits[keyword] for keyword in self.groups[group])
+        return total
+
+    def any(self, group: str) -> bool:
+        """Check whether any keyword of a group occurs in the text."""
+        return any(self.counts[keyword] for keyword in self.groups[group])
+
+
+class KeywordMatcher:
+    """
+    Counts a fixed set of keywords in a single pass over a text.
+
+    The keywords, organised in named groups, are compiled once into one
+    lookahead regex over a prefix trie of all of them, so matches may overlap
+    and keywords contained in other keywords are still counted. Build one
+    matcher per keyword set at import time and reuse it.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        """
+        Compile the matcher.
+
+        Args:
+            groups: Keyword lists by group name; a keyword may appear in several groups
+        """
+        self.groups = {name: list(keywords) for name, keywords in groups.items()}
+        self.keywords = sorted({keyword for keywords in self.groups.values() for keyword in keywords})
+        if not self.keywords or not all(self.keywords):
+            raise ValueError("KeywordMatcher needs non-empty keywords")
+
+        self._pattern = re.compile(f"(?=({_trie_pattern(self.keywords)}))")
+        # A match reports the longest keyword starting at a position; the
+        # keywords that are its prefixes start there too
+        self._matched_keywords = {
+            keyword: [other for other in self.keywords if keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+
+    def scan(self, text: str, header_lines: int = 0, header_max_length: int = 100) -> KeywordScan:
+        """
+        Count every keyword in the text.
+
+        Args:
+            text: Text to scan (matching is case-sensitive, lowercase it first if needed)
+            header_lines: Number of leading lines treated as potential headers
+            header_max_length: Lines of this length or longer are not headers
+
+        Returns:
+            KeywordScan with the per-keyword counts and header hits
+        """
+        counts = dict.fromkeys(self.keywords, 0)
+        header_hits = dict.fromkeys(self.keywords, 0)
+
+        # Start offsets of the header lines; a keyword never spans a newline
+        header_starts = []
+        header_short = []
+        offset = 0
+        for line in text.split("\n", header_lines)[:header_lines]:
+            header_starts.append(offset)
+            header_short.append(len(line) < header_max_length)
+            offset += len(line) + 1
+        header_end = offset if any(header_short) else 0
+        header_seen = set()
+
+        next_start = {}
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for keyword in self._matched_keywords[match.group(1)]:
+                # Like str.count, skip occurrences overlapping the previous one
+                if start >= next_start.get(keyword, 0):
+                    counts[keyword] += 1
+                    next_start[keyword] = start + len(keyword)
+
+                if start < header_end:
+                    line_index = bisect_right(header_starts, start) - 1
+                    if header_short[line_index] and (keyword, line_index) not in header_seen:
+                        header_seen.add((keyword, line_index))
+                        header_hits[keyword] += 1
+
+        return KeywordScan(self.groups, counts, header_hits)
+
+
+class KeywordTally(KeywordScan):
+    """
+    Running keyword counts over a text fed in chunks, such as PDF pages.
+
+    Each chunk is scanned on its own and is taken to end with a line break
+    (header lines are counted across chunks). Keywords cannot contain a line
+    break, so for text split at line breaks the counts after the last chunk
+    equal one scan of the whole text, and callers can stop early once the
+    counts are decisive.
+    """
+
+    def __init__(self, matcher: KeywordMatcher, header_lines: int = 0, header_max_length: int = 100):
+        """
+        Start an empty tally.
+
+        Args:
+            matcher: Matcher for the keywords to count
+            header_lines: Number of leading lines of the whole text treated as potential headers
+            header_max_length: Lines of this length or longer are not headers
+        """
+        super().__init__(matcher.groups, dict.fromkeys(matcher.keywords, 0), dict.fromkeys(matcher.keywords, 0))
+        self.matcher = matcher
+        self.chunks = 0
+        self._header_lines = header_lines
+        self._header_max_length = header_max_length
+
+    def add(self, text: str) -> None:
+        """Count the keywords of the next chunk of text."""
+        scan = self.matcher.scan(text, self._header_lines, self._header_max_length)
+        for keyword, count in scan.counts.items():
+            if count:
+                self.counts[keyword] += count
+                self.header_hits[keyword] += scan.header_hits[keyword]
+        if self._header_lines:
+            self._header_lines = max(0, self._header_lines - text.count("\n"))
+        self.chunks += 1
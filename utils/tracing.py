@@ -0,0 +1,108 @@
+# utils/tracing.py
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Callable, Optional
+
+from memory.schema import ProcessingTrace, StageTiming
+
+# Tracer of the document each thread is processing, set by activate()
+_local = threading.local()
+
+
+class StageTracer:
+    """
+    Times the processing stages of one document into its ProcessingTrace.
+
+    Each stage records its wall time, the calling thread's CPU time and the
+    bytes read from the file while it ran. Stages nest: time spent in an
+    inner stage counts only there, so the stages of a trace add up to the
+    document's processing time. Entering a stage again (one store write
+    per agent, say) adds to its timing. Work sent to the process pool shows
+    up as wall time only.
+
+    A tracer is used by one thread at a time.
+    """
+
+    def __init__(self, trace: ProcessingTrace, bytes_source: Optional[Callable[[], int]] = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            trace: The document's trace
+            bytes_source: Returns the bytes read from the file so far
+                (None records no reads unless a stage adds them)
+        """
+        self.trace = trace
+        self.bytes_source = bytes_source
+        # Wall, CPU and bytes of the stages nested in each open stage
+        self._open = []
+
+    def _timing(self, name: str) -> StageTiming:
+        for timing in self.trace.stages:
+            if timing.stage == name:
+                return timing
+        timing = StageTiming(stage=name)
+        self.trace.stages.append(timing)
+        return timing
+
+    def _bytes_read(self) -> int:
+        return self.bytes_source() if self.bytes_source is not None else 0
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage.
+
+        Yields:
+            The stage's StageTiming, for the block to add page and field counts
+        """
+        timing = self._timing(name)
+        nested = [0.0, 0.0, 0]
+        self._open.append(nested)
+        wall, cpu, read = time.perf_counter(), time.thread_time(), self._bytes_read()
+        try:
+            yield timing
+        except Exception as e:
+            timing.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            read = self._bytes_read() - read
+            self._open.pop()
+            timing.calls += 1
+            timing.wall_seconds = round(timing.wall_seconds + wall - nested[0], 6)
+            timing.cpu_seconds = round(timing.cpu_seconds + cpu - nested[1], 6)
+            timing.bytes_read += read - nested[2]
+            if self._open:
+                outer = self._open[-1]
+                outer[0] += wall
+                outer[1] += cpu
+                outer[2] += read
+            self.trace.last_updated = datetime.utcnow()
+
+
+@contextmanager
+def activate(tracer: StageTracer):
+    """Make the tracer this thread's current one inside the block, for stage()."""
+    previous = getattr(_local, "tracer", None)
+    _local.tracer = tracer
+    try:
+        yield tracer
+    finally:
+        _local.tracer = previous
+
+
+def stage(name: str):
+    """
+    Time a stage of the document this thread is processing.
+
+    For code that does not hold the tracer, such as agents and stores; a
+    no-op (yielding None) outside activate().
+    """
+    tracer = getattr(_local, "tracer", None)
+    if tracer is None:
+        return nullcontext()
+    return tracer.stage(name)
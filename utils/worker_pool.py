@@ -0,0 +1,112 @@
+# utils/worker_pool.py
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Executes agent work off the event loop.
+
+    A thread pool runs the document pipeline (file I/O, store writes, regex
+    analysis) and an optional process pool runs CPU-bound PDF text
+    extraction. Both report how many submitted tasks are running and
+    how many are still waiting for a worker.
+    """
+
+    def __init__(self, thread_workers: int = 4, process_workers: int = 2):
+        """
+        Initialize the worker pool.
+
+        Args:
+            thread_workers: Number of threads for pipeline steps
+            process_workers: Number of processes for PDF text extraction
+                (0 runs extraction on the calling thread instead)
+        """
+        self.thread_workers = max(1, thread_workers)
+        self.process_workers = max(0, process_workers)
+        self._threads = ThreadPoolExecutor(
+            max_workers=self.thread_workers, thread_name_prefix="agent-worker"
+        )
+        self._processes = None
+        self._lock = threading.Lock()
+        self._pending = {"thread": 0, "process": 0}
+
+    def _track(self, kind: str, future: Future) -> Future:
+        with self._lock:
+            self._pending[kind] += 1
+
+        def _done(_):
+            with self._lock:
+                self._pending[kind] -= 1
+
+        future.add_done_callback(_done)
+        return future
+
+    def _get_processes(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # Spawn rather than fork: the parent runs many threads
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._processes
+
+    def submit_thread(self, fn: Callable, *args, **kwargs) -> Future:
+        """Submit a call to the thread pool."""
+        return self._track("thread", self._threads.submit(fn, *args, **kwargs))
+
+    def submit_process(self, fn: Callable, *args) -> Future:
+        """
+        Submit a call to the process pool.
+
+        The function and arguments must be picklable. Without a process
+        pool the call runs immediately on the calling thread.
+        """
+        if self.process_workers == 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._track("process", self._get_processes().submit(fn, *args))
+
+    async def run_in_thread(self, fn: Callable, *args, **kwargs):
+        """Run a call on the thread pool and await its result."""
+        return await asyncio.wrap_future(self.submit_thread(fn, *args, **kwargs))
+
+    async def run_in_process(self, fn: Callable, *args):
+        """Run a call on the process pool and await its result."""
+        return await asyncio.wrap_future(self.submit_process(fn, *args))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Report pool sizes and queue depth.
+
+        Returns:
+            Per pool: configured workers, running tasks and queued tasks
+        """
+        with self._lock:
+            pending = dict(self._pending)
+
+        stats = {}
+        for kind, workers in (("thread", self.thread_workers), ("process", self.process_workers)):
+            stats[kind] = {
+                "workers": workers,
+                "running": min(pending[kind], workers),
+                "queued": max(0, pending[kind] - workers),
+            }
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down both pools."""
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)